@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Simulates the morning burst of a standup: the scheduler sends the first question to all users at once, and the users
+answer all questions and send their answers to the team room. The authentication and the Chat API are stubbed, the
+database is the local Postgres database configured by the DB_* environment variables.
+
+    python -m benchmarks.burst --reset --users 500 --teams 20 --questions 4 --rate 50 --think 0.5 --concurrency 16
+
+Each user starts to answer after the prompt and the think time, at most --rate users per second start a conversation,
+and at most --concurrency conversations run at the same time. Reports the prompt latency (start of the scheduler tick
+until the question was sent), the latency of the answers and of the 'send answers' clicks, the error rates and the
+database load of the burst.
+"""
+
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Mapping
+
+import benchmarks.common as common
+import benchmarks.replay as replay
+import bot.utils.storage.Instrumentation as Instrumentation
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import setup_logger
+
+# The counters of pg_stat_database, which are reported as the load of the burst.
+DB_COUNTERS = ('xact_commit', 'xact_rollback', 'blks_read', 'blks_hit', 'tup_returned', 'tup_fetched',
+               'tup_inserted', 'tup_updated', 'tup_deleted', 'deadlocks', 'temp_bytes')
+
+
+def database_counters() -> Mapping[str, int]:
+    with Storage.transaction(name='database_counters') as connection:
+        with connection.cursor() as cursor:
+            # The statistics are cached per transaction and flushed by the backends with a short delay.
+            cursor.execute("SELECT pg_stat_clear_snapshot()")
+            cursor.execute(f"SELECT {', '.join(DB_COUNTERS)} FROM pg_stat_database WHERE datname = current_database()")
+            return dict(zip(DB_COUNTERS, cursor.fetchone()))
+
+
+def schedule_all_today(now: datetime):
+    """
+    Schedule the standup of all users today at midnight, so that the next scheduler tick triggers all users without
+    standup today. Run the benchmark with --reset to trigger all users again.
+    """
+    with Storage.transaction(name='schedule_all_today') as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE schedules SET time = '00:00:00', enabled = true WHERE day = %s",
+                           (now.strftime("%A"),))
+
+
+class Burst:
+    """
+    Drives the scheduler tick and the conversations of the users, which start when their prompt was sent.
+    """
+
+    def __init__(self, num_questions: int, rate: float, think: float, concurrency: int):
+        self.num_questions = num_questions
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.think = think
+        self.concurrency = concurrency
+        self.recorder = common.Recorder()
+        self.prompted = queue.Queue()
+        self.tick_start = 0.0
+
+    def on_request(self, method: str, parent: str):
+        # The scheduler sends the first question into the direct message space of the user.
+        if method.endswith('.create') and parent.startswith('spaces/dm-'):
+            now = time.perf_counter()
+            self.recorder.add('prompt', now - self.tick_start)
+            self.prompted.put((int(parent[len('spaces/dm-'):]), now))
+
+    def converse(self, user: int):
+        import bot.endpoint as endpoint
+
+        client = endpoint.app.test_client()
+        events = [('answer', common.message(user, f"Answer {question} of user {user}."))
+                  for question in range(self.num_questions)]
+        events.append(('send_answers', common.click(user, 'send_answers')))
+        for name, event in events:
+            if self.think:
+                time.sleep(self.think)
+            start = time.perf_counter()
+            try:
+                response = client.post('/api/v1/', json=event)
+                is_error = response.status_code != 200
+            except Exception:
+                is_error = True
+            self.recorder.add(name, time.perf_counter() - start, is_error)
+
+    def dispatch(self, executor: ThreadPoolExecutor, expected: int, scheduler: threading.Thread) -> list:
+        futures = []
+        next_start = 0.0
+        while len(futures) < expected:
+            try:
+                user, prompted = self.prompted.get(timeout=0.1)
+            except queue.Empty:
+                if not scheduler.is_alive() and self.prompted.empty():
+                    break
+                continue
+            next_start = max(prompted, next_start + self.interval)
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(self.converse, user))
+        return futures
+
+    def run(self, expected: int) -> Mapping[str, float]:
+        import bot.trigger_standup_dialog as trigger_standup_dialog
+
+        sent = []
+
+        def tick():
+            try:
+                sent.append(trigger_standup_dialog.trigger_standups())
+            finally:
+                sent.append(time.perf_counter())
+
+        self.tick_start = time.perf_counter()
+        scheduler = threading.Thread(target=tick, name='scheduler')
+        scheduler.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='conversation') as executor:
+            futures = self.dispatch(executor, expected, scheduler)
+            for future in futures:
+                future.result()
+        scheduler.join()
+        end = time.perf_counter()
+        return {
+            'prompts_sent': sent[0] if len(sent) == 2 else 0,
+            'tick_s': sent[-1] - self.tick_start,
+            'conversations': len(futures),
+            'duration_s': end - self.tick_start
+        }
+
+
+def deltas(before: Mapping[str, Mapping[str, float]], after: Mapping[str, Mapping[str, float]]) -> Mapping:
+    result = {}
+    for function, values in after.items():
+        previous = before.get(function, {})
+        delta = {key: value - previous.get(key, 0) for key, value in values.items()}
+        if delta['queries']:
+            result[function] = delta
+    return dict(sorted(result.items(), key=lambda item: item[1]['time'], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the burst of a scheduled standup.")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=50, help="Users per second, which start to answer.")
+    parser.add_argument('--think', type=float, default=0.2, help="Seconds between the messages of a user.")
+    parser.add_argument('--concurrency', type=int, default=16, help="Conversations at the same time.")
+    parser.add_argument('--chat-latency', type=float, default=0.0, help="Latency of the Chat API in seconds.")
+    parser.add_argument('--chat-server', action='store_true', help="Call the Chat API of a local fake server.")
+    parser.add_argument('--chat-errors', type=float, default=0.0, help="Fraction of failing calls of the fake server.")
+    parser.add_argument('--chat-quota', type=float, default=0.0, help="Fraction of 429 responses of the fake server.")
+    parser.add_argument('--reset', action='store_true', help="Drop all tables of the database first.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    setup_logger(False, '')
+    common.stub_authentication()
+    burst = Burst(args.questions, args.rate, args.think, args.concurrency)
+    common.stub_chat(args.chat_latency, burst.on_request, args.chat_server, args.chat_errors, args.chat_quota)
+    if args.reset:
+        common.reset_database()
+
+    setup = common.Recorder()
+    replay.replay(replay.setup_events(args.users, args.teams, args.questions), setup)
+    schedule_all_today(datetime.now())
+
+    counters = database_counters()
+    queries = Instrumentation.stats()
+    summary = burst.run(args.users)
+    # The backends flush their statistics with a delay of up to one second.
+    time.sleep(1)
+    counters = {key: value - counters[key] for key, value in database_counters().items()}
+    queries = deltas(queries, Instrumentation.stats())
+
+    report = burst.recorder.report()
+    requests = sum(result['count'] for name, result in report.items() if name != 'prompt')
+    errors = sum(result['errors'] for name, result in report.items() if name != 'prompt')
+    results = {
+        'config': vars(args),
+        'summary': summary,
+        'error_rate': errors / requests if requests else 0.0,
+        'prompt_error_rate': 1 - summary['prompts_sent'] / args.users if args.users else 0.0,
+        'types': report,
+        'database': counters,
+        'queries': queries
+    }
+
+    common.print_report(report)
+    print(f"\n{summary['prompts_sent']}/{args.users} prompts in {summary['tick_s']:.2f} s, "
+          f"{summary['conversations']} conversations, {requests} requests, {errors} errors, "
+          f"{summary['duration_s']:.2f} s")
+    print(f"Database: {counters['xact_commit']} commits, {counters['xact_rollback']} rollbacks, "
+          f"{counters['tup_returned'] + counters['tup_fetched']} tuples read, "
+          f"{counters['tup_inserted'] + counters['tup_updated'] + counters['tup_deleted']} tuples written, "
+          f"{counters['blks_hit']} buffer hits, {counters['blks_read']} reads")
+    print(f"\n{'':<36}{'queries':>8}{'rows':>10}{'time':>10}  [ms]")
+    for function, values in list(queries.items())[:10]:
+        print(f"{function:<36}{values['queries']:>8.0f}{values['rows']:>10.0f}{values['time'] * 1000:>10.1f}")
+    if args.output:
+        common.write_json(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Helpers of the benchmarks, which run the bot against a local Postgres database configured by the DB_* environment
+variables, e.g. DB_HOST=localhost DB_NAME=benchmark DB_USERNAME=postgres DB_PASSWORD=postgres.
+"""
+
+import itertools
+import json
+import statistics
+import threading
+import time
+from typing import Callable, Iterable, Mapping, Optional, Sequence, Union
+
+import benchmarks.fake_chat as fake_chat
+import bot.utils.storage.Storage as Storage
+
+_sequence = itertools.count(1)
+
+
+def reset_database():
+    """
+    Drop all tables of the benchmark database and migrate it again.
+    """
+    with Storage.transaction(name='reset_database') as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    Storage.update()
+
+
+def stub_authentication():
+    """
+    Accept the events without bearer token.
+    """
+    import bot.endpoint as endpoint
+    endpoint.is_authentication_ok = lambda: True
+
+
+class FakeRequest:
+    """
+    A request of the fake chat service, see stub_chat().
+    """
+
+    def __init__(self, service: 'FakeChatService', method: str, kwargs: dict):
+        self.service = service
+        self.methodId = method
+        self.kwargs = kwargs
+
+    def execute(self):
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        if self.service.on_request is not None:
+            self.service.on_request(self.methodId, self.kwargs.get('parent') or self.kwargs.get('name'))
+        return {'name': self.kwargs.get('name') or f"{self.kwargs.get('parent')}/messages/{next(_sequence)}"}
+
+
+class FakeChatService:
+    """
+    Stands in for the chat service of the Google API client, only spaces().messages().create/update() are supported.
+    """
+
+    def __init__(self, latency: float = 0.0, on_request: Callable[[str, str], None] = None):
+        self.latency = latency
+        self.on_request = on_request
+
+    def spaces(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def create(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self, 'chat.spaces.messages.create', kwargs)
+
+    def update(self, **kwargs) -> FakeRequest:
+        return FakeRequest(self, 'chat.spaces.messages.update', kwargs)
+
+
+def stub_chat(latency: float = 0.0, on_request: Callable[[str, str], None] = None, server: bool = False,
+              error_rate: float = 0.0, quota_rate: float = 0.0) -> Union[FakeChatService, fake_chat.FakeChatServer]:
+    """
+    Answer the Chat API calls without network access.
+    :param latency: The latency of every call in seconds.
+    :param on_request: Called with the method id and the parent or name of every successful call.
+    :param server: Send the calls through the Google API client to the fake Chat API server, instead of answering them
+                   in-process.
+    :param error_rate: The fraction of the calls to the fake server, which fail with 500.
+    :param quota_rate: The fraction of the calls to the fake server, which are rejected with 429.
+    """
+    import bot.utils.Chat as Chat
+    if server:
+        fake_server = fake_chat.FakeChatServer(latency=latency, error_rate=error_rate, quota_rate=quota_rate,
+                                               on_request=on_request).start()
+        Chat.CHAT_API_ROOT = fake_server.url
+        return fake_server
+    service = FakeChatService(latency, on_request)
+    Chat.get_chat_service = lambda: service
+    return service
+
+
+def user_info(index: int) -> dict:
+    return {'name': f"users/{index}", 'displayName': f"User {index}", 'email': f"user.{index}@example.com",
+            'avatarUrl': f"https://example.com/avatar/{index}.png"}
+
+
+def _event(event_type: str, user: int, room: Optional[str], **kwargs) -> dict:
+    number = next(_sequence)
+    event = {
+        'type': event_type,
+        'eventTime': f"2023-01-09T09:00:00.{number:06d}Z",
+        'user': user_info(user),
+        'space': {'name': room or f"spaces/dm-{user}", 'type': 'ROOM' if room else 'DM'}
+    }
+    event.update(kwargs)
+    return event
+
+
+def added_to_space(user: int, room: str = None) -> dict:
+    return _event('ADDED_TO_SPACE', user, room)
+
+
+def command(user: int, command_id: int, argument: str = None, room: str = None) -> dict:
+    message = {'name': f"spaces/x/messages/{next(_sequence)}", 'text': f"/{command_id}",
+               'slashCommand': {'commandId': str(command_id)}}
+    if argument is not None:
+        message['argumentText'] = argument
+    return _event('MESSAGE', user, room, message=message)
+
+
+def message(user: int, text: str) -> dict:
+    return _event('MESSAGE', user, None, message={'name': f"spaces/x/messages/{next(_sequence)}", 'text': text})
+
+
+def click(user: int, action: str, parameters: Sequence = (), room: str = None) -> dict:
+    return _event('CARD_CLICKED', user, room,
+                  message={'name': f"spaces/x/messages/{next(_sequence)}"},
+                  action={'actionMethodName': action,
+                          'parameters': [{'key': str(key), 'value': str(value)} for key, value in parameters]})
+
+
+def label(event: dict) -> str:
+    """
+    The label of an event in the reports, e.g. 'command:get_teams', 'action:send_answers' or 'answer'.
+    """
+    import bot.utils.Profiling as Profiling
+    return Profiling.event_label(event)
+
+
+def percentiles(durations: Sequence[float]) -> Mapping[str, float]:
+    """
+    Summarize the durations in seconds, in milliseconds.
+    """
+    if not durations:
+        return {'count': 0}
+    ordered = sorted(durations)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000
+    }
+
+
+class Recorder:
+    """
+    Collects the durations and errors per label, from multiple threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.errors = {}
+
+    def add(self, name: str, duration: float, is_error: bool = False):
+        with self._lock:
+            self.durations.setdefault(name, []).append(duration)
+            if is_error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self) -> Mapping[str, Mapping[str, float]]:
+        with self._lock:
+            return {name: dict(percentiles(durations), errors=self.errors.get(name, 0))
+                    for name, durations in sorted(self.durations.items())}
+
+
+def print_report(report: Mapping[str, Mapping[str, float]]):
+    print(f"{'':<36}{'count':>8}{'errors':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  [ms]")
+    for name, result in report.items():
+        if not result['count']:
+            continue
+        print(f"{name:<36}{result['count']:>8}{result['errors']:>8}" +
+              ''.join(f"{result[key]:>10.2f}" for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')))
+
+
+def write_json(path: str, data):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
+
+
+def read_jsonl(path: str) -> Iterable[dict]:
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Fills the database configured by the DB_* environment variables with synthetic teams, users, schedules, questions,
+standups and processed events, for the query benchmarks at production scale. The defaults are 50k users in 1k teams
+and roughly 20M standup rows.
+
+    python -m benchmarks.data_generator --reset
+    python -m benchmarks.data_generator --reset --users 5000 --teams 100 --days 60
+
+The distributions: the team sizes are skewed (a few large teams, many small ones), some users left their team or the
+bot, the schedules are spread over the morning, and every user answers on a weekday with their own participation rate.
+A standup consists of the row of the question order 0 (written by the scheduler), one row per question of the team
+and the id of the card in the team room, and its session with the answers and the card.
+"""
+
+import argparse
+import time
+
+import benchmarks.common as common
+import bot.utils.storage.Instrumentation as Instrumentation
+import bot.utils.storage.DatabaseSchema as DatabaseSchema
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import setup_logger
+
+# The answers are combined from two phrases, to get texts of realistic length and vocabulary.
+PHRASES = [
+    "Worked on the login page.", "Reviewed the pull requests of the backend team.",
+    "Fixed the flaky integration tests.", "Met with the customer about the new reporting feature.",
+    "Continued the migration to the new database cluster.", "Wrote the documentation of the public API.",
+    "Nothing is blocking me.", "Waiting for the design of the settings page.",
+    "Investigated the memory leak in the worker processes.", "Prepared the release notes.",
+    "Paired with Anna on the payment integration.", "Deployed the hotfix to production.",
+    "Onboarded the new team member.", "Refactored the notification service.", "Out of office in the afternoon.",
+    "Blocked by the missing access to the staging environment.", "Planning meeting for the next sprint.",
+    "Updated the dependencies and fixed the deprecation warnings.", "Analyzed the performance of the search.",
+    "Tested the mobile app on older devices."
+]
+
+CUSTOM_QUESTIONS = ["Any learnings to share?", "How do you feel today?", "Which tickets did you close?"]
+
+FIRST_NAMES = ["Anna", "Ben", "Chiara", "David", "Elena", "Felix", "Greta", "Hugo", "Ines", "Jonas", "Katrin", "Luca",
+               "Mia", "Noah", "Olivia", "Paul", "Quentin", "Rosa", "Simon", "Tanja"]
+LAST_NAMES = ["Meier", "Müller", "Rossi", "Schmid", "Keller", "Weber", "Huber", "Bianchi", "Fischer", "Gerber"]
+
+
+def _execute(sql: str, params=None, name: str = 'generate'):
+    with Storage.transaction(name=name) as connection:
+        with connection.cursor() as cursor:
+            # The bulk inserts take longer than the default statement timeout.
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def generate_teams(num_teams: int, seed: float) -> int:
+    _execute("SELECT setseed(%s); "
+             "INSERT INTO teams (name, space) "
+             "SELECT 'Team ' || n, 'spaces/team-' || n FROM generate_series(1, %s) AS n", (seed, num_teams))
+    # The default questions are created by a trigger, every third team adds custom questions.
+    return _execute("INSERT INTO questions (team_id, question, question_order) "
+                    "SELECT t.id, c.question, 3 + c.n "
+                    "FROM teams AS t "
+                    "CROSS JOIN unnest(%s::varchar[]) WITH ORDINALITY AS c(question, n) "
+                    "WHERE t.id %% 3 = 0 AND c.n <= 1 + t.id %% 3", (CUSTOM_QUESTIONS,))
+
+
+def generate_users(num_users: int, num_teams: int, seed: float) -> int:
+    # The team sizes follow a power law, 3% of the users are in no team and 2% left the bot.
+    return _execute("SELECT setseed(%(seed)s); "
+                    "INSERT INTO users (google_id, space, name, email, avatar_url, team_id, active) "
+                    "SELECT 'users/' || n, 'spaces/dm-' || n, "
+                    "       (%(first)s::varchar[])[1 + n %% cardinality(%(first)s::varchar[])] || ' ' || "
+                    "       (%(last)s::varchar[])[1 + n / 7 %% cardinality(%(last)s::varchar[])], "
+                    "       'user.' || n || '@example.com', 'https://example.com/avatar/' || n || '.png', "
+                    "       CASE WHEN random() < 0.03 THEN NULL "
+                    "            ELSE 1 + floor(%(teams)s * power(random(), 1.5))::int END, "
+                    "       random() >= 0.02 "
+                    "FROM generate_series(1, %(users)s) AS n",
+                    {'seed': seed, 'first': FIRST_NAMES, 'last': LAST_NAMES, 'teams': num_teams, 'users': num_users})
+
+
+def generate_schedules(seed: float) -> int:
+    # The schedules are created by a trigger, spread them between 07:00 and 10:30 and disable some weekdays.
+    return _execute("SELECT setseed(%s); "
+                    "UPDATE schedules "
+                    "SET time = '07:00'::time + floor(random() * 15) * interval '15 minutes', "
+                    "    enabled = CASE WHEN day IN ('Saturday', 'Sunday') THEN random() < 0.01 "
+                    "                   ELSE random() >= 0.05 END", (seed,))
+
+
+def generate_standups(day: int, seed: float) -> int:
+    """
+    Generate the standups of the day, 0 is today. Today only half of the users answered yet.
+    """
+    return _execute("SELECT setseed(%(seed)s); "
+                    "INSERT INTO standups (user_id, question_id, answer, added, message_id) "
+                    "SELECT u.id, q.id, "
+                    "       CASE WHEN q.question_order = 0 THEN NULL "
+                    "            ELSE (%(phrases)s::varchar[])[1 + abs(hashtext(u.id || ':' || q.id || ':' || %(day)s))"
+                    "                                          %% cardinality(%(phrases)s::varchar[])] || ' ' || "
+                    "                 (%(phrases)s::varchar[])[1 + abs(hashtext(q.id || ':' || u.id || ':' || %(day)s))"
+                    "                                          %% cardinality(%(phrases)s::varchar[])] END, "
+                    "       d.day + sch.time + q.question_order * interval '45 seconds', "
+                    "       CASE WHEN abs(hashtext(u.id || ':sent:' || %(day)s)) %% 10 != 0 "
+                    "            THEN 'spaces/team-' || u.team_id || '/messages/' || u.id || '-' || %(day)s END "
+                    "FROM (SELECT current_date - %(day)s AS day) AS d "
+                    "INNER JOIN users AS u ON u.active AND u.team_id IS NOT NULL "
+                    "INNER JOIN schedules AS sch ON sch.user_id = u.id AND sch.enabled "
+                    "           AND sch.day::text = trim(to_char(d.day, 'Day')) "
+                    "INNER JOIN questions AS q ON q.team_id = u.team_id "
+                    # Every user has a participation rate between 50% and 100%.
+                    "WHERE abs(hashtext(u.id || ':' || %(day)s)) %% 100 < 50 + abs(hashtext(u.id::text)) %% 50 "
+                    "      AND (%(day)s > 0 OR abs(hashtext(u.id || ':today')) %% 2 = 0)",
+                    {'seed': seed, 'phrases': PHRASES, 'day': day}, name='generate_standups')
+
+
+def generate_sessions(day: int) -> int:
+    """
+    Generate the standup sessions of the day from its standups. Only the sessions of today get the answers, like the
+    sessions of the days before after Database.reset_standup().
+    """
+    _execute("INSERT INTO standup_sessions (user_id, day, started, message_id) "
+             "SELECT s.user_id, current_date - %(day)s, min(s.added), max(s.message_id) "
+             "FROM standups AS s "
+             "WHERE s.added >= current_date - %(day)s AND s.added < current_date - %(day)s + 1 "
+             "GROUP BY s.user_id", {'day': day}, name='generate_sessions')
+    # Without statistics of the new rows the planner joins them with nested loops.
+    _execute("ANALYZE standups, standup_sessions", name='generate_sessions')
+    if day != 0:
+        return 0
+    return _execute("INSERT INTO standup_session_answers (session_id, question_id, answer, added) "
+                    "SELECT ss.id, s.question_id, s.answer, s.added "
+                    "FROM standups AS s "
+                    "INNER JOIN questions AS q ON q.id = s.question_id AND q.question_order != 0 "
+                    "INNER JOIN standup_sessions AS ss ON ss.user_id = s.user_id AND ss.day = current_date - %(day)s "
+                    "WHERE s.added >= current_date - %(day)s AND s.added < current_date - %(day)s + 1",
+                    {'day': day}, name='generate_sessions')
+
+
+def generate_processed_events(num_events: int, seed: float) -> int:
+    return _execute("SELECT setseed(%s); "
+                    "INSERT INTO processed_events (key, status, response, added) "
+                    "SELECT 'MESSAGE:spaces/dm-' || n || '/messages/' || n || ':' || n, 200, "
+                    "       convert_to(repeat('{\"text\": \"Thanks for your answer.\"}', 4), 'UTF8'), "
+                    "       NOW() - random() * interval '24 hours' "
+                    "FROM generate_series(1, %s) AS n", (seed, num_events))
+
+
+def analyze():
+    connection = Storage.get_connection()
+    try:
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("SET statement_timeout = 0")
+            cursor.execute("VACUUM ANALYZE")
+            cursor.execute("RESET statement_timeout")
+    finally:
+        connection.autocommit = False
+        Storage.release_connection(connection)
+
+
+def count_rows():
+    with Storage.transaction(name='count_rows') as connection:
+        with connection.cursor() as cursor:
+            counts = {}
+            for table in ('teams', 'users', 'schedules', 'questions', 'standups', 'standup_sessions',
+                          'conversation_cursors', 'processed_events'):
+                cursor.execute(f"SELECT count(*) FROM {table}")
+                counts[table], = cursor.fetchone()
+            return counts
+
+
+def generate(num_users: int, num_teams: int, num_days: int, num_events: int, seed: float = 0.42):
+    """
+    Fill an empty database.
+    :param num_days: The number of days with standups, including today.
+    """
+    start = time.perf_counter()
+    generate_teams(num_teams, seed)
+    generate_users(num_users, num_teams, seed)
+    generate_schedules(seed)
+    print(f"Teams, users and schedules: {time.perf_counter() - start:.1f} s")
+    rows = 0
+    for day in range(num_days):
+        rows += generate_standups(day, seed)
+        generate_sessions(day)
+        if day % 10 == 9 or day == num_days - 1:
+            print(f"Standups of {day + 1}/{num_days} days: {rows} rows, {time.perf_counter() - start:.1f} s")
+    # The conversations of today are at the question after the last answer.
+    _execute(DatabaseSchema.BUILD_CONVERSATION_CURSORS, name='generate_cursors')
+    generate_processed_events(num_events, seed)
+    # The statistics are maintained by the Storage functions, the generated standups bypass them.
+    Storage.rebuild_stats()
+    print(f"Statistics: {time.perf_counter() - start:.1f} s")
+    analyze()
+    print(f"Done in {time.perf_counter() - start:.1f} s: {count_rows()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic data.")
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--teams', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=200, help="Days of standups, including today.")
+    parser.add_argument('--events', type=int, default=50000, help="Processed events of the last 24 hours.")
+    parser.add_argument('--seed', type=float, default=0.42, help="Seed of the random generator, between -1 and 1.")
+    parser.add_argument('--reset', action='store_true', help="Drop all tables of the database first.")
+    args = parser.parse_args()
+
+    setup_logger(False, '')
+    # The bulk inserts are slow by design.
+    Instrumentation.SLOW_QUERY_MS = -1
+    if args.reset:
+        common.reset_database()
+    generate(args.users, args.teams, args.days, args.events, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+A stand-in for the Google Chat API, which answers spaces.messages.create/get/update/delete from memory, for benchmarks
+and tests without credentials and network access. Point the bot at it with CHAT_API_ROOT=http://HOST:PORT/.
+
+    python -m benchmarks.fake_chat --port 8085 --latency 0.05 --error-rate 0.01 --quota-rate 0.01
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Mapping, Optional
+
+_MESSAGE_SCHEMA = {
+    'id': 'Message',
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string'},
+        'text': {'type': 'string'},
+        'cards': {'type': 'array', 'items': {'type': 'object'}},
+        'createTime': {'type': 'string'},
+        'thread': {'type': 'object'}
+    }
+}
+
+_NAME = {'location': 'path', 'required': True, 'type': 'string', 'pattern': '^spaces/[^/]+/messages/[^/]+$'}
+
+# The subset of the discovery document of the Chat API, which is used by the bot.
+_METHODS = {
+    'create': {
+        'id': 'chat.spaces.messages.create',
+        'path': 'v1/{+parent}/messages',
+        'httpMethod': 'POST',
+        'parameters': {
+            'parent': {'location': 'path', 'required': True, 'type': 'string', 'pattern': '^spaces/[^/]+$'},
+            'threadKey': {'location': 'query', 'type': 'string'},
+            'requestId': {'location': 'query', 'type': 'string'}
+        },
+        'parameterOrder': ['parent'],
+        'request': {'$ref': 'Message'},
+        'response': {'$ref': 'Message'}
+    },
+    'get': {
+        'id': 'chat.spaces.messages.get',
+        'path': 'v1/{+name}',
+        'httpMethod': 'GET',
+        'parameters': {'name': _NAME},
+        'parameterOrder': ['name'],
+        'response': {'$ref': 'Message'}
+    },
+    'update': {
+        'id': 'chat.spaces.messages.update',
+        'path': 'v1/{+name}',
+        'httpMethod': 'PUT',
+        'parameters': {'name': _NAME, 'updateMask': {'location': 'query', 'type': 'string'}},
+        'parameterOrder': ['name'],
+        'request': {'$ref': 'Message'},
+        'response': {'$ref': 'Message'}
+    },
+    'delete': {
+        'id': 'chat.spaces.messages.delete',
+        'path': 'v1/{+name}',
+        'httpMethod': 'DELETE',
+        'parameters': {'name': _NAME},
+        'parameterOrder': ['name'],
+        'response': {'$ref': 'Empty'}
+    }
+}
+
+_MESSAGES_PATH = re.compile(r'^/v1/(spaces/[^/]+)/messages$')
+_MESSAGE_PATH = re.compile(r'^/v1/(spaces/[^/]+/messages/[^/]+)$')
+
+
+def discovery_document(root_url: str) -> Mapping:
+    return {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'id': 'chat:v1',
+        'name': 'chat',
+        'version': 'v1',
+        'protocol': 'rest',
+        'rootUrl': root_url,
+        'servicePath': '',
+        'baseUrl': root_url,
+        'batchPath': 'batch',
+        'parameters': {},
+        'schemas': {'Message': _MESSAGE_SCHEMA, 'Empty': {'id': 'Empty', 'type': 'object', 'properties': {}}},
+        'resources': {'spaces': {'resources': {'messages': {'methods': _METHODS}}}}
+    }
+
+
+class FakeChatServer:
+    """
+    The fake Chat API server, which runs in a background thread.
+    :param latency: The latency of every API call in seconds.
+    :param jitter: A random latency of up to this many seconds, which is added to the latency.
+    :param error_rate: The fraction of the API calls, which fail with 500.
+    :param quota_rate: The fraction of the API calls, which are rejected with 429 (quota exceeded).
+    :param on_request: Called with the method id and the parent or name of every accepted API call.
+    :param seed: The seed of the random faults.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, quota_rate: float = 0.0,
+                 on_request: Optional[Callable[[str, str], None]] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.on_request = on_request
+        self.messages = {}
+        self.counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> 'FakeChatServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-chat', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeChatServer':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self) -> Mapping[str, int]:
+        with self._lock:
+            return dict(self.counts, messages=len(self.messages))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _fault(self) -> Optional[int]:
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            draw = self._random.random()
+        if delay:
+            time.sleep(delay)
+        if draw < self.quota_rate:
+            return 429
+        if draw < self.quota_rate + self.error_rate:
+            return 500
+        return None
+
+    def handle(self, method: str, path: str, body: Optional[Mapping]) -> tuple:
+        """
+        Answer an API call.
+        :return: The status and the response body.
+        """
+        match = _MESSAGES_PATH.match(path)
+        if match and method == 'POST':
+            method_id, resource = _METHODS['create']['id'], match.group(1)
+        else:
+            match = _MESSAGE_PATH.match(path)
+            if not match or method not in ('GET', 'PUT', 'PATCH', 'DELETE'):
+                return 404, _error(404, f"Method not found: {method} {path}", 'NOT_FOUND')
+            action = {'GET': 'get', 'PUT': 'update', 'PATCH': 'update', 'DELETE': 'delete'}[method]
+            method_id, resource = _METHODS[action]['id'], match.group(1)
+
+        status = self._fault()
+        if status == 429:
+            self._count('quota_exceeded')
+            return 429, _error(429, "Quota exceeded for quota metric 'Write requests'.", 'RESOURCE_EXHAUSTED')
+        if status == 500:
+            self._count('errors')
+            return 500, _error(500, "Internal error encountered.", 'INTERNAL')
+
+        self._count(method_id)
+        if self.on_request is not None:
+            self.on_request(method_id, resource)
+        with self._lock:
+            if method_id == _METHODS['create']['id']:
+                name = f"{resource}/messages/{next(self._ids)}"
+                message = dict(body or {}, name=name, createTime=datetime.now(timezone.utc).isoformat())
+                self.messages[name] = message
+                return 200, message
+            message = self.messages.get(resource)
+            if message is None:
+                return 404, _error(404, f"Message {resource} not found.", 'NOT_FOUND')
+            if method_id == _METHODS['delete']['id']:
+                del self.messages[resource]
+                return 200, {}
+            if method_id == _METHODS['update']['id']:
+                message.update({key: value for key, value in (body or {}).items() if key != 'name'})
+            return 200, message
+
+
+def _error(code: int, message: str, status: str) -> Mapping:
+    return {'error': {'code': code, 'message': message, 'status': status}}
+
+
+def _make_handler(server: FakeChatServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _respond(self, status: int, body: Mapping):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self):
+            path = self.path.split('?', 1)[0]
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            if self.command == 'GET' and path == '/$discovery/rest':
+                host = self.headers.get('Host') or '{}:{}'.format(*self.server.server_address[:2])
+                self._respond(200, discovery_document(f"http://{host}/"))
+            elif self.command == 'GET' and path == '/fake/stats':
+                self._respond(200, server.stats())
+            else:
+                self._respond(*server.handle(self.command, path, body))
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Google Chat API server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8085)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latency of every call in seconds.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random additional latency in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of the calls which fail with 500.")
+    parser.add_argument('--quota-rate', type=float, default=0.0, help="Fraction of the calls rejected with 429.")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = FakeChatServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.quota_rate,
+                            seed=args.seed)
+    print(f"Fake Chat API at {server.url}, set CHAT_API_ROOT={server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
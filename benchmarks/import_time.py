@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Reports the cold start time of the endpoint and the scheduler, broken down by the imported top-level packages.
+It uses the import time profiler of Python (python -X importtime) in a fresh interpreter per run.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module bot.trigger_standup_dialog --top 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Mapping, Tuple
+
+MODULES = ['bot.endpoint', 'bot.trigger_standup_dialog']
+
+
+def measure(module: str) -> Tuple[float, Mapping[str, float]]:
+    """
+    Import the module in a new interpreter.
+    :return: The total import time in milliseconds, and the import time per package. The modules of the bot are
+             listed individually, all other modules are grouped by their top-level package.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        # E.g. 'import time:       250 |      12061 |   flask'
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if not name.startswith('bot.'):
+            name = name.split('.')[0]
+        packages[name] += int(self_time) / 1000
+    return sum(packages.values()), packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time by package.")
+    parser.add_argument('--module', action='append', help="The module to import, can be repeated.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.module or MODULES:
+        runs = [measure(module) for _ in range(args.runs)]
+        totals = [total for total, _ in runs]
+        packages = defaultdict(list)
+        for _, run in runs:
+            for name, duration in run.items():
+                packages[name].append(duration)
+
+        print(f"{module}: median {statistics.median(totals):.1f} ms, min {min(totals):.1f} ms "
+              f"({args.runs} runs)")
+        ranking = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+        for name, durations in ranking[:args.top]:
+            print(f"  {name:<30}{statistics.median(durations):>10.1f} ms")
+        print()
+
+
+if __name__ == '__main__':
+    main()
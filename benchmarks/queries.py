@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Times every function of bot/utils/storage/Database.py against the database configured by the DB_* environment
+variables, e.g. filled by benchmarks/data_generator.py, and captures the query plans of their statements. Functions
+whose plan reads a flagged table (by default standups) with a sequential scan are reported.
+
+    python -m benchmarks.queries --repeat 20 --output queries.json
+    python -m benchmarks.queries --analyze --fail-on-seq-scan
+
+Every call runs in its own transaction, which is rolled back, so the writing functions do not change the data.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, List, Mapping, NamedTuple, Sequence
+
+import psycopg2
+import psycopg2.extensions
+
+import benchmarks.common as common
+import bot.utils.storage.Database as Database
+import bot.utils.storage.Instrumentation as Instrumentation
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import setup_logger
+from bot.utils.Search import SearchQuery
+from bot.utils.Team import Team
+from bot.utils.User import User
+
+
+class RecordingCursor(Instrumentation.InstrumentedCursor):
+    """
+    Cursor, which records the executed statements, to explain them afterwards.
+    """
+    statements = []
+
+    def execute(self, query, params=None):
+        RecordingCursor.statements.append((query, params))
+        return super().execute(query, params)
+
+
+class Sample(NamedTuple):
+    """
+    The parameters of the benchmarked calls, taken from the data: an active user of the largest team with a standup
+    today.
+    """
+    user: User
+    team: Team
+    question_id: int
+    question_order: int
+    processed_event: str
+
+
+def get_sample(connection) -> Sample:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT u.id, u.google_id, u.name, u.email, u.avatar_url, u.space, t.id, t.name, t.space "
+                       "FROM users AS u "
+                       "INNER JOIN teams AS t ON t.id = u.team_id "
+                       "INNER JOIN (SELECT team_id, count(*) AS size FROM users GROUP BY team_id) AS m "
+                       "           ON m.team_id = t.id "
+                       "WHERE u.active AND EXISTS (SELECT 1 FROM standup_sessions AS ss "
+                       "                           WHERE ss.user_id = u.id AND ss.day = current_date) "
+                       "ORDER BY m.size DESC, u.id "
+                       "LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            raise SystemExit("No active user with a standup today, fill the database with benchmarks.data_generator.")
+        id_, google_id, name, email, avatar_url, space, team_id, team_name, team_space = row
+        cursor.execute("SELECT id, question_order FROM questions "
+                       "WHERE team_id = %s AND question_order > 0 ORDER BY question_order LIMIT 1", (team_id,))
+        question_id, question_order = cursor.fetchone()
+        cursor.execute("SELECT key FROM processed_events ORDER BY added DESC LIMIT 1")
+        event, = cursor.fetchone() or ('MESSAGE:none',)
+    return Sample(User(id_, google_id, name, email, avatar_url, space, True, team_name),
+                  Team(team_id, team_name, team_space), question_id, question_order, event)
+
+
+def cases(sample: Sample) -> Mapping[str, Callable]:
+    """
+    The benchmarked calls per Database function.
+    """
+    user, team, google_id = sample.user, sample.team, sample.user.google_id
+    return {
+        'add_user': lambda c: Database.add_user(c, user),
+        'disable_user': lambda c: Database.disable_user(c, user),
+        'add_team': lambda c: Database.add_team(c, 'Benchmark team'),
+        'get_teams': lambda c: Database.get_teams(c),
+        'join_team': lambda c: Database.join_team(c, google_id, team.name),
+        'leave_team': lambda c: Database.leave_team(c, google_id),
+        'remove_team': lambda c: Database.remove_team(c, team.name),
+        'join_room_to_team': lambda c: Database.join_room_to_team(c, team.name, 'spaces/benchmark'),
+        'leave_team_with_room': lambda c: Database.leave_team_with_room(c, team.space),
+        'get_team_of_user': lambda c: Database.get_team_of_user(c, google_id),
+        'get_users': lambda c: Database.get_users(c, team.name),
+        'get_users(all)': lambda c: Database.get_users(c, ''),
+        'get_questions': lambda c: Database.get_questions(c, google_id),
+        'get_question': lambda c: Database.get_question(c, sample.question_id),
+        'add_question': lambda c: Database.add_question(c, google_id, "Benchmark question?", team),
+        'remove_question': lambda c: Database.remove_question(c, sample.question_id),
+        'reorder_questions': lambda c: Database.reorder_questions(c, team.id_, sample.question_id, 1),
+        'get_current_question': lambda c: Database.get_current_question(c, google_id),
+        'reset_standup': lambda c: Database.reset_standup(c, google_id),
+        # After the restart of the standup, the conversation is at the first question.
+        'reset_standup+add_standup_answer': lambda c: (Database.reset_standup(c, google_id),
+                                                       Database.add_standup_answer(c, google_id, "Benchmark answer.")),
+        'get_standup_answers': lambda c: Database.get_standup_answers(c, google_id),
+        'get_standup_answer_message_id': lambda c: Database.get_standup_answer_message_id(c, google_id),
+        'set_message_id': lambda c: Database.set_message_id(c, google_id, 'spaces/benchmark/messages/1'),
+        'get_user_stats': lambda c: Database.get_user_stats(c, google_id),
+        'get_team_stats': lambda c: Database.get_team_stats(c, team, 30),
+        'get_team_of_room': lambda c: Database.get_team_of_room(c, team.space),
+        'search_answers': lambda c: Database.search_answers(c, SearchQuery('migration database'), 6),
+        'search_answers(team)': lambda c: Database.search_answers(c, SearchQuery('pay', team.name), 6),
+        'get_users_with_schedule': lambda c: Database.get_users_with_schedule(c, 'Monday', '09:00:00'),
+        'enable_schedule': lambda c: Database.enable_schedule(c, google_id, 'Monday', True),
+        'update_schedule_time': lambda c: Database.update_schedule_time(c, google_id, 'Monday', '09:00:00'),
+        'get_schedules': lambda c: Database.get_schedules(c, google_id),
+        'get_processed_event': lambda c: Database.get_processed_event(c, sample.processed_event),
+        'add_processed_event': lambda c: Database.add_processed_event(c, 'MESSAGE:benchmark', 200, b'{}'),
+        'remove_processed_events': lambda c: Database.remove_processed_events(c, 24),
+        'get_schema_version': lambda c: Database.get_schema_version(c)
+    }
+
+
+def _plan_nodes(node: Mapping) -> List[Mapping]:
+    nodes = [node]
+    for child in node.get('Plans', []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def explain(connection, statements: Sequence, analyze: bool) -> List[Mapping]:
+    """
+    Explain the statements, within the rolled back transaction of the call.
+    :return: The plans in JSON format.
+    """
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    plans = []
+    with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        for query, params in statements:
+            cursor.execute(f"EXPLAIN ({options}) ".encode('utf-8') + Instrumentation._as_bytes(query), params)
+            plan, = cursor.fetchone()
+            plans.append(plan[0] if isinstance(plan, list) else json.loads(plan)[0])
+    return plans
+
+
+def seq_scans(plans: Sequence[Mapping], tables: Sequence[str]) -> List[str]:
+    """
+    Get the flagged tables, which are read with a sequential scan.
+    """
+    return sorted({node['Relation Name'] for plan in plans for node in _plan_nodes(plan['Plan'])
+                   if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in tables})
+
+
+def run_case(call: Callable, repeat: int, analyze: bool, tables: Sequence[str]) -> Mapping:
+    connection = Storage.get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET statement_timeout = 0")
+        connection.commit()
+
+        # The first call is not timed, it records the statements and warms up the cache.
+        connection.cursor_factory = RecordingCursor
+        RecordingCursor.statements = []
+        try:
+            call(connection)
+            plans = explain(connection, RecordingCursor.statements, analyze)
+        finally:
+            connection.cursor_factory = Instrumentation.InstrumentedCursor
+            connection.rollback()
+
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                call(connection)
+            finally:
+                durations.append(time.perf_counter() - start)
+                connection.rollback()
+        with connection.cursor() as cursor:
+            cursor.execute("RESET statement_timeout")
+        connection.commit()
+    except Exception:
+        Storage.release_connection(connection, discard=True)
+        raise
+    Storage.release_connection(connection)
+
+    result = dict(common.percentiles(durations))
+    result['statements'] = len(plans)
+    result['seq_scans'] = seq_scans(plans, tables)
+    result['plans'] = plans
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the database functions and capture their query plans.")
+    parser.add_argument('--repeat', type=int, default=10, help="Timed calls per function.")
+    parser.add_argument('--only', action='append', help="Benchmark only this function, can be repeated.")
+    parser.add_argument('--analyze', action='store_true', help="Capture the plans with EXPLAIN ANALYZE.")
+    parser.add_argument('--flag-table', action='append', help="Flag sequential scans of this table, "
+                                                              "can be repeated (default: standups).")
+    parser.add_argument('--fail-on-seq-scan', action='store_true', help="Exit with 1 if a function is flagged.")
+    parser.add_argument('--output', help="Write the results and the plans to this JSON file.")
+    args = parser.parse_args()
+
+    setup_logger(False, '')
+    # The timings are reported below, the slow query log would only add noise.
+    Instrumentation.SLOW_QUERY_MS = -1
+    tables = args.flag_table or ['standups']
+
+    with Storage.transaction(name='get_sample') as connection:
+        sample = get_sample(connection)
+    results = {}
+    for name, call in cases(sample).items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            results[name] = run_case(call, args.repeat, args.analyze, tables)
+        except psycopg2.Error as e:
+            print(f"{name}: {type(e).__name__}: {str(e).strip()}")
+
+    print(f"{'':<32}{'stmts':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}  [ms]  sequential scans")
+    for name, result in results.items():
+        print(f"{name:<32}{result['statements']:>6}" +
+              ''.join(f"{result[key]:>10.2f}" for key in ('mean_ms', 'p50_ms', 'p95_ms', 'max_ms')) +
+              f"  {', '.join(result['seq_scans'])}")
+    flagged = [name for name, result in results.items() if result['seq_scans']]
+    for name in flagged:
+        print(f"Sequential scan: {name} reads {', '.join(results[name]['seq_scans'])}")
+    if args.output:
+        common.write_json(args.output, {'config': vars(args), 'functions': results})
+    if flagged and args.fail_on_seq_scan:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Replays Google Chat events through the /api/v1/ route of the app, with the authentication and the Chat API stubbed,
+against the local Postgres database configured by the DB_* environment variables. Reports the throughput and the
+latency percentiles per event type, slash command and card action.
+
+    python -m benchmarks.replay --reset --users 200 --teams 10 --questions 5 --output results.json
+    python -m benchmarks.replay --reset --events recorded.jsonl --baseline results.json
+
+The synthetic events cover ADDED_TO_SPACE, the slash commands, the standup answers and the card actions. Recorded
+events are read from a JSON lines file, one Google Chat event per line, and replayed in order.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Mapping, Sequence, Tuple
+
+import benchmarks.common as common
+from bot.utils.Logger import setup_logger
+
+# Latency regressions below this difference are considered noise.
+MIN_REGRESSION_MS = 1.0
+
+
+def team_name(team: int) -> str:
+    return f"Team {team}"
+
+
+def room(team: int) -> str:
+    return f"spaces/team-{team}"
+
+
+def setup_events(num_users: int, num_teams: int, num_questions: int) -> List[dict]:
+    """
+    The events to create the teams, rooms, users and questions.
+    """
+    events = []
+    for team in range(num_teams):
+        events.append(common.added_to_space(0, room=room(team)))
+        events.append(common.command(0, 1, team_name(team)))
+        events.append(common.click(0, 'join_team', [('team', team_name(team))], room=room(team)))
+    for user in range(num_users):
+        events.append(common.added_to_space(user))
+        events.append(common.click(user, 'join_team', [('team', team_name(user % num_teams))]))
+    for team in range(min(num_teams, num_users)):
+        for question in range(num_questions):
+            events.append(common.command(team, 14, f"Question {question}: What did you do yesterday? 🤔"))
+    return events
+
+
+def user_events(user: int, num_questions: int) -> List[dict]:
+    """
+    The events of one round of a user: the read-only commands, the schedule settings and a standup.
+    """
+    events = [common.command(user, command_id) for command_id in (3, 10, 13, 15, 16, 17, 7)]
+    events.append(common.command(user, 5, team_name(0)))
+    events.append(common.command(user, 9, "monday 09:00:00"))
+    events.append(common.command(user, 18, "answer"))
+    events.append(common.click(user, 'enable_schedule', [('day', 'Monday'), ('enable', 'True')]))
+    events.append(common.command(user, 6))
+    for question in range(num_questions):
+        events.append(common.message(user, f"Answer {question} of user {user}."))
+    events.append(common.click(user, 'send_answers'))
+    return events
+
+
+def recorded_events(path: str, keep_ids: bool) -> List[Tuple[str, List[dict]]]:
+    """
+    Read the recorded events and group them by user, the events of a user are replayed in order.
+    Unless keep_ids is set, the event times are replaced, so that the events are not answered as retries.
+    """
+    users = defaultdict(list)
+    for index, event in enumerate(common.read_jsonl(path)):
+        if not keep_ids:
+            event['eventTime'] = f"2023-01-09T09:00:00.{index:06d}Z"
+        users[event['user']['name']].append(event)
+    return list(users.items())
+
+
+def replay(events: Sequence[dict], recorder: common.Recorder):
+    import bot.endpoint as endpoint
+
+    client = endpoint.app.test_client()
+    for event in events:
+        start = time.perf_counter()
+        response = client.post('/api/v1/', json=event)
+        recorder.add(common.label(event), time.perf_counter() - start, response.status_code != 200)
+
+
+def run(groups: Iterable[Sequence[dict]], concurrency: int, recorder: common.Recorder) -> float:
+    """
+    Replay the groups of events concurrently, the events of a group in order.
+    :return: The duration in seconds.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(replay, group, recorder) for group in groups]:
+            future.result()
+    return time.perf_counter() - start
+
+
+def compare(results: Mapping, baseline: Mapping, tolerance: float) -> List[str]:
+    """
+    Compare the p95 latency per event type with a baseline.
+    :return: The regressions.
+    """
+    regressions = []
+    for name, result in results['types'].items():
+        previous = baseline.get('types', {}).get(name)
+        if not previous or not previous.get('count') or not result['count']:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance) \
+                and result['p95_ms'] - previous['p95_ms'] > MIN_REGRESSION_MS:
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Google Chat events through the app.")
+    parser.add_argument('--events', help="JSON lines file with recorded events, instead of the synthetic events.")
+    parser.add_argument('--keep-ids', action='store_true', help="Keep the event times of the recorded events.")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--teams', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--chat-latency', type=float, default=0.0, help="Latency of the Chat API in seconds.")
+    parser.add_argument('--chat-server', action='store_true', help="Call the Chat API of a local fake server.")
+    parser.add_argument('--reset', action='store_true', help="Drop all tables of the database first.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare the results with a previous JSON file.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative p95 increase.")
+    args = parser.parse_args()
+
+    setup_logger(False, '')
+    common.stub_authentication()
+    common.stub_chat(args.chat_latency, server=args.chat_server)
+    if args.reset:
+        common.reset_database()
+
+    recorder = common.Recorder()
+    if args.events:
+        groups = [events for _, events in recorded_events(args.events, args.keep_ids)]
+        duration = run(groups, args.concurrency, recorder)
+    else:
+        setup = setup_events(args.users, args.teams, args.questions)
+        duration = run([setup], 1, recorder)
+        for _ in range(args.rounds):
+            groups = [user_events(user, args.questions) for user in range(args.users)]
+            duration += run(groups, args.concurrency, recorder)
+
+    report = recorder.report()
+    total = sum(result['count'] for result in report.values())
+    errors = sum(result['errors'] for result in report.values())
+    results = {
+        'config': vars(args),
+        'events': total,
+        'errors': errors,
+        'duration_s': duration,
+        'throughput_eps': total / duration if duration else 0.0,
+        'types': report
+    }
+    common.print_report(report)
+    print(f"\n{total} events, {errors} errors, {duration:.2f} s, {results['throughput_eps']:.1f} events/s")
+    if args.output:
+        common.write_json(args.output, results)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
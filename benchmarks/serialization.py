@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compares the serialization time of large cards with flask.json.jsonify, the standard library json module and the
+response path of bot.utils.Json.
+
+    python -m benchmarks.serialization --teams 500 --users 2000 --questions 200
+"""
+
+import argparse
+import json
+import timeit
+
+from flask import Flask, json as flask_json
+
+import bot.utils.Cards as Cards
+import bot.utils.Json as Json
+from bot.utils.Question import Question
+from bot.utils.Team import Team
+from bot.utils.User import User
+
+
+def get_cards(num_teams: int, num_users: int, num_questions: int):
+    teams = [Team(i, f"Team {i} 🚀", f"spaces/team-{i}" if i % 2 else None) for i in range(num_teams)]
+    users = [User(i, f"users/{i}", f"User Ünicode {i}", f"user.{i}@example.com",
+                  f"https://example.com/avatar/{i}.png", f"spaces/user-{i}", bool(i % 3), f"Team {i % num_teams}")
+             for i in range(num_users)]
+    questions = [Question(i, 1, f"Question {i}: What (if anything) is blocking your progress? 🤔", i + 1)
+                 for i in range(num_questions)]
+    return {
+        'team list': Cards.get_team_list_card(teams),
+        'team remove': Cards.get_team_remove_card(teams, True),
+        'user list': Cards.get_user_list_card(users),
+        'question list': Cards.get_question_list_card(questions),
+        'question reorder': Cards.get_question_reorder_card(questions, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serialization of card responses.")
+    parser.add_argument('--teams', type=int, default=500)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    cards = get_cards(args.teams, args.users, args.questions)
+    encoders = {
+        'flask jsonify': lambda card: flask_json.jsonify(card).get_data(),
+        'json.dumps': lambda card: json.dumps(card, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        'Json.response': lambda card: Json.response(card).get_data(),
+    }
+    print(f"JSON encoder: {'orjson' if Json.orjson is not None else 'json (orjson is not installed)'}")
+    print(f"{'card':<18}{'size [kB]':>12}" + ''.join(f"{name + ' [ms]':>22}" for name in encoders))
+    with app.app_context():
+        for name, card in cards.items():
+            assert json.loads(Json.dumps(card)) == card
+            size = len(Json.dumps(card)) / 1024
+            timings = [min(timeit.repeat(lambda: encode(card), number=args.repeat, repeat=3)) / args.repeat * 1000
+                       for encode in encoders.values()]
+            print(f"{name:<18}{size:>12.1f}" + ''.join(f"{timing:>22.3f}" for timing in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Move the standups older than a number of days out of the standups table, into the table standups_archive or into
+compressed JSON lines files, e.g. nightly by cron:
+
+    python3 /root/bot/archive_standups.py --older-than 365 --max-seconds 600
+    python3 /root/bot/archive_standups.py --older-than 365 --output-dir /root/logs/archive
+
+The standups are moved in small batches, one transaction each, with a pause in between, so the table is never locked
+for long and the WAL grows slowly. An interrupted run is resumed by the next one. Every run which moves standups
+writes a new file standups-YYYYmmdd-HHMMSS.jsonl.gz, each batch is flushed to disk before it is deleted from the
+database.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional, Sequence, Tuple
+
+import bot.utils.Json as Json
+import bot.utils.Metrics as Metrics
+import bot.utils.storage.Database as Database
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import fields, logger, setup_logger
+
+# The age in days of the standups, which are archived.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 365)
+# The interval in seconds of the progress log.
+PROGRESS_INTERVAL = 10
+
+ARCHIVED = Metrics.counter('standup_bot_archived_standups_total', "Standups moved out of the standups table.")
+ARCHIVE_LAST_RUN = Metrics.gauge('standup_bot_archive_last_run_timestamp_seconds',
+                                 "Unix time of the last completed run of the archive job.")
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveFile:
+    """
+    A gzip compressed JSON lines file with one standup per line. The batches are flushed to disk when they are written,
+    so the file of an interrupted run can be read up to its last batch.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._raw = open(path, 'xb')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='wb')
+
+    def write(self, rows: Sequence[Tuple]):
+        for row in rows:
+            values = dict(zip(Database.ARCHIVE_COLUMNS, row))
+            values['added'] = values['added'].isoformat()
+            self._file.write(Json.dumps(values) + b'\n')
+        self._file.flush()
+        os.fsync(self._raw.fileno())
+
+    def close(self):
+        self._file.close()
+        self._raw.close()
+
+
+def _run_batches(name: str, batch: Callable[[], Optional[int]], batch_size: int, pause: float, start: float,
+                 max_seconds: float, total: Optional[int] = None) -> Tuple[int, bool]:
+    """
+    Run the batches until one is not full, or the time is up.
+    :return: The number of processed rows, and whether all rows are done.
+    :raise ArchiveError: If a batch failed.
+    """
+    done, last_progress = 0, time.monotonic()
+    while True:
+        count = batch()
+        if count is None:
+            raise ArchiveError(f"Could not archive a batch of {name}, {done} were done.")
+        done += count
+        now = time.monotonic()
+        if count < batch_size:
+            return done, True
+        if now - last_progress >= PROGRESS_INTERVAL:
+            last_progress = now
+            rate = done / (now - start)
+            logger.info("Archived %d of %s %s, %.0f per second.", done, total if total is not None else '?', name,
+                        rate, extra=fields('archive', table=name, moved=done, total=total, rate=round(rate)))
+        if max_seconds and now - start >= max_seconds:
+            logger.info("Stopped after %.0f seconds, the next run continues.", now - start)
+            return done, False
+        time.sleep(pause)
+
+
+def archive(before: datetime, batch_size: int = 1000, pause: float = 0.5, max_seconds: float = 0,
+            output_dir: Optional[str] = None) -> int:
+    """
+    Move the standups added before the given time out of the standups table. Then the standup sessions of the days
+    before are deleted, the archived standups keep their message ids.
+    :param pause: The seconds to wait between the batches.
+    :param max_seconds: Stop after this many seconds, the next run continues. 0 runs until all standups are moved.
+    :param output_dir: Write the standups to a new file in this directory, instead of the archive table.
+    :return: The number of moved standups.
+    :raise ArchiveError: If a batch failed. The standups of the previous batches stay archived.
+    """
+    start = time.monotonic()
+    total = Storage.count_standups_before(before=before)
+    logger.info("Archive the standups before %s: %s to move.", before.isoformat(timespec='seconds'), total,
+                extra=fields('archive', before=before.isoformat(), total=total))
+    archive_file = None
+
+    def write(rows: Sequence[Tuple]):
+        # The file is created with the first batch, a run without standups leaves no empty file behind.
+        nonlocal archive_file
+        if archive_file is None:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            archive_file = ArchiveFile(Path(output_dir) /
+                                       f"standups-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        archive_file.write(rows)
+
+    def archive_batch():
+        if output_dir:
+            count = Storage.archive_standups_to(before=before, batch_size=batch_size, write=write)
+        else:
+            count = Storage.archive_standups(before=before, batch_size=batch_size)
+        ARCHIVED.inc(count or 0)
+        return count
+
+    try:
+        moved, is_done = _run_batches('standups', archive_batch, batch_size, pause, start, max_seconds, total)
+    finally:
+        if archive_file:
+            archive_file.close()
+    sessions = 0
+    if is_done:
+        sessions, is_done = _run_batches('sessions', lambda: Storage.delete_standup_sessions(
+            before=before.date(), batch_size=batch_size), batch_size, pause, start, max_seconds)
+    duration = time.monotonic() - start
+    logger.info("Archived %d standups%s and deleted %d sessions in %.1f seconds.", moved,
+                f" to {archive_file.path}" if archive_file else '', sessions, duration,
+                extra=fields('archive', moved=moved, total=total, sessions=sessions, duration_s=round(duration, 1)))
+    if is_done:
+        ARCHIVE_LAST_RUN.set(time.time())
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move the old standups out of the standups table.")
+    parser.add_argument('--older-than', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"Archive the standups older than this many days (default {ARCHIVE_AFTER_DAYS}).")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Standups moved per transaction.")
+    parser.add_argument('--pause', type=float, default=0.5, help="Seconds to wait between the batches.")
+    parser.add_argument('--max-seconds', type=float, default=0, help="Stop after this many seconds, 0 for no limit.")
+    parser.add_argument('--output-dir', help="Write the standups to a compressed JSON lines file in this directory, "
+                                             "instead of the table standups_archive.")
+    args = parser.parse_args()
+
+    setup_logger(True, '')
+    Metrics.restore_snapshot('archive')
+    before = datetime.combine(datetime.now().date() - timedelta(days=args.older_than), datetime.min.time())
+    try:
+        archive(before, args.batch_size, args.pause, args.max_seconds, args.output_dir)
+    except ArchiveError as e:
+        logger.error("%s The next run continues.", e)
+        sys.exit(1)
+    finally:
+        Metrics.write_snapshot('archive')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,52 @@
 #!/usr/bin/env python3
 
 import os
+import signal
+from typing import Optional
 
-from flask import Flask, request, json, Response, send_from_directory
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+from flask import Flask, request, Response, send_from_directory
+from google.auth import exceptions, jwt
 
 import bot.events.AddedToSpace as AddedToSpace
 import bot.events.RemovedFromSpace as RemovedFromSpace
 import bot.events.CardClicked as CardClicked
 import bot.events.Message as Message
+import bot.utils.Background as Background
+import bot.utils.CardCache as CardCache
+import bot.utils.Deadline as Deadline
+import bot.utils.Health as Health
+import bot.utils.Idempotency as Idempotency
+import bot.utils.Json as Json
+import bot.utils.Metrics as Metrics
+import bot.utils.Profiling as Profiling
+import bot.utils.Tracing as Tracing
 import bot.utils.storage.Storage as Storage
-from bot.utils.Logger import setup_logger
+from bot.utils.Logger import fields, logger, setup_logger
 from bot.utils.User import User
+from bot.utils.auth.Certificates import CertificateCache
+from bot.utils.auth.TokenCache import TokenCache
 
 app = Flask(__name__, static_url_path='')
 
 CHAT_ISSUER = 'chat@system.gserviceaccount.com'
 PUBLIC_CERT_URL_PREFIX = 'https://www.googleapis.com/service_accounts/v1/metadata/x509/'
 AUDIENCE = os.environ.get('AUDIENCE', '')
+# Google Chat waits 30 seconds for the response to an event, keep a margin for the network.
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', 25))
+
+# Protects the metrics with a bearer token, if set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+EVENT_TYPES = ('ADDED_TO_SPACE', 'REMOVED_FROM_SPACE', 'MESSAGE', 'CARD_CLICKED')
+
+EVENT_DURATION = Metrics.histogram('standup_bot_event_duration_seconds', "Duration of the event handling.", ['type'])
+EVENTS_REPLAYED = Metrics.counter('standup_bot_events_replayed_total',
+                                  "Retried events answered with the previous response.", ['type'])
+EVENTS_UNAUTHORIZED = Metrics.counter('standup_bot_events_unauthorized_total', "Events with invalid credentials.")
+
+chat_certificates = CertificateCache(PUBLIC_CERT_URL_PREFIX + CHAT_ISSUER)
+verified_tokens = TokenCache(max_size=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
+processed_events = Idempotency.ResponseCache(max_size=int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 4096)),
+                                             persist=os.environ.get('IDEMPOTENCY_PERSIST', 'true').lower() == 'true')
 
 
 def get_user_from_event(event) -> User:
@@ -31,19 +59,31 @@ def get_user_from_event(event) -> User:
 
 
 def is_authentication_ok() -> bool:
-    app.logger.info(AUDIENCE)
     auth_header = request.headers.get('Authorization')
     auth_token = ''
     if auth_header:
         auth_token = auth_header.split(' ')[1]
     try:
-        id_info = id_token.verify_token(auth_token, google_requests.Request(), AUDIENCE,
-                                        certs_url=PUBLIC_CERT_URL_PREFIX + CHAT_ISSUER)
+        id_info = verified_tokens.get(auth_token)
+        is_cached = id_info is not None
+        if not is_cached:
+            key_id = jwt.decode_header(auth_token).get('kid')
+            certs = chat_certificates.get(key_id)
+            id_info = jwt.decode(auth_token, certs=certs, audience=AUDIENCE)
+        # Check the audience and issuer also for cached tokens.
+        if id_info.get('aud') != AUDIENCE:
+            logger.error("Invalid audience.")
+            return False
         if id_info['iss'] != CHAT_ISSUER:
-            app.logger.error("Invalid issuer.")
+            logger.error("Invalid issuer.")
             return False
+        if not is_cached:
+            verified_tokens.put(auth_token, id_info)
     except ValueError:
-        app.logger.error("Invalid credentials.")
+        logger.error("Invalid credentials.")
+        return False
+    except exceptions.GoogleAuthError as e:
+        logger.error("Could not verify the credentials: %s", e)
         return False
     return True
 
@@ -53,19 +93,72 @@ def on_event():
     """
     Handles an event from Google Chat.
     """
+    with Tracing.span('on_event', root=True) as span:
+        response = _on_event(span)
+        if span is not None:
+            span.set('status', response.status_code)
+        return response
 
+
+def _on_event(span: Optional[Tracing.Span]) -> Response:
     # Check the authorization.
-    if not is_authentication_ok():
+    with Tracing.span('auth'):
+        is_authenticated = is_authentication_ok()
+    if not is_authenticated:
+        EVENTS_UNAUTHORIZED.inc()
         return Response("Unauthorized.", status=401)
 
-    # Handle the request.
     event = request.get_json()
+    if span is not None:
+        span.set('type', event.get('type'))
+
+    # Google Chat retries events which were not answered in time. Answer a retry with the previous response,
+    # instead of e.g. storing the same standup answer twice.
+    key = Idempotency.get_key(event)
+    if key is None:
+        return handle_event(event)
+    previous = processed_events.begin(key)
+    if previous is not None:
+        status, body = previous
+        logger.info("Replaying the response to event %s.", key)
+        EVENTS_REPLAYED.inc(_event_type(event))
+        if span is not None:
+            span.set('replayed', True)
+        return Json.raw_response(body, status=status)
+    response = None
+    try:
+        response = handle_event(event)
+        return response
+    finally:
+        if response is not None and response.status_code < 500:
+            processed_events.finish(key, response.status_code, response.get_data())
+        else:
+            processed_events.finish(key)
+
+
+def _event_type(event) -> str:
+    # Limit the label values to the known types.
+    return event['type'] if event.get('type') in EVENT_TYPES else 'other'
+
+
+def handle_event(event) -> Response:
+    with EVENT_DURATION.time(_event_type(event)), Deadline.deadline(REQUEST_DEADLINE), \
+            Profiling.profile(event, request.headers):
+        try:
+            return _handle_event(event)
+        except Deadline.DeadlineExceeded:
+            # Nothing was stored, Google Chat retries the event. Server errors are not replayed to the retry.
+            logger.warning("The %s event could not be handled in time.", _event_type(event))
+            return Response("Deadline exceeded.", status=503)
+
+
+def _handle_event(event) -> Response:
     text = ''
     user = get_user_from_event(event)
     is_room = event['space']['type'] == 'ROOM'
     space = event['space']['name']
 
-    app.logger.info(f"The event: {event}")
+    logger.debug("The event.", extra=fields('event', type=event['type'], space=space, event=event))
     if event['type'] == 'ADDED_TO_SPACE':
         return AddedToSpace.handle_event(user, is_room)
 
@@ -81,7 +174,57 @@ def on_event():
     else:
         text = "Sorry, I don't know what to say."
 
-    return json.jsonify({'text': text})
+    return Json.response({'text': text})
+
+
+def is_metrics_token_ok() -> bool:
+    return not METRICS_TOKEN or request.headers.get('Authorization') == f"Bearer {METRICS_TOKEN}"
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Exports the metrics in the Prometheus text format.
+    """
+    if not is_metrics_token_ok():
+        return Response("Unauthorized.", status=401)
+    return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/healthz')
+def healthz():
+    """
+    Liveness check, the process is able to answer requests.
+    """
+    return Response("OK", mimetype='text/plain')
+
+
+@app.route('/readyz')
+def readyz():
+    """
+    Readiness check of the database, the Chat API credentials and the scheduler. Answers with 503 if a check failed,
+    so that the reverse proxy stops routing events to this instance.
+    """
+    is_ready, checks = Health.readiness()
+    return Json.response({'ready': is_ready, 'checks': checks}, status=200 if is_ready else 503)
+
+
+@app.route('/status')
+def status():
+    """
+    The utilisation of the pools, queues and caches of this process, e.g. for autoscaling decisions.
+    """
+    if not is_metrics_token_ok():
+        return Response("Unauthorized.", status=401)
+    return Json.response({
+        'pid': os.getpid(),
+        'uptime': round(Health.uptime(), 1),
+        'db_pool': Storage.pool_status(),
+        'background_queue': Background.pending(),
+        'processed_events': processed_events.stats(),
+        'token_cache': verified_tokens.stats(),
+        'card_cache': CardCache.size()
+    })
 
 
 @app.route('/static/<path:path>')
@@ -89,9 +232,21 @@ def static_dir(path):
     return send_from_directory("static", path)
 
 
-if __name__ == '__main__':
-    setup_logger(True, '')
+def init():
+    """
+    Set up the logger and migrate the database. Called once before serving, also by the master process of the
+    multi-process server (see gunicorn_config.py).
+    """
+    setup_logger(os.environ.get('LOG_LEVEL', 'INFO').upper() == 'DEBUG', '')
     Storage.update()
+    Metrics.start_writer()
+    Tracing.setup_tracing()
+
+
+if __name__ == '__main__':
+    init()
+    # Stop on SIGTERM, the stop signal of the container.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
     from waitress import serve
-    serve(app, host='0.0.0.0', port=5000)
+    serve(app, host='0.0.0.0', port=5000, threads=int(os.environ.get('WEB_THREADS', 4)))
     # app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,13 +1,16 @@
-from flask import json
 from typing import Any
 
+import bot.utils.CardCache as CardCache
 import bot.utils.Cards as Cards
+import bot.utils.Json as Json
 import bot.utils.User as User
 import bot.utils.storage.Storage as Storage
+import bot.utils.storage.Versions as Versions
 
 
 def handle_event(user: User, is_room: bool) -> Any:
     if not is_room:
         Storage.add_user(user=user)
-    teams = Storage.get_teams()
-    return json.jsonify(Cards.get_team_selection_card(teams, is_room, True))
+    return Json.raw_response(CardCache.render(
+        ('team_selection', is_room, True), Versions.TEAMS,
+        lambda: Cards.get_team_selection_card(Storage.get_teams(), is_room, True)))
@@ -1,37 +1,40 @@
+import os
+import socket
 from datetime import date
-from flask import json
 from typing import Any
 
+import bot.events.Message as Message
+import bot.utils.Background as Background
 import bot.utils.Cards as Cards
 import bot.utils.Chat as Chat
+import bot.utils.Deadline as Deadline
+import bot.utils.Json as Json
+import bot.utils.Search as Search
 import bot.utils.Team as Team
 import bot.utils.User as User
 import bot.utils.storage.Storage as Storage
-from bot.utils.Logger import logger
+from bot.utils.Logger import fields, logger
+from bot.utils.Registry import DM_ONLY, Registry
+
+UNKNOWN_ACTION = "🤔 Sorry, I don't know this action."
+
+# The minimum time in seconds before the deadline to publish the standup answers before answering.
+MIN_PUBLISH_BUDGET = float(os.environ.get('MIN_PUBLISH_BUDGET', 5))
+
+actions = Registry('actions', {DM_ONLY: "🤕 Sorry, something went wrong."})
 
 
 def handle_event(event, user: User, space: str, is_room: bool) -> Any:
-    # Join team.
-    if event['action']['actionMethodName'] == 'join_team':
-        return join_team(event, user, space, is_room)
-    # Remove team.
-    if event['action']['actionMethodName'] == 'remove_team':
-        return remove_team(event)
-    # Send the standup answers to the team room.
-    if event['action']['actionMethodName'] == 'send_answers':
-        return send_standup_answers_to_room(user, is_room)
-    # Enable/disable schedule.
-    if event['action']['actionMethodName'] == 'enable_schedule':
-        return enable_schedule(event, user)
-    # Remove question.
-    if event['action']['actionMethodName'] == 'remove_question':
-        return remove_question(event, user)
-    # Reorder questions.
-    if event['action']['actionMethodName'] == 'reorder_questions':
-        return reorder_questions(event, user)
-
-
-def join_team(event, user: User, space: str, is_room: bool) -> str:
+    action = event['action']['actionMethodName']
+    response = actions.dispatch(action, event, user, space, is_room)
+    if response is None:
+        return Json.response({'text': UNKNOWN_ACTION})
+    return response
+
+
+# Join team.
+@actions.register('join_team')
+def join_team(event, user: User, space: str, is_room: bool) -> Any:
     team_name = event['action']['parameters'][0]['value']
     if is_room:
         if Storage.join_room_to_team(team_name=team_name, space=space):
@@ -43,10 +46,12 @@ def join_team(event, user: User, space: str, is_room: bool) -> str:
             text = f"You have joined the team '{team_name}'."
         else:
             text = f"🤕 Sorry, I couldn't add you to the team '{team_name}'"
-    return json.jsonify({'text': text})
+    return Json.response({'text': text})
 
 
-def remove_team(event) -> Any:
+# Remove team.
+@actions.register('remove_team')
+def remove_team(event, user: User, space: str, is_room: bool) -> Any:
     team_name = event['action']['parameters'][0]['value']
     if Storage.remove_team(team_name=team_name):
         text = f"I successfully removed the team '{team_name}'."
@@ -55,69 +60,87 @@ def remove_team(event) -> Any:
     teams = Storage.get_teams()
     message = Cards.get_team_remove_card(teams, True)
     message['text'] = text
-    return json.jsonify(message)
+    return Json.response(message)
 
 
 def send_standup_card(card, user: User, team: Team):
     today = date.today()
     today_str = today.strftime("%Y%m%d")
     chat = Chat.get_chat_service()
-    response = chat.spaces().messages().create(
+    response = Chat.execute(chat.spaces().messages().create(
         parent=team.space,
         threadKey=today_str,
         body={
             'text': f"I just received the standup answers from *{user.name}*:",
             'cards': [card]
         }
-    ).execute()
-    logger.debug(f"Response: {response}")
+    ))
+    logger.debug("Response: %s", response)
     message_id = response['name']
-    logger.debug(f"Message id: {message_id}")
+    logger.debug("Message id: %s", message_id)
     Storage.set_message_id(google_id=user.google_id, message_id=message_id)
 
 
 def update_standup_card(card, user: User, message_id: str):
     chat = Chat.get_chat_service()
-    logger.info(f"message id: {message_id}")
-    response = chat.spaces().messages().update(
+    logger.debug("Update message id: %s", message_id)
+    response = Chat.execute(chat.spaces().messages().update(
         name=message_id,
         updateMask='cards,text',
         body={
             'text': f"I just received the standup answers from *{user.name}* (updated):",
             'cards': [card]
         }
-    ).execute()
-    logger.debug(f"Response (update card): {response}")
+    ))
+    logger.debug("Response (update card): %s", response)
 
 
-def send_standup_answers_to_room(user: User, is_room: bool) -> str:
-    if is_room:
-        text = "🤕 Sorry, something went wrong."
+def publish_standup_card(card, user: User, team: Team, message_id: str):
+    if message_id:
+        update_standup_card(card, user, message_id)
     else:
-        logger.info("Publish to the team room.")
-        answers = Storage.get_standup_answers(google_id=user.google_id)
-        message_id = Storage.get_standup_answer_message_id(google_id=user.google_id)
-        card = Cards.get_standup_card(user, answers, False)
-        team = Storage.get_team_of_user(google_id=user.google_id)
-        logger.info(f"Message id: {message_id}")
-        if team:
-            if team.space:
-                if message_id:
-                    update_standup_card(card, user, message_id)
-                    text = "Your standup answers have been updated in your team room."
-                else:
-                    send_standup_card(card, user, team)
-                    text = "Your standup answers have been published in your team room."
+        send_standup_card(card, user, team)
+
+
+# Send the standup answers to the team room.
+@actions.register('send_answers', requires=DM_ONLY)
+def send_standup_answers_to_room(event, user: User, space: str, is_room: bool) -> Any:
+    logger.debug("Publish to the team room.")
+    answers = Storage.get_standup_answers(google_id=user.google_id)
+    message_id = Storage.get_standup_answer_message_id(google_id=user.google_id)
+    card = Cards.get_standup_card(user, answers, False)
+    team = Storage.get_team_of_user(google_id=user.google_id)
+    logger.debug("Message id: %s", message_id)
+    if team:
+        if team.space:
+            if not Deadline.has_budget(MIN_PUBLISH_BUDGET):
+                # Not enough time left to wait for the Chat API, publish after the response has been sent.
+                Background.submit('publish_standup_answers', publish_standup_card, card, user, team, message_id)
+                text = "⏳ Your standup answers are being published in your team room."
             else:
-                text = "🤕 Sorry, your team room does either not have the standup bot " \
-                       "and/or did not yet join a team. Add the standup bot to your team room " \
-                       "and run `/join_team` in your team room to join a team."
+                try:
+                    publish_standup_card(card, user, team, message_id)
+                # The socket timeouts of the Chat API client are no TimeoutError before Python 3.10.
+                except (Deadline.DeadlineExceeded, socket.timeout, TimeoutError) as e:
+                    logger.error("Could not publish the standup answers in time: %s", e)
+                    text = "🤕 Sorry, publishing your standup answers took too long. Please try again."
+                else:
+                    if message_id:
+                        text = "Your standup answers have been updated in your team room."
+                    else:
+                        text = "Your standup answers have been published in your team room."
         else:
-            text = "🤕 Sorry, you did not yet join a team. Use `/join_team` to join a team."
-    return json.jsonify({'text': text})
+            text = "🤕 Sorry, your team room does either not have the standup bot " \
+                   "and/or did not yet join a team. Add the standup bot to your team room " \
+                   "and run `/join_team` in your team room to join a team."
+    else:
+        text = "🤕 Sorry, you did not yet join a team. Use `/join_team` to join a team."
+    return Json.response({'text': text})
 
 
-def enable_schedule(event, user: User) -> Any:
+# Enable/disable schedule.
+@actions.register('enable_schedule')
+def enable_schedule(event, user: User, space: str, is_room: bool) -> Any:
     day = event['action']['parameters'][0]['value']
     enable = event['action']['parameters'][1]['value'] == 'True'
     if Storage.enable_schedule(google_id=user.google_id, day=day, enable=enable):
@@ -127,10 +150,12 @@ def enable_schedule(event, user: User) -> Any:
     schedules = Storage.get_schedules(google_id=user.google_id)
     message = Cards.get_schedule_enable_card(schedules, True)
     message['text'] = text
-    return json.jsonify(message)
+    return Json.response(message)
 
 
-def remove_question(event, user: User) -> Any:
+# Remove question.
+@actions.register('remove_question')
+def remove_question(event, user: User, space: str, is_room: bool) -> Any:
     question_id = int(event['action']['parameters'][0]['value'])
     question = event['action']['parameters'][1]['value']
     if Storage.remove_question(question_id=question_id):
@@ -140,18 +165,28 @@ def remove_question(event, user: User) -> Any:
     questions = Storage.get_questions(google_id=user.google_id)
     message = Cards.get_question_remove_card(questions, True)
     message['text'] = text
-    return json.jsonify(message)
+    return Json.response(message)
 
 
-def reorder_questions(event, user) -> Any:
+# Reorder questions.
+@actions.register('reorder_questions')
+def reorder_questions(event, user: User, space: str, is_room: bool) -> Any:
     question_id = int(event['action']['parameters'][0]['value'])
     question = event['action']['parameters'][1]['value']
     order_step = int(event['action']['parameters'][2]['value'])
     team_id = int(event['action']['parameters'][3]['value'])
-    logger.info(f"Question id: {question_id}")
-    logger.info(f"Question: {question}")
-    logger.info(f"Order step: {order_step}")
+    logger.debug("Reorder questions.", extra=fields(question_id=question_id, question=question, order_step=order_step))
 
     Storage.reorder_questions(team_id=team_id, question_id=question_id, order_step=order_step)
     questions = Storage.get_questions(google_id=user.google_id)
-    return json.jsonify(Cards.get_question_reorder_card(questions, order_step + 1))
+    return Json.response(Cards.get_question_reorder_card(questions, order_step + 1))
+
+
+# Page through the search results.
+@actions.register('search')
+def search(event, user: User, space: str, is_room: bool) -> Any:
+    try:
+        query = Search.SearchQuery.from_parameters(event['action'].get('parameters') or [])
+    except ValueError:
+        return Json.response({'text': Message.SEARCH_HELP})
+    return Json.response(Message.search_card(query, user, space, is_room, True))
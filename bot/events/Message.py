@@ -1,67 +1,56 @@
-from flask import json
-from typing import Any
+import os
+from typing import Any, Callable, Optional
 
+import bot.utils.Background as Background
+import bot.utils.CardCache as CardCache
 import bot.utils.Cards as Cards
+import bot.utils.Chat as Chat
+import bot.utils.Deadline as Deadline
+import bot.utils.Json as Json
+import bot.utils.Search as Search
 import bot.utils.User as User
 import bot.utils.storage.Storage as Storage
+import bot.utils.storage.Versions as Versions
 from bot.utils.Logger import logger
+from bot.utils.Registry import DM_ONLY, Registry
 from bot.utils.Weekdays import Weekdays
 
 NO_ANSWER = "🤔 Sorry, I don't have an answer for that."
+NO_EFFECT_IN_ROOM = "🤕 Sorry, but this command has no effect in a room."
+# The number of days of the team statistics.
+STATS_DAYS = 30
+# The attempts to answer the current question, if concurrent messages answer it first.
+ANSWER_ATTEMPTS = 3
+# The minimum time in seconds before the deadline to store an answer before answering, otherwise it is stored in the
+# background and the next question is sent as a new message.
+MIN_ANSWER_BUDGET = float(os.environ.get('MIN_ANSWER_BUDGET', 2))
+PROCESSING = "⏳ Got it, the next question follows in a moment."
+NOT_SAVED = "🤕 Sorry, I couldn't save your answer. Please send it again."
+SEARCH_HELP = "🤕 Sorry, I couldn't understand your search. " \
+              "Use `/search WORDS [team:NAME] [since:YYYY-MM-DD] [until:YYYY-MM-DD] [page:N]`, " \
+              "e.g. `/search database migration team:\"Team A\" since:2023-01-01`."
+NO_NEXT_QUESTION = "🤕 Sorry, I saved your answer, but I couldn't load the next question. " \
+                   "Please continue later with `/standup`, your answers of today are kept."
+
+commands = Registry('commands', {DM_ONLY: NO_EFFECT_IN_ROOM})
 
 
 def handle_event(event, user: User, space: str, is_room: bool) -> Any:
     if 'slashCommand' in event['message']:
         command = event['message']['slashCommand']['commandId']
-        logger.debug(f"Slash command {command}")
-        # /add_team team_name
-        if command == '1':
-            return add_team(event)
-        # /teams
-        if command == '3':
-            return get_teams()
-        # /join_team
-        if command == '4':
-            return join_team(is_room)
-        # /users [team_name]
-        if command == '5':
-            return get_users(event)
-        # /standup
-        if command == '6':
-            return trigger_standup(user, is_room)
-        # /enable_schedule or /disable_schedule
-        if command == '7' or command == '8':
-            return enable_schedule(user, is_room)
-        # /change_schedule_time day time
-        if command == '9':
-            return change_schedule_time(event, user, is_room)
-        # /schedules
-        if command == '10':
-            return get_schedules(user, is_room)
-        # /leave_team
-        if command == '11':
-            return leave_team(user, space, is_room)
-        # /remove_team
-        if command == '12':
-            return remove_team()
-        # /questions
-        if command == '13':
-            return get_questions(user)
-        # /add_question QUESTION
-        if command == '14':
-            return add_question(event, user)
-        # /remove_question
-        if command == '15':
-            return remove_question(user)
-        # /reorder_questions
-        if command == '16':
-            return reorder_questions(user)
+        logger.debug("Slash command %s", command)
+        response = commands.dispatch(command, event, user, space, is_room)
+        if response is None:
+            return Json.response({'text': NO_ANSWER})
+        return response
     # Handle standup answers and generic requests.
     else:
         return generic_input(event, user, is_room)
 
 
-def add_team(event) -> Any:
+# /add_team team_name
+@commands.register('1')
+def add_team(event, user: User, space: str, is_room: bool) -> Any:
     team_name = ''
     if 'argumentText' in event['message']:
         team_name = event['message']['argumentText'].strip(' "\'')
@@ -69,109 +58,121 @@ def add_team(event) -> Any:
         text = f"I successfully added the new team '{team_name}'."
     else:
         text = f"🤕 Sorry, I couldn't add the new team '{team_name}'."
-    return json.jsonify({'text': text})
+    return Json.response({'text': text})
 
 
-def get_teams() -> Any:
-    teams = Storage.get_teams()
-    return json.jsonify(Cards.get_team_list_card(teams))
+# /teams
+@commands.register('3')
+def get_teams(event, user: User, space: str, is_room: bool) -> Any:
+    return Json.raw_response(CardCache.render(
+        'team_list', Versions.TEAMS,
+        lambda: Cards.get_team_list_card(Storage.get_teams())))
 
 
-def join_team(is_room: bool) -> Any:
-    teams = Storage.get_teams()
-    return json.jsonify(Cards.get_team_selection_card(teams, is_room, False))
+# /join_team
+@commands.register('4')
+def join_team(event, user: User, space: str, is_room: bool) -> Any:
+    return Json.raw_response(CardCache.render(
+        ('team_selection', is_room, False), Versions.TEAMS,
+        lambda: Cards.get_team_selection_card(Storage.get_teams(), is_room, False)))
 
 
-def get_users(event) -> Any:
+# /users [team_name]
+@commands.register('5')
+def get_users(event, user: User, space: str, is_room: bool) -> Any:
     team_name = ''
     if 'argumentText' in event['message']:
         team_name = event['message']['argumentText'].strip(' "\'')
     users = Storage.get_users(team_name=team_name)
-    return json.jsonify(Cards.get_user_list_card(users))
+    return Json.response(Cards.get_user_list_card(users))
 
 
-def trigger_standup(user: User, is_room: bool) -> Any:
-    if is_room:
-        text = "🤕 Sorry, but this command has no effect in a room."
-    else:
-        Storage.reset_standup(google_id=user.google_id)
-        next_question = Storage.get_current_question(google_id=user.google_id)
-        if next_question is None:
-            text = "🤕 Sorry, I could not find a standup question. " \
-                   "Add new questions with `/add_question QUESTION`."
-        else:
-            text = f"*Hi {user.name}!*\nYou requested to do the standup.\n\n" \
-                   f"_{next_question.question}_"
-    return json.jsonify({'text': text})
-
-
-def enable_schedule(user: User, is_room: bool) -> Any:
-    if is_room:
-        text = "🤕 Sorry, but this command has no effect in a room."
-        return json.jsonify({'text': text})
+# /standup
+@commands.register('6', requires=DM_ONLY)
+def trigger_standup(event, user: User, space: str, is_room: bool) -> Any:
+    Storage.reset_standup(google_id=user.google_id)
+    next_question = Storage.get_current_question(google_id=user.google_id)
+    if next_question is None:
+        text = "🤕 Sorry, I could not find a standup question. " \
+               "Add new questions with `/add_question QUESTION`."
     else:
-        schedules = Storage.get_schedules(google_id=user.google_id)
-        return json.jsonify(Cards.get_schedule_enable_card(schedules, False))
+        text = f"*Hi {user.name}!*\nYou requested to do the standup.\n\n" \
+               f"_{next_question.question}_"
+    return Json.response({'text': text})
 
 
-def change_schedule_time(event, user: User, is_room: bool) -> Any:
-    if is_room:
-        text = "🤕 Sorry, but this command has no effect in a room."
-    else:
-        schedule_day = ''
-        schedule_time = ''
-        if 'argumentText' in event['message']:
-            argument = event['message']['argumentText'].strip(' "\'')
-            arguments = argument.rsplit(' ')
-            if len(arguments) == 2:
-                schedule_day = arguments[0].strip(' "\'').capitalize()
-                schedule_time = arguments[1].strip(' "\'')
-        if schedule_time and schedule_day and schedule_day in Weekdays \
-                and Storage.update_schedule_time(google_id=user.google_id, day=schedule_day,
-                                                 time=schedule_time):
-            text = f"Your standup schedule time for '{schedule_day}' is now '{schedule_time}'."
-        else:
-            text = f"🤕 Sorry, I couldn't change your standup schedule time '{schedule_time}' " \
-                   f"for '{schedule_day}'. Use e.g. `/change_schedule_time monday 09:00:00`"
-    return json.jsonify({'text': text})
-
-
-def get_schedules(user: User, is_room: bool) -> Any:
-    if is_room:
-        text = "🤕 Sorry, but this command has no effect in a room."
-        return json.jsonify({'text': text})
+# /enable_schedule or /disable_schedule
+@commands.register('7', '8', requires=DM_ONLY)
+def enable_schedule(event, user: User, space: str, is_room: bool) -> Any:
+    schedules = Storage.get_schedules(google_id=user.google_id)
+    return Json.response(Cards.get_schedule_enable_card(schedules, False))
+
+
+# /change_schedule_time day time
+@commands.register('9', requires=DM_ONLY)
+def change_schedule_time(event, user: User, space: str, is_room: bool) -> Any:
+    schedule_day = ''
+    schedule_time = ''
+    if 'argumentText' in event['message']:
+        argument = event['message']['argumentText'].strip(' "\'')
+        arguments = argument.rsplit(' ')
+        if len(arguments) == 2:
+            schedule_day = arguments[0].strip(' "\'').capitalize()
+            schedule_time = arguments[1].strip(' "\'')
+    if schedule_time and schedule_day and schedule_day in Weekdays \
+            and Storage.update_schedule_time(google_id=user.google_id, day=schedule_day,
+                                             time=schedule_time):
+        text = f"Your standup schedule time for '{schedule_day}' is now '{schedule_time}'."
     else:
-        schedules = Storage.get_schedules(google_id=user.google_id)
-        return json.jsonify(Cards.get_schedule_list_card(schedules))
+        text = f"🤕 Sorry, I couldn't change your standup schedule time '{schedule_time}' " \
+               f"for '{schedule_day}'. Use e.g. `/change_schedule_time monday 09:00:00`"
+    return Json.response({'text': text})
+
 
+# /schedules
+@commands.register('10', requires=DM_ONLY)
+def get_schedules(event, user: User, space: str, is_room: bool) -> Any:
+    schedules = Storage.get_schedules(google_id=user.google_id)
+    return Json.response(Cards.get_schedule_list_card(schedules))
 
-def leave_team(user: User, space: str, is_room: bool) -> Any:
+
+# /leave_team
+@commands.register('11')
+def leave_team(event, user: User, space: str, is_room: bool) -> Any:
     if is_room:
         Storage.leave_team_with_room(space=space)
         text = "The room is no longer part of a team. Run `/join_team` to join the room to another team."
     else:
         Storage.leave_team(google_id=user.google_id)
         text = "You left the team. Run `/join_team` to join another team."
-    return json.jsonify({'text': text})
+    return Json.response({'text': text})
 
 
-def remove_team() -> Any:
-    teams = Storage.get_teams()
-    return json.jsonify(Cards.get_team_remove_card(teams, False))
+# /remove_team
+@commands.register('12')
+def remove_team(event, user: User, space: str, is_room: bool) -> Any:
+    return Json.raw_response(CardCache.render(
+        ('team_remove', False), Versions.TEAMS,
+        lambda: Cards.get_team_remove_card(Storage.get_teams(), False)))
 
 
-def get_questions(user: User) -> Any:
+# /questions
+@commands.register('13')
+def get_questions(event, user: User, space: str, is_room: bool) -> Any:
+    # Not cached, the key of the card would need the team of the user, which costs as much as the questions.
     questions = Storage.get_questions(google_id=user.google_id)
     if questions:
-        return json.jsonify(Cards.get_question_list_card(questions))
+        return Json.response(Cards.get_question_list_card(questions))
     else:
         text = "🤕 Sorry, I couldn't find any questions for you. " \
                "Make sure you joined a team with `/join_team` and/or your team as questions. " \
                "Use `/add_question QUESTION` to add a new question for your team."
-        json.jsonify({'text': text})
+        return Json.response({'text': text})
 
 
-def add_question(event, user: User) -> Any:
+# /add_question QUESTION
+@commands.register('14')
+def add_question(event, user: User, space: str, is_room: bool) -> Any:
     question = ''
     if 'argumentText' in event['message']:
         question = event['message']['argumentText'].strip(' "\'')
@@ -180,45 +181,142 @@ def add_question(event, user: User) -> Any:
     else:
         text = f"🤕 Sorry, I couldn't add the new question '{question}'. " \
                f"Make sure you joined a team with `/join_team`."
-    return json.jsonify({'text': text})
+    return Json.response({'text': text})
 
 
-def remove_question(user: User) -> Any:
+# /remove_question
+@commands.register('15')
+def remove_question(event, user: User, space: str, is_room: bool) -> Any:
     questions = Storage.get_questions(google_id=user.google_id)
-    return json.jsonify(Cards.get_question_remove_card(questions, False))
+    return Json.response(Cards.get_question_remove_card(questions, False))
 
 
-def reorder_questions(user) -> Any:
+# /reorder_questions
+@commands.register('16')
+def reorder_questions(event, user: User, space: str, is_room: bool) -> Any:
     questions = Storage.get_questions(google_id=user.google_id)
     if questions:
-        return json.jsonify(Cards.get_question_reorder_card(questions, 1))
+        return Json.response(Cards.get_question_reorder_card(questions, 1))
     else:
         text = "🤕 Sorry, I couldn't find any questions of your team."
-        return json.jsonify({'text': text})
+        return Json.response({'text': text})
+
+
+# /stats
+@commands.register('17')
+def get_stats(event, user: User, space: str, is_room: bool) -> Any:
+    stats = Storage.get_stats(google_id=user.google_id, space=space if is_room else '', days=STATS_DAYS)
+    user_stats, team_stats = stats if stats else (None, None)
+    return Json.response(Cards.get_stats_card(user_stats, team_stats))
+
+
+# /search WORDS [team:NAME] [since:YYYY-MM-DD] [until:YYYY-MM-DD] [page:N]
+@commands.register('18')
+def search(event, user: User, space: str, is_room: bool) -> Any:
+    try:
+        query = Search.parse(event['message'].get('argumentText', ''))
+    except ValueError:
+        query = None
+    if not query or not query.to_tsquery():
+        return Json.response({'text': SEARCH_HELP})
+    return Json.response(search_card(query, user, space, is_room, False))
+
+
+def search_card(query: Search.SearchQuery, user: User, space: str, is_room: bool, is_update: bool):
+    """
+    Search the answers of the team of the room, or in a direct message of the team of the user.
+    :return: The card with a page of the results, or a message if the query names another team.
+    """
+    # One more result than shown tells whether there is a next page.
+    ret = Storage.search_team_answers(query=query, limit=Search.PAGE_SIZE + 1,
+                                      offset=(query.page - 1) * Search.PAGE_SIZE, google_id=user.google_id,
+                                      space=space if is_room else '')
+    if ret is None:
+        return {'text': "🤕 Sorry, the search failed. Please try again."}
+    team, results = ret
+    if not team:
+        return {'text': "🤕 Sorry, you can only search the answers of your team. Join a team with `/join_team`."}
+    if query.team != team.name:
+        return {'text': f"🤕 Sorry, you can only search the answers of your team '{team.name}'."}
+    return Cards.get_search_card(query, results[:Search.PAGE_SIZE], len(results) > Search.PAGE_SIZE, is_update)
 
 
 def generic_input(event, user: User, is_room) -> Any:
-    text = NO_ANSWER
-    if not is_room:
-        previous_question = Storage.get_previous_question(google_id=user.google_id)
-        if previous_question:
-            logger.debug(f"Previous question: {previous_question.id_}, {previous_question.question}, "
-                         f"{previous_question.order}")
-            current_question = Storage.get_current_question(google_id=user.google_id,
-                                                            previous_question=previous_question)
-            if current_question:
-                logger.debug(f"Current question: {current_question.id_}, {current_question.question}, "
-                             f"{current_question.order}")
-                answer = event['message']['text']
-                Storage.add_standup_answer(google_id=user.google_id, answer=answer,
-                                           current_question=current_question)
-                next_question = Storage.get_current_question(google_id=user.google_id,
-                                                             previous_question=current_question)
-                logger.debug(f"Next question: {next_question}")
-                if next_question is None:
-                    answers = Storage.get_standup_answers(google_id=user.google_id)
-                    card = Cards.get_standup_card(user, answers, True)
-                    return json.jsonify({'cards': [card]})
-                else:
-                    text = f"_{next_question.question}_"
-    return json.jsonify({'text': text})
+    if is_room:
+        return Json.response({'text': NO_ANSWER})
+    answer = event['message']['text']
+    if not Deadline.has_budget(MIN_ANSWER_BUDGET):
+        # Not enough time left to store the answer, continue the conversation after the response has been sent.
+        Background.submit('add_standup_answer', answer_in_background, user, answer)
+        return Json.response({'text': PROCESSING})
+    is_added = add_answer(user, answer)
+    if is_added is None:
+        if not Deadline.has_budget(0):
+            # Nothing was stored, the answer is stored when Google Chat retries the event.
+            raise Deadline.DeadlineExceeded()
+        return Json.response({'text': NOT_SAVED})
+    if not is_added:
+        return Json.response({'text': NO_ANSWER})
+    reply = next_reply(user)
+    if reply is None:
+        # The answer is stored, only the next question is missing.
+        Background.submit('send_next_question', send_reply, user, next_reply)
+        return Json.response({'text': PROCESSING})
+    return Json.response(reply)
+
+
+def add_answer(user: User, answer: str) -> Optional[bool]:
+    """
+    Store the answer to the current question of the user.
+    :return: True if the answer was stored, False if there is no current question, None if the storage failed.
+    """
+    for _ in range(ANSWER_ATTEMPTS):
+        ret = Storage.get_current_question_or_answers(google_id=user.google_id)
+        if ret is None:
+            return None
+        current_question, _ = ret
+        if not current_question:
+            return False
+        logger.debug("Current question: %s, %s, %s",
+                     current_question.id_, current_question.question, current_question.order)
+        is_added = Storage.add_standup_answer(google_id=user.google_id, answer=answer,
+                                              current_question=current_question)
+        if is_added is not False:
+            return is_added
+        # A concurrent message answered the question, this one answers the next.
+    return False
+
+
+def next_reply(user: User) -> Optional[dict]:
+    """
+    Get the next question, or the card with the standup answers after the last question.
+    :return: The message, None if the storage failed.
+    """
+    ret = Storage.get_current_question_or_answers(google_id=user.google_id)
+    if ret is None:
+        return None
+    next_question, answers = ret
+    logger.debug("Next question: %s", next_question)
+    if next_question is None:
+        return {'cards': [Cards.get_standup_card(user, answers, True)]}
+    return {'text': f"_{next_question.question}_"}
+
+
+def answer_in_background(user: User, answer: str):
+    is_added = add_answer(user, answer)
+    if is_added:
+        send_reply(user, next_reply)
+    else:
+        send_reply(user, lambda _: {'text': NO_ANSWER if is_added is False else NOT_SAVED})
+
+
+def send_reply(user: User, get_reply: Callable[[User], Optional[dict]]):
+    """
+    Send the reply to the direct message space of the user, e.g. after the response to the event has been sent.
+    """
+    reply = get_reply(user)
+    if reply is None:
+        logger.error("Could not get the reply to %s.", user.google_id)
+        reply = {'text': NO_NEXT_QUESTION}
+    chat = Chat.get_chat_service()
+    Chat.execute(chat.spaces().messages().create(parent=user.space, body=reply))
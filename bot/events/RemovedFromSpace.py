@@ -1,6 +1,6 @@
-from flask import json
 from typing import Any
 
+import bot.utils.Json as Json
 import bot.utils.User as User
 import bot.utils.storage.Storage as Storage
 
@@ -10,4 +10,4 @@ def handle_event(user: User, space: bool, is_room: str) -> Any:
         Storage.leave_team_with_room(space=space)
     else:
         Storage.disable_user(user=user)
-    return json.jsonify({'text': ''})
+    return Json.response({'text': ''})
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Export the standup answers of a team or user over a date range as CSV or JSON lines, e.g.
+
+    python3 /root/bot/export_standups.py --team Backend --since 2023-01-01 --until 2023-03-31 --output backend.csv
+
+The rows are streamed from a server-side cursor and written one by one, so the memory use does not depend on the
+number of exported answers.
+"""
+
+import argparse
+import csv
+import io
+import sys
+from datetime import date
+from typing import Iterable, Iterator, Sequence, Tuple
+
+import bot.utils.Json as Json
+import bot.utils.storage.Database as Database
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import logger, setup_logger
+
+
+def _row_values(row: Sequence) -> Tuple:
+    added, *values = row
+    return (added.isoformat(timespec='seconds'), *values)
+
+
+def csv_lines(rows: Iterable[Sequence]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(Database.STANDUP_ANSWER_COLUMNS)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(_row_values(row))
+        yield buffer.getvalue()
+
+
+def jsonl_lines(rows: Iterable[Sequence]) -> Iterator[str]:
+    for row in rows:
+        yield Json.dumps(dict(zip(Database.STANDUP_ANSWER_COLUMNS, _row_values(row)))).decode('utf-8') + '\n'
+
+
+FORMATS = {
+    'csv': csv_lines,
+    'jsonl': jsonl_lines
+}
+
+
+def export(output, output_format: str = 'csv', team_name: str = None, google_id: str = None, start: date = None,
+           end: date = None, batch_size: int = 2000) -> int:
+    """
+    Write the standup answers to the output.
+    :return: The number of exported answers.
+    """
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    rows = Storage.iter_standup_answers(team_name=team_name, google_id=google_id, start=start, end=end,
+                                        batch_size=batch_size)
+    output.writelines(FORMATS[output_format](counted(rows)))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the standup answers as CSV or JSON lines.")
+    parser.add_argument('--team', help="The name of the team.")
+    parser.add_argument('--user', help="The Google id of the user, e.g. users/123.")
+    parser.add_argument('--since', type=date.fromisoformat, help="The first day (YYYY-MM-DD), inclusive.")
+    parser.add_argument('--until', type=date.fromisoformat, help="The last day (YYYY-MM-DD), inclusive.")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--output', help="The output file, default is stdout.")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Rows fetched per round trip.")
+    args = parser.parse_args()
+
+    setup_logger(False, '')
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        count = export(output, args.format, args.team, args.user, args.since, args.until, args.batch_size)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    logger.info("Exported %d standup answers.", count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Configuration of the multi-process server mode. The app is loaded once in the master process and the workers are
+forked from it. Start it with:
+
+    gunicorn -c bot/gunicorn_config.py bot.endpoint:app
+
+Send SIGHUP to restart the workers gracefully, and SIGTERM to stop the server after the running requests finished.
+The resources inherited from the master, e.g. the connection pool, the chat services and the background threads,
+are re-created in the workers by the os.register_at_fork hooks of their modules.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+# Time to finish the running requests, when the workers are stopped or restarted.
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+# Google Chat does not wait longer than 30 seconds for a response.
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+# Restart the workers after a number of requests, 0 disables it.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    import bot.endpoint
+    import bot.utils.storage.Storage as Storage
+
+    bot.endpoint.init()
+    # The Google API client is imported lazily, import it in the master so that the workers share it.
+    import googleapiclient.discovery  # noqa: F401
+    import google.oauth2.service_account  # noqa: F401
+    # Do not share the database connections of the master with the workers.
+    Storage.close_pool()
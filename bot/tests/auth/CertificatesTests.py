@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from google.auth import exceptions
+
+from bot.utils.auth.Certificates import CertificateCache, DEFAULT_MAX_AGE, get_max_age
+
+
+class _Response:
+    def __init__(self, status, certs, headers):
+        self.status = status
+        self.data = json.dumps(certs).encode('utf-8')
+        self.headers = headers
+
+
+class _Request:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, url, method='GET'):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_get_max_age():
+    assert get_max_age({'Cache-Control': 'public, max-age=19869, must-revalidate, no-transform'}) == 19869
+    assert get_max_age({'cache-control': 'max-age=100', 'age': '40'}) == 60
+    assert get_max_age({'Cache-Control': 'no-cache'}) == 0
+    assert get_max_age({'Expires': 'Thu, 01 Jan 1970 00:01:40 GMT'}, now=40) == 60
+    assert get_max_age({}) == DEFAULT_MAX_AGE
+
+
+def test_certificates_are_cached():
+    request = _Request(_Response(200, {'a': 'cert-a'}, {'Cache-Control': 'max-age=3600'}))
+    cache = CertificateCache('https://example.com/certs', request)
+    try:
+        assert cache.get('a') == {'a': 'cert-a'}
+        assert cache.get('a') == {'a': 'cert-a'}
+        assert request.calls == 1
+    finally:
+        cache.stop()
+
+
+def test_unknown_key_id_refreshes_certificates():
+    request = _Request(_Response(200, {'a': 'cert-a'}, {'Cache-Control': 'max-age=3600'}),
+                       _Response(200, {'b': 'cert-b'}, {'Cache-Control': 'max-age=3600'}))
+    cache = CertificateCache('https://example.com/certs', request)
+    try:
+        assert cache.get('a') == {'a': 'cert-a'}
+        # Pretend the last fetch happened long ago, to not hit the rate limit.
+        cache._last_fetch = 0
+        assert cache.get('b') == {'b': 'cert-b'}
+        assert request.calls == 2
+        # The rate limit prevents another fetch for an unknown key id.
+        assert cache.get('c') == {'b': 'cert-b'}
+        assert request.calls == 2
+    finally:
+        cache.stop()
+
+
+def test_failed_refresh_keeps_certificates():
+    request = _Request(_Response(200, {'a': 'cert-a'}, {'Cache-Control': 'max-age=0'}),
+                       _Response(500, {}, {}))
+    cache = CertificateCache('https://example.com/certs', request)
+    try:
+        assert cache.get() == {'a': 'cert-a'}
+        assert cache.get() == {'a': 'cert-a'}
+        assert request.calls == 2
+    finally:
+        cache.stop()
+
+    cache = CertificateCache('https://example.com/certs', _Request(_Response(500, {}, {})))
+    with pytest.raises(exceptions.TransportError):
+        cache.get()
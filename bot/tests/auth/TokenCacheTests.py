@@ -0,0 +1,46 @@
+import time
+
+from bot.utils.auth.TokenCache import TokenCache
+
+
+def test_token_cache_hit_and_miss():
+    cache = TokenCache()
+    claims = {'iss': 'issuer', 'aud': 'audience', 'exp': time.time() + 60}
+    assert cache.get('token') is None
+    cache.put('token', claims)
+    assert cache.get('token') == claims
+    assert cache.get('other') is None
+
+    stats = cache.stats()
+    assert stats['size'] == 1
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['hit_rate'] == 1 / 3
+
+
+def test_token_cache_expiry():
+    cache = TokenCache(max_ttl=60)
+    # Expired tokens are not cached at all.
+    cache.put('expired', {'exp': time.time() - 1})
+    assert cache.get('expired') is None
+
+    # The entry expires with the token, even if the cache TTL is longer.
+    cache.put('token', {'exp': time.time() + 0.05})
+    assert cache.get('token') is not None
+    time.sleep(0.1)
+    assert cache.get('token') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_token_cache_is_bounded():
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put('a', {'exp': exp})
+    cache.put('b', {'exp': exp})
+    # Use 'a', so that 'b' is the least recently used token.
+    assert cache.get('a') is not None
+    cache.put('c', {'exp': exp})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
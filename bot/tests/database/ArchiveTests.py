@@ -0,0 +1,117 @@
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import bot.archive_standups as archive_standups
+import bot.export_standups as export_standups
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+@Storage.transact
+def shift_days(connection, google_id: str, days: int):
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE standups SET added = added - %s * interval '1 day' "
+                       "WHERE user_id = (SELECT id FROM users WHERE google_id = %s)", (days, google_id))
+
+
+@Storage.transact
+def shift_session(connection, google_id: str, days: int):
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE standup_sessions SET day = day - %s "
+                       "WHERE user_id = (SELECT id FROM users WHERE google_id = %s)", (days, google_id))
+
+
+@Storage.transact
+def count_rows(connection, table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def setup_standups():
+    assert Storage.add_team(team_name='Backend')
+    for google_id in ('old', 'new'):
+        Storage.add_user(user=User(0, google_id, google_id, f'{google_id}@example.com', '', f'spaces/{google_id}',
+                                   True, ''))
+        assert Storage.join_team(google_id=google_id, team_name='Backend')
+        assert Storage.reset_standup(google_id=google_id)
+        for answer in ("Yesterday.", "Today.", "Nothing."):
+            assert Storage.add_standup_answer(google_id=google_id, answer=answer)
+        assert Storage.set_message_id(google_id=google_id, message_id=f'spaces/team/messages/{google_id}')
+    shift_days('old', 400)
+    shift_session('old', 400)
+
+
+def user_stats(google_id: str):
+    stats = Storage.get_user_stats(google_id=google_id)
+    return stats.prompted, stats.completed
+
+
+def test_archive(database_fixture):
+    setup_standups()
+    before = datetime.now() - timedelta(days=365)
+    assert Storage.count_standups_before(before=before) == 4
+
+    assert archive_standups.archive(before, batch_size=3, pause=0) == 4
+    assert count_rows('standups') == 4
+    assert count_rows('standups_archive') == 4
+    # The message ids of the sessions are archived, the old sessions are deleted.
+    assert count_rows('standup_sessions') == 1
+    assert count_rows('standup_session_answers') == 3
+    assert count_rows("standups_archive WHERE message_id = 'spaces/team/messages/old'") == 4
+    # Resumed runs find nothing left.
+    assert archive_standups.archive(before, batch_size=3, pause=0) == 0
+
+    # The archived standups are still exported and counted by the statistics.
+    assert export_standups.export(io.StringIO(), google_id='old') == 3
+    output = io.StringIO()
+    assert export_standups.export(output, 'jsonl', google_id='new') == 3
+    assert json.loads(output.getvalue().splitlines()[0])['message_id'] == 'spaces/team/messages/new'
+    assert Storage.rebuild_stats()
+    assert user_stats('old') == (1, 1)
+    # The current standup is not affected.
+    assert Storage.get_current_question(google_id='new') is None
+    assert len(Storage.get_standup_answers(google_id='new')) == 3
+
+
+def test_archive_time_limit(database_fixture):
+    setup_standups()
+    before = datetime.now() - timedelta(days=365)
+    assert archive_standups.archive(before, batch_size=1, pause=0, max_seconds=1e-9) == 1
+    assert archive_standups.archive(before, batch_size=1, pause=0) == 3
+
+
+def test_archive_to_file(database_fixture, tmp_path):
+    setup_standups()
+    before = datetime.now() - timedelta(days=365)
+    assert archive_standups.archive(before, batch_size=3, pause=0, output_dir=str(tmp_path)) == 4
+    assert count_rows('standups') == 4
+    assert count_rows('standups_archive') == 0
+
+    path, = tmp_path.glob('standups-*.jsonl.gz')
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        rows = [json.loads(line) for line in file]
+    assert [row['answer'] for row in rows] == [None, "Yesterday.", "Today.", "Nothing."]
+    assert set(rows[0]) == {'id', 'user_id', 'question_id', 'answer', 'added', 'message_id'}
+    assert rows[0]['message_id'] == 'spaces/team/messages/old'
+
+    # A run without standups to move writes no file.
+    assert archive_standups.archive(before, batch_size=3, pause=0, output_dir=str(tmp_path / 'empty')) == 0
+    assert not (tmp_path / 'empty').exists()
+
+
+def test_archive_failure(database_fixture, monkeypatch, tmp_path):
+    setup_standups()
+
+    def fail(rows):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(archive_standups.ArchiveFile, 'write', lambda self, rows: fail(rows))
+    with pytest.raises(archive_standups.ArchiveError):
+        archive_standups.archive(datetime.now() - timedelta(days=365), pause=0, output_dir=str(tmp_path))
+    # The standups are kept, if they could not be written.
+    assert count_rows('standups') == 8
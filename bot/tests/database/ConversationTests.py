@@ -0,0 +1,173 @@
+import json
+import socket
+import threading
+from unittest import mock
+
+import pytest
+
+import bot.events.CardClicked as CardClicked
+import bot.events.Message as Message
+import bot.utils.Background as Background
+import bot.utils.Chat as Chat
+import bot.utils.Deadline as Deadline
+import bot.utils.storage.DatabaseSchema as DatabaseSchema
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+@Storage.transact
+def execute(connection, sql: str):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def setup_user() -> User:
+    user = User(0, 'abc', 'John Doe', 'abc@example.com', '', 'spaces/abc', True, '')
+    Storage.add_user(user=user)
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+    return user
+
+
+def current_order():
+    question = Storage.get_current_question(google_id='abc')
+    return question.order if question else None
+
+
+def test_conversation(database_fixture):
+    setup_user()
+    assert current_order() is None
+    assert not Storage.add_standup_answer(google_id='abc', answer="Too early.")
+
+    assert Storage.reset_standup(google_id='abc')
+    first = Storage.get_current_question(google_id='abc')
+    assert first.order == 1
+    assert Storage.add_standup_answer(google_id='abc', answer="Yesterday.")
+    assert current_order() == 2
+    # The first question was already answered.
+    assert Storage.add_standup_answer(google_id='abc', answer="Again.", current_question=first) is False
+    assert current_order() == 2
+    assert Storage.add_standup_answer(google_id='abc', answer="Today.")
+    assert Storage.add_standup_answer(google_id='abc', answer="Nothing.")
+    assert current_order() is None
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == \
+           ["Yesterday.", "Today.", "Nothing."]
+
+    # The cursors of today are created from the standups by the migration.
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.add_standup_answer(google_id='abc', answer="Yesterday.")
+    execute("DELETE FROM conversation_cursors")
+    execute(DatabaseSchema.BUILD_CONVERSATION_CURSORS)
+    assert current_order() == 2
+
+    # The conversation ends with the day.
+    execute("UPDATE standup_sessions SET day = day - 1")
+    assert current_order() is None
+
+
+def test_conversation_remove_question(database_fixture):
+    setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.add_standup_answer(google_id='abc', answer="Yesterday.")
+    # The current question is removed, the conversation continues with the next one.
+    assert Storage.remove_question(question_id=Storage.get_current_question(google_id='abc').id_)
+    assert current_order() == 3
+    assert Storage.add_standup_answer(google_id='abc', answer="Nothing.")
+    assert current_order() is None
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == \
+           ["Yesterday.", "Nothing."]
+
+
+def test_conversation_leave_team(database_fixture):
+    setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.leave_team(google_id='abc')
+    assert current_order() is None
+
+
+def test_concurrent_answers(database_fixture):
+    user = setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    barrier = threading.Barrier(2)
+    responses = []
+
+    def answer(text: str):
+        barrier.wait()
+        responses.append(Message.generic_input({'message': {'text': text}}, user, False))
+
+    threads = [threading.Thread(target=answer, args=(text,)) for text in ("First.", "Second.")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Both messages are answers, to consecutive questions.
+    assert current_order() == 3
+    assert sorted(answer for question, answer in Storage.get_standup_answers(google_id='abc')) == \
+           ["First.", "Second."]
+    texts = sorted(json.loads(response.get_data())['text'] for response in responses)
+    assert texts == ["_What (if anything) is blocking your progress?_", "_What will you do today?_"]
+
+
+def test_answer_deadline(database_fixture, monkeypatch):
+    user = setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    sent = []
+    monkeypatch.setattr(Background, 'submit', lambda name, func, *args: func(*args))
+    monkeypatch.setattr(Message, 'send_reply', lambda user_, get_reply: sent.append(get_reply(user_)))
+
+    def reply(text: str):
+        return json.loads(Message.generic_input({'message': {'text': text}}, user, False).get_data())
+
+    # Without time left, the answer is stored after the response and the next question is sent.
+    with Deadline.deadline(1):
+        assert reply("Yesterday.") == {'text': Message.PROCESSING}
+    assert sent == [{'text': "_What will you do today?_"}]
+    assert current_order() == 2
+
+    # The answer could not be stored in time, the event is retried.
+    monkeypatch.setattr(Message, 'MIN_ANSWER_BUDGET', -1)
+    with Deadline.deadline(0), pytest.raises(Deadline.DeadlineExceeded):
+        reply("Today.")
+    assert current_order() == 2
+
+    # The answer is stored, the next question is sent after the response.
+    next_reply = Message.next_reply
+    replies = [None]
+    monkeypatch.setattr(Message, 'next_reply', lambda user_: replies.pop() if replies else next_reply(user_))
+    assert reply("Today.") == {'text': Message.PROCESSING}
+    assert sent[-1] == {'text': "_What (if anything) is blocking your progress?_"}
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == ["Yesterday.", "Today."]
+
+
+def test_send_answers_timeout(database_fixture, monkeypatch):
+    user = setup_user()
+    assert Storage.join_room_to_team(team_name='Backend', space='spaces/backend')
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.add_standup_answer(google_id='abc', answer="Yesterday.")
+    service = mock.MagicMock()
+    service.spaces().messages().create().execute.side_effect = socket.timeout("timed out")
+    monkeypatch.setattr(Chat, 'get_chat_service', lambda: service)
+
+    # The Chat API call timed out, the user is asked to try again.
+    response = CardClicked.send_standup_answers_to_room({}, user, 'spaces/abc', False)
+    assert json.loads(response.get_data())['text'] == \
+        "🤕 Sorry, publishing your standup answers took too long. Please try again."
+
+
+def test_next_reply_failure(database_fixture, monkeypatch):
+    user = setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    for answer in ("Yesterday.", "Today.", "Nothing."):
+        assert Storage.add_standup_answer(google_id='abc', answer=answer)
+    assert 'cards' in Message.next_reply(user)
+
+    # A storage failure is not a finished standup.
+    monkeypatch.setattr(Storage, 'get_current_question_or_answers', lambda google_id: None)
+    assert Message.next_reply(user) is None
+    assert Message.add_answer(user, "Again.") is None
+    service = mock.MagicMock()
+    monkeypatch.setattr(Chat, 'get_chat_service', lambda: service)
+    Message.send_reply(user, Message.next_reply)
+    service.spaces().messages().create.assert_called_with(parent='spaces/abc',
+                                                          body={'text': Message.NO_NEXT_QUESTION})
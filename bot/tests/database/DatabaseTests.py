@@ -1,4 +1,7 @@
+import bot.utils.Deadline as Deadline
+import bot.utils.storage.DatabaseSchema as DatabaseSchema
 import bot.utils.storage.Storage as Storage
+import bot.utils.storage.Versions as Versions
 from bot.utils.User import User
 
 
@@ -199,3 +202,57 @@ def test_get_team_of_user(database_fixture):
     assert team is None
     team = Storage.get_team_of_user(google_id='abc')
     assert team.name == 'Backend'
+
+
+def test_get_question(database_fixture):
+    _add_teams()
+    _add_users()
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+
+    assert Storage.get_question(question_id=-1) is None
+    questions = Storage.get_questions(google_id='abc')
+    question = Storage.get_question(question_id=questions[0].id_)
+    assert question.question == questions[0].question
+    assert question.team_id == questions[0].team_id
+
+
+def test_data_versions(database_fixture):
+    teams_version = Versions.get(Versions.TEAMS)
+    _add_teams()
+    assert Versions.get(Versions.TEAMS) == teams_version + 2
+    # Failed writes do not change the version.
+    assert not Storage.add_team(team_name='Backend')
+    assert Versions.get(Versions.TEAMS) == teams_version + 2
+    assert Storage.join_room_to_team(team_name='Backend', space='abc')
+    assert Versions.get(Versions.TEAMS) == teams_version + 3
+
+
+def test_processed_events(database_fixture):
+    assert Storage.get_processed_event(key='MESSAGE:spaces/a/messages/b:1') is None
+    assert Storage.add_processed_event(key='MESSAGE:spaces/a/messages/b:1', status=200, response=b'{"text":"Hi"}')
+    assert not Storage.add_processed_event(key='MESSAGE:spaces/a/messages/b:1', status=200, response=b'{}')
+    assert Storage.get_processed_event(key='MESSAGE:spaces/a/messages/b:1') == (200, b'{"text":"Hi"}')
+    assert Storage.remove_processed_events(max_age_hours=1) == 0
+    assert Storage.remove_processed_events(max_age_hours=0) == 1
+    assert Storage.get_processed_event(key='MESSAGE:spaces/a/messages/b:1') is None
+
+
+def test_deadline(database_fixture):
+    _add_teams()
+    with Deadline.deadline(1):
+        assert len(Storage.get_teams()) == 2
+        with Storage.transaction() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SHOW statement_timeout")
+                assert cursor.fetchone()[0] != '10s'
+    # The deadline has passed, the transaction is not started.
+    with Deadline.deadline(0):
+        assert Storage.get_teams() is None
+    with Storage.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            assert cursor.fetchone()[0] == '10s'
+
+
+def test_schema_version(database_fixture):
+    assert Storage.get_schema_version() == len(DatabaseSchema.migrations)
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import bot.export_standups as export_standups
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+def add_standup(google_id: str, answers):
+    assert Storage.reset_standup(google_id=google_id)
+    for answer in answers:
+        assert Storage.add_standup_answer(google_id=google_id, answer=answer)
+
+
+def test_export(database_fixture):
+    for google_id in ('abc', 'def'):
+        Storage.add_user(user=User(0, google_id, f"User {google_id}", f"{google_id}@example.com", '',
+                                   f"spaces/{google_id}", True, ''))
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.add_team(team_name='Frontend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+    assert Storage.join_team(google_id='def', team_name='Frontend')
+    add_standup('abc', ["Fixed the tests.", "Release, \"quoted\"", "Nothing"])
+    add_standup('def', ["Reviewed the design."])
+
+    output = io.StringIO()
+    # A batch size of 1 fetches every row separately from the server-side cursor.
+    assert export_standups.export(output, 'csv', team_name='Backend', batch_size=1) == 3
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert [row['answer'] for row in rows] == ["Fixed the tests.", "Release, \"quoted\"", "Nothing"]
+    assert [row['question_order'] for row in rows] == ['1', '2', '3']
+    assert rows[0]['google_id'] == 'abc'
+    assert rows[0]['team'] == 'Backend'
+    assert rows[0]['question'] == 'What did you do yesterday?'
+
+    output = io.StringIO()
+    assert export_standups.export(output, 'jsonl', google_id='def') == 1
+    row = json.loads(output.getvalue())
+    assert row['team'] == 'Frontend'
+    assert row['answer'] == "Reviewed the design."
+    assert row['added'].startswith(date.today().isoformat())
+
+    # The date range is inclusive.
+    today = date.today()
+    assert export_standups.export(io.StringIO(), start=today, end=today) == 4
+    assert export_standups.export(io.StringIO(), end=today - timedelta(days=1)) == 0
+    assert export_standups.export(io.StringIO(), start=today + timedelta(days=1)) == 0
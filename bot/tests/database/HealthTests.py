@@ -0,0 +1,45 @@
+import os
+import time
+
+import bot.utils.Health as Health
+
+
+def test_readiness(database_fixture, monkeypatch, tmp_path):
+    credentials = tmp_path / 'credentials.json'
+    credentials.write_text('{}')
+    heartbeat = tmp_path / 'scheduler.heartbeat'
+    monkeypatch.setattr(Health.Chat, 'credentials_path', lambda: credentials)
+    monkeypatch.setattr(Health, 'SCHEDULER_HEARTBEAT', str(heartbeat))
+
+    Health.write_heartbeat()
+    is_ready, checks = Health.readiness()
+    assert is_ready, checks
+    assert set(checks) == {'database', 'chat', 'scheduler'}
+
+    # The scheduler did not run for too long.
+    old = time.time() - Health.SCHEDULER_MAX_AGE - 60
+    os.utime(heartbeat, (old, old))
+    is_ready, checks = Health.readiness()
+    assert not is_ready
+    assert not checks['scheduler']['ok']
+    assert checks['database']['ok']
+
+    # The credentials are missing.
+    credentials.unlink()
+    is_ready, checks = Health.readiness()
+    assert not checks['chat']['ok']
+
+
+def test_readiness_without_database(monkeypatch):
+    monkeypatch.setattr(Health.Storage, 'get_schema_version', lambda: None)
+    is_ok, message = Health.check_database()
+    assert not is_ok
+
+
+def test_readiness_with_slow_database(monkeypatch):
+    monkeypatch.setattr(Health, 'DB_CHECK_TIMEOUT', 0.05)
+    monkeypatch.setattr(Health.Storage, 'get_schema_version', lambda: time.sleep(0.5))
+    start = time.perf_counter()
+    is_ok, message = Health.check_database()
+    assert not is_ok
+    assert time.perf_counter() - start < 0.4
@@ -0,0 +1,65 @@
+import logging
+
+import bot.utils.storage.Instrumentation as Instrumentation
+import bot.utils.storage.Storage as Storage
+
+
+def test_params_shape():
+    assert Instrumentation.params_shape(None) == 'None'
+    assert Instrumentation.params_shape(('abc', 1, None, [1, 2])) == '(str, int, NoneType, list[2])'
+    assert Instrumentation.params_shape({'team': 'Backend'}) == "{'team': str}"
+
+
+def test_query_stats(database_fixture):
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.add_team(team_name='Frontend')
+    before = Instrumentation.stats().get('get_teams', {'queries': 0, 'rows': 0})
+    assert len(Storage.get_teams()) == 2
+    after = Instrumentation.stats()['get_teams']
+    assert after['queries'] == before['queries'] + 1
+    assert after['rows'] == before['rows'] + 2
+
+
+def test_slow_query_log(database_fixture, monkeypatch, caplog):
+    monkeypatch.setattr(Instrumentation, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(Instrumentation, 'EXPLAIN_SAMPLE_RATE', 1)
+    with caplog.at_level(logging.WARNING, logger='chatbot'):
+        assert Storage.add_team(team_name='Backend')
+        assert len(Storage.get_teams()) == 1
+    messages = [record.getMessage() for record in caplog.records]
+    slow_queries = {record.fields.resolve()['function']: record.fields.resolve() for record in caplog.records
+                    if record.getMessage().startswith('Slow query')}
+    assert 'INSERT INTO teams' in slow_queries['add_team']['sql']
+    assert slow_queries['add_team']['params'] == '(str)'
+    assert 'FROM teams' in slow_queries['get_teams']['sql']
+    # Only the SELECT queries are explained, add_team first checks whether the team exists.
+    plans = [message for message in messages if message.startswith('Plan of')]
+    assert [plan.split(':')[0] for plan in plans] == ['Plan of the slow query in add_team',
+                                                      'Plan of the slow query in get_teams']
+    assert 'actual time' in plans[1]
+
+
+def total_queries() -> int:
+    return sum(stats['queries'] for stats in Instrumentation.stats().values())
+
+
+def test_command_queries(database_fixture):
+    import bot.events.Message as Message
+    from bot.utils.User import User
+
+    user = User(0, 'abc', 'John Doe', 'abc@example.com', '', 'spaces/abc', True, '')
+    Storage.add_user(user=user)
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+
+    # The questions are read with one query.
+    before = total_queries()
+    Message.get_questions({}, user, 'spaces/abc', False)
+    assert total_queries() == before + 1
+
+    # The team of the user is read in the transaction of the statistics.
+    before = Instrumentation.stats().get('get_stats', {'queries': 0})['queries']
+    team_queries = Instrumentation.stats().get('get_team_of_user', {'queries': 0})['queries']
+    Message.get_stats({}, user, 'spaces/abc', False)
+    assert Instrumentation.stats().get('get_team_of_user', {'queries': 0})['queries'] == team_queries
+    assert Instrumentation.stats()['get_stats']['queries'] == before + 4
@@ -0,0 +1,38 @@
+from datetime import datetime
+from unittest import mock
+
+import bot.trigger_standup_dialog as trigger_standup_dialog
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+def test_trigger_standups(database_fixture, monkeypatch):
+    messages = []
+
+    def execute(request):
+        messages.append(request)
+        if len(messages) == 1:
+            raise TimeoutError()
+        return {'name': 'spaces/abc/messages/1'}
+
+    monkeypatch.setattr(trigger_standup_dialog.Chat, 'get_chat_service', mock.MagicMock)
+    monkeypatch.setattr(trigger_standup_dialog.Chat, 'execute', execute)
+
+    for google_id in ('abc', 'def'):
+        Storage.add_user(user=User(0, google_id, 'John Doe', f"{google_id}@example.com", '', f"spaces/{google_id}",
+                                   True, ''))
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+    assert Storage.join_team(google_id='def', team_name='Backend')
+    now = datetime.now()
+    Storage.update_schedule_time(google_id='abc', day=now.strftime("%A"), time='00:00:00')
+    Storage.update_schedule_time(google_id='def', day=now.strftime("%A"), time='00:00:00')
+    Storage.enable_schedule(google_id='abc', day=now.strftime("%A"), enable=True)
+    Storage.enable_schedule(google_id='def', day=now.strftime("%A"), enable=True)
+
+    # The first message fails, the scheduler continues with the other user.
+    assert trigger_standup_dialog.trigger_standups(now) == 1
+    assert len(messages) == 2
+    # The standups were triggered today.
+    assert trigger_standup_dialog.trigger_standups(now) == 0
+    assert len(messages) == 2
@@ -0,0 +1,170 @@
+import json
+from datetime import date, timedelta
+
+import bot.events.CardClicked as CardClicked
+import bot.events.Message as Message
+import bot.utils.Search as Search
+import bot.utils.storage.Storage as Storage
+from bot.utils.Search import SearchQuery
+from bot.utils.User import User
+
+
+@Storage.transact
+def shift_days(connection, google_id: str, days: int):
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE standups SET added = added - %s * interval '1 day' "
+                       "WHERE user_id = (SELECT id FROM users WHERE google_id = %s)", (days, google_id))
+
+
+def add_member(google_id: str, name: str, team_name: str) -> User:
+    user = User(0, google_id, name, f'{google_id}@example.com', '', f'spaces/{google_id}', True, '')
+    Storage.add_user(user=user)
+    assert Storage.join_team(google_id=google_id, team_name=team_name)
+    return user
+
+
+def do_standup(google_id: str, *answers: str):
+    assert Storage.reset_standup(google_id=google_id)
+    for answer in answers:
+        assert Storage.add_standup_answer(google_id=google_id, answer=answer)
+
+
+def search(text: str, **kwargs):
+    return [(result.user_name, result.team_name) for result in
+            Storage.search_answers(query=SearchQuery(text, **kwargs), limit=10)]
+
+
+def test_parse():
+    query = Search.parse('database migration team:"Team A" since:2023-01-01 until:2023-01-31 page:2')
+    assert (query.text, query.team, query.since, query.until, query.page) == \
+           ('database migration', 'Team A', date(2023, 1, 1), date(2023, 1, 31), 2)
+    assert query.to_tsquery() == 'database:* & migration:*'
+    assert SearchQuery('  "Pay-ments"! ').to_tsquery() == 'pay:* & ments:*'
+    assert SearchQuery('!?').to_tsquery() == ''
+    query = Search.parse("it's time:now")
+    assert (query.text, query.page) == ("it's time:now", 1)
+    assert SearchQuery.from_parameters(query.to_parameters(3)).page == 3
+
+
+def test_search(database_fixture):
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.add_team(team_name='Frontend')
+    anna = add_member('a', 'Anna', 'Backend')
+    add_member('b', 'Ben', 'Backend')
+    add_member('c', 'Chiara', 'Frontend')
+
+    do_standup('a', "Migrated the payment database.", "More database work, the database <is> slow.", "Nothing.")
+    do_standup('b', "Reviewed the login page.", "Payments.", "Nothing.")
+    do_standup('c', "Database migration of the settings.", "Tests.", "Nothing.")
+    shift_days('c', 10)
+
+    # The answer with more matches ranks first, the newer answers first among equal matches.
+    assert search('database') == [('Anna', 'Backend'), ('Anna', 'Backend'), ('Chiara', 'Frontend')]
+    assert Storage.search_answers(query=SearchQuery('database'), limit=1)[0].excerpt.count('<b>') == 2
+    assert search('database migra') == [('Chiara', 'Frontend'), ('Anna', 'Backend')]
+    assert search('PAY') == [('Ben', 'Backend'), ('Anna', 'Backend')]
+    assert search('database', team='Frontend') == [('Chiara', 'Frontend')]
+    assert search('database', since=date.today() - timedelta(days=1)) == [('Anna', 'Backend'), ('Anna', 'Backend')]
+    assert search('database', until=date.today() - timedelta(days=10)) == [('Chiara', 'Frontend')]
+    assert search('database', team='Nobody') == []
+    assert search('kubernetes') == []
+    assert search('!') == []
+
+    results = Storage.search_answers(query=SearchQuery('database slow'), limit=10)
+    assert len(results) == 1
+    assert results[0].question
+    # The answers are escaped, the matches are highlighted.
+    assert '&lt;is&gt;' in results[0].excerpt
+    assert '<b>slow</b>' in results[0].excerpt
+
+    # The pages.
+    assert [result.user_name for result in Storage.search_answers(query=SearchQuery('database'), limit=2,
+                                                                  offset=2)] == ['Chiara']
+
+    response = Message.search({'message': {'argumentText': 'database page:1'}}, anna, 'spaces/a', False)
+    card = json.loads(response.get_data())['cards'][0]
+    assert len(card['sections'][0]['widgets']) == 2
+    assert len(card['sections']) == 1
+
+    # In a room, only the answers of the team of the room are searched.
+    assert Storage.join_room_to_team(team_name='Frontend', space='spaces/frontend')
+    response = Message.search({'message': {'argumentText': 'database'}}, anna, 'spaces/frontend', True)
+    card = json.loads(response.get_data())['cards'][0]
+    assert [widget['keyValue']['topLabel'].split(',')[0] for widget in card['sections'][0]['widgets']] == ['Chiara']
+
+    response = Message.search({'message': {'argumentText': 'team:Backend'}}, anna, 'spaces/a', False)
+    assert 'text' in json.loads(response.get_data())
+
+
+def user_names(response):
+    response = json.loads(response.get_data())
+    if 'text' in response:
+        return response['text']
+    return [widget['keyValue']['topLabel'].split(',')[0] for widget in response['cards'][0]['sections'][0]['widgets']]
+
+
+def search_texts(argument: str, user: User, space: str, is_room: bool):
+    return user_names(Message.search({'message': {'argumentText': argument}}, user, space, is_room))
+
+
+def test_search_team(database_fixture):
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.add_team(team_name='Frontend')
+    anna = add_member('a', 'Anna', 'Backend')
+    chiara = add_member('c', 'Chiara', 'Frontend')
+    do_standup('a', "Database backups.")
+    do_standup('c', "Database migration.")
+
+    # In a direct message, only the answers of the own team are searched.
+    assert search_texts('database', anna, 'spaces/a', False) == ['Anna']
+    assert search_texts('database', chiara, 'spaces/c', False) == ['Chiara']
+    assert search_texts('database team:Backend', anna, 'spaces/a', False) == ['Anna']
+    text = search_texts('database team:Frontend', anna, 'spaces/a', False)
+    assert "only search the answers of your team 'Backend'" in text
+    # A room without a team and a user without a team find nothing.
+    assert 'Join a team' in search_texts('database', anna, 'spaces/room', True)
+    assert Storage.leave_team(google_id='a')
+    assert 'Join a team' in search_texts('database', anna, 'spaces/a', False)
+
+    # The parameters of the page buttons are checked, too.
+    action = {'actionMethodName': 'search',
+              'parameters': SearchQuery('database', team='Frontend').to_parameters(1)}
+    assert user_names(CardClicked.search({'action': action}, chiara, 'spaces/c', False)) == ['Chiara']
+    assert Storage.join_team(google_id='a', team_name='Backend')
+    assert 'Backend' in user_names(CardClicked.search({'action': action}, anna, 'spaces/a', False))
+
+
+def test_search_pages(database_fixture, monkeypatch):
+    monkeypatch.setattr(Search, 'PAGE_SIZE', 2)
+    assert Storage.add_team(team_name='Backend')
+    anna = add_member('a', 'Anna', 'Backend')
+    do_standup('a', "Database one.", "Database two.", "Database three.")
+
+    response = Message.search({'message': {'argumentText': 'database'}}, anna, 'spaces/a', False)
+    card = json.loads(response.get_data())['cards'][0]
+    assert len(card['sections'][0]['widgets']) == 2
+    button, = card['sections'][1]['widgets'][0]['buttons']
+    assert button['textButton']['text'] == 'NEXT'
+
+    action = button['textButton']['onClick']['action']
+    response = CardClicked.search({'action': action}, anna, 'spaces/a', False)
+    result = json.loads(response.get_data())
+    assert result['actionResponse'] == {"type": "UPDATE_MESSAGE"}
+    card = result['cards'][0]
+    assert len(card['sections'][0]['widgets']) == 1
+    button, = card['sections'][1]['widgets'][0]['buttons']
+    assert button['textButton']['text'] == 'PREVIOUS'
+
+
+def test_search_invalid_parameters(database_fixture):
+    assert Storage.add_team(team_name='Backend')
+    anna = add_member('a', 'Anna', 'Backend')
+    parameters = SearchQuery('database').to_parameters(1)
+    for key, value in (('since', '2023-13-01'), ('page', 'two'), ('until', 5)):
+        action = {'actionMethodName': 'search',
+                  'parameters': [dict(parameter, value=value) if parameter['key'] == key else parameter
+                                 for parameter in parameters]}
+        response = CardClicked.search({'action': action}, anna, 'spaces/a', False)
+        assert json.loads(response.get_data()) == {'text': Message.SEARCH_HELP}
+    response = CardClicked.search({'action': {'parameters': [{'value': 'x'}]}}, anna, 'spaces/a', False)
+    assert json.loads(response.get_data()) == {'text': Message.SEARCH_HELP}
@@ -0,0 +1,101 @@
+import bot.utils.storage.DatabaseSchema as DatabaseSchema
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+@Storage.transact
+def count_rows(connection, table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+@Storage.transact
+def rebuild_sessions(connection):
+    # The migration creates the sessions of today from the standups.
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM standup_sessions")
+        cursor.execute(DatabaseSchema.m8[1])
+
+
+def setup_user():
+    Storage.add_user(user=User(0, 'abc', 'John Doe', 'abc@example.com', '', 'spaces/abc', True, ''))
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+
+
+def test_session(database_fixture):
+    setup_user()
+    assert Storage.get_standup_answers(google_id='abc') == {}
+    assert not Storage.set_message_id(google_id='abc', message_id='spaces/team/messages/1')
+
+    assert Storage.reset_standup(google_id='abc')
+    for answer in ("Yesterday.", "Today.", "Nothing."):
+        assert Storage.add_standup_answer(google_id='abc', answer=answer)
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == \
+           ["Yesterday.", "Today.", "Nothing."]
+    assert Storage.get_standup_answer_message_id(google_id='abc') == ''
+    assert Storage.set_message_id(google_id='abc', message_id='spaces/team/messages/1')
+
+    # A restart keeps the answers and the card, the new answers replace the old ones.
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.add_standup_answer(google_id='abc', answer="Yesterday, again.")
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == \
+           ["Yesterday, again.", "Today.", "Nothing."]
+    assert Storage.get_standup_answer_message_id(google_id='abc') == 'spaces/team/messages/1'
+    assert count_rows('standup_sessions') == 1
+    assert count_rows('standup_session_answers') == 3
+    assert count_rows('standups') == 6
+
+    rebuild_sessions()
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == \
+           ["Yesterday, again.", "Today.", "Nothing."]
+    assert Storage.get_standup_answer_message_id(google_id='abc') == ''
+
+
+def test_session_change_team(database_fixture):
+    setup_user()
+    assert Storage.add_team(team_name='Frontend')
+    assert Storage.reset_standup(google_id='abc')
+    for answer in ("Backend yesterday.", "Backend today.", "Nothing."):
+        assert Storage.add_standup_answer(google_id='abc', answer=answer)
+    assert Storage.set_message_id(google_id='abc', message_id='spaces/backend/messages/1')
+
+    # The standup of the new team on the same day starts without the answers and the card of the old team.
+    assert Storage.leave_team(google_id='abc')
+    assert Storage.join_team(google_id='abc', team_name='Frontend')
+    assert Storage.get_standup_answers(google_id='abc') == {}
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.add_standup_answer(google_id='abc', answer="Frontend yesterday.")
+    assert [answer for question, answer in Storage.get_standup_answers(google_id='abc')] == ["Frontend yesterday."]
+    assert Storage.get_standup_answer_message_id(google_id='abc') == ''
+    assert count_rows('standup_session_answers') == 1
+
+
+@Storage.transact
+def shift_sessions(connection, days: int):
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE standup_sessions SET day = day - %s", (days,))
+
+
+def test_session_previous_days(database_fixture):
+    setup_user()
+    assert Storage.reset_standup(google_id='abc')
+    for answer in ("Yesterday.", "Today.", "Nothing."):
+        assert Storage.add_standup_answer(google_id='abc', answer=answer)
+    assert Storage.set_message_id(google_id='abc', message_id='spaces/team/messages/1')
+    shift_sessions(1)
+
+    # The session of yesterday keeps its message id, its answers are only kept in the standups.
+    assert Storage.reset_standup(google_id='abc')
+    assert count_rows('standup_sessions') == 2
+    assert count_rows('standup_session_answers') == 0
+    assert count_rows("standup_sessions WHERE message_id = 'spaces/team/messages/1'") == 1
+    assert count_rows('standups') == 5
+
+
+def test_session_schedule(database_fixture):
+    setup_user()
+    assert [user.google_id for user in Storage.get_users_with_schedule(day='Monday', time='23:59:59')] == ['abc']
+    assert Storage.reset_standup(google_id='abc')
+    assert Storage.get_users_with_schedule(day='Monday', time='23:59:59') == []
@@ -0,0 +1,73 @@
+import json
+
+import bot.events.Message as Message
+import bot.utils.storage.Storage as Storage
+from bot.utils.User import User
+
+
+@Storage.transact
+def shift_days(connection, days: int):
+    # Move the standups and statistics into the past, as if they were written days ago.
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE standups SET added = added - %s * interval '1 day'", (days,))
+        cursor.execute("UPDATE user_stats SET last_prompted = last_prompted - %s * interval '1 day', "
+                       "                      last_completed = last_completed - %s", (days, days))
+        cursor.execute("UPDATE team_daily_stats SET day = day - %s", (days,))
+
+
+def do_standup(google_id: str, complete: bool = True):
+    assert Storage.reset_standup(google_id=google_id)
+    if complete:
+        for answer in ("Yesterday.", "Today.", "Nothing."):
+            assert Storage.add_standup_answer(google_id=google_id, answer=answer)
+
+
+def user_stats(google_id: str):
+    stats = Storage.get_user_stats(google_id=google_id)
+    return stats.prompted, stats.completed, stats.current_streak, stats.longest_streak
+
+
+def test_stats(database_fixture):
+    user = User(0, 'abc', 'John Doe', 'abc@example.com', '', 'spaces/abc', True, '')
+    Storage.add_user(user=user)
+    assert Storage.add_team(team_name='Backend')
+    assert Storage.join_team(google_id='abc', team_name='Backend')
+    team = Storage.get_team_of_user(google_id='abc')
+    assert Storage.get_user_stats(google_id='abc') is None
+
+    do_standup('abc')
+    assert user_stats('abc') == (1, 1, 1, 1)
+    team_stats = Storage.get_team_stats(team=team, days=30)
+    assert (team_stats.prompted, team_stats.completed) == (1, 1)
+    assert team_stats.streaks == [('John Doe', 1)]
+    assert team_stats.participation == 1.0
+    # The standup was restarted and completed again on the same day.
+    do_standup('abc')
+    assert user_stats('abc') == (1, 1, 1, 1)
+
+    shift_days(1)
+    do_standup('abc')
+    assert user_stats('abc') == (2, 2, 2, 2)
+    # The standup of today was started, but not yet completed.
+    shift_days(1)
+    do_standup('abc', complete=False)
+    assert user_stats('abc') == (3, 2, 2, 2)
+    # The next standup ends the streak.
+    shift_days(1)
+    do_standup('abc')
+    assert user_stats('abc') == (4, 3, 1, 2)
+    team_stats = Storage.get_team_stats(team=team, days=30)
+    assert (team_stats.prompted, team_stats.completed) == (4, 3)
+    assert Storage.get_team_stats(team=team, days=1).prompted == 1
+
+    # Rebuilding the statistics from the standups gives the same result.
+    assert Storage.rebuild_stats()
+    assert user_stats('abc') == (4, 3, 1, 2)
+    team_stats = Storage.get_team_stats(team=team, days=30)
+    assert (team_stats.prompted, team_stats.completed) == (4, 3)
+
+    response = Message.get_stats({'message': {}}, user, 'spaces/abc', False)
+    card = json.loads(response.get_data())['cards'][0]
+    assert [section['header'] for section in card['sections']] == ["Your standups", "Team Backend"]
+    assert card['sections'][0]['widgets'][0]['keyValue']['content'] == "75% (3 of 4 standups)"
+    assert card['sections'][0]['widgets'][1]['keyValue']['content'] == "1 (longest 2)"
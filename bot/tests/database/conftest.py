@@ -23,7 +23,14 @@ def create_database():
 @Storage.transact
 def destroy_database(connection):
     with connection.cursor() as cursor:
-        sql = "DROP TABLE schedules CASCADE;" \
+        sql = "DROP TABLE conversation_cursors CASCADE;" \
+              "DROP TABLE standup_session_answers CASCADE;" \
+              "DROP TABLE standup_sessions CASCADE;" \
+              "DROP TABLE standups_archive CASCADE;" \
+              "DROP TABLE team_daily_stats CASCADE;" \
+              "DROP TABLE user_stats CASCADE;" \
+              "DROP TABLE processed_events CASCADE;" \
+              "DROP TABLE schedules CASCADE;" \
               "DROP TABLE standups CASCADE;" \
               "DROP TABLE questions CASCADE;" \
               "DROP TABLE users CASCADE;" \
@@ -0,0 +1,22 @@
+import json
+import subprocess
+import sys
+
+# Packages, which must only be imported when they are needed.
+LAZY_PACKAGES = ['googleapiclient', 'google.oauth2', 'google.auth.transport.requests']
+
+
+def _loaded_packages(module: str):
+    code = f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    modules = json.loads(result.stdout)
+    return [package for package in LAZY_PACKAGES
+            if any(name == package or name.startswith(package + '.') for name in modules)]
+
+
+def test_endpoint_cold_start():
+    assert _loaded_packages('bot.endpoint') == []
+
+
+def test_scheduler_cold_start():
+    assert _loaded_packages('bot.trigger_standup_dialog') == []
@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+import bot.utils.Deadline as Deadline
+
+
+def test_no_deadline():
+    assert Deadline.remaining() is None
+    assert Deadline.has_budget(1000)
+    assert Deadline.timeout(10) == 10
+
+
+def test_deadline():
+    with Deadline.deadline(5):
+        assert 4 < Deadline.remaining() <= 5
+        assert Deadline.has_budget(4)
+        assert not Deadline.has_budget(6)
+        assert Deadline.timeout(1) == 1
+        assert Deadline.timeout(10) <= 5
+        # A nested deadline cannot extend the deadline.
+        with Deadline.deadline(10):
+            assert Deadline.remaining() <= 5
+        with Deadline.deadline(1):
+            assert Deadline.remaining() <= 1
+        assert Deadline.remaining() > 1
+    assert Deadline.remaining() is None
+
+
+def test_deadline_exceeded():
+    with Deadline.deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(Deadline.DeadlineExceeded):
+            Deadline.timeout(10)
+
+
+def test_deadline_not_inherited_by_threads():
+    results = []
+    with Deadline.deadline(5):
+        thread = threading.Thread(target=lambda: results.append(Deadline.remaining()))
+        thread.start()
+        thread.join()
+    assert results == [None]
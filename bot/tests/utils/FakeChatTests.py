@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import bot.utils.Chat as Chat
+import bot.utils.Deadline as Deadline
+import benchmarks.fake_chat as fake_chat
+
+
+@pytest.fixture
+def server(monkeypatch):
+    requests = []
+    with fake_chat.FakeChatServer(seed=1, on_request=lambda method, name: requests.append((method, name))) as server:
+        monkeypatch.setattr(Chat, 'CHAT_API_ROOT', server.url)
+        # The chat services of the other tests must not be reused.
+        monkeypatch.setattr(Chat, '_local', threading.local())
+        server.requests = requests
+        yield server
+
+
+def test_messages(server):
+    chat = Chat.get_chat_service()
+    message = Chat.execute(chat.spaces().messages().create(parent='spaces/team', threadKey='20230109',
+                                                           body={'text': "Hello", 'cards': [{'header': {}}]}))
+    assert message['name'] == 'spaces/team/messages/1'
+    assert message['text'] == "Hello"
+
+    message = Chat.execute(chat.spaces().messages().update(name=message['name'], updateMask='cards,text',
+                                                           body={'text': "Hello (updated)", 'cards': []}))
+    assert message['text'] == "Hello (updated)"
+    assert server.messages['spaces/team/messages/1']['text'] == "Hello (updated)"
+    assert server.requests == [('chat.spaces.messages.create', 'spaces/team'),
+                               ('chat.spaces.messages.update', 'spaces/team/messages/1')]
+
+    with pytest.raises(HttpError) as error:
+        Chat.execute(chat.spaces().messages().get(name='spaces/team/messages/2'))
+    assert error.value.resp.status == 404
+
+
+def test_faults(server):
+    chat = Chat.get_chat_service()
+    server.quota_rate = 1
+    with pytest.raises(HttpError) as error:
+        Chat.execute(chat.spaces().messages().create(parent='spaces/team', body={'text': "Hello"}))
+    assert error.value.resp.status == 429
+
+    server.quota_rate = 0
+    server.error_rate = 1
+    with pytest.raises(HttpError) as error:
+        Chat.execute(chat.spaces().messages().create(parent='spaces/team', body={'text': "Hello"}))
+    assert error.value.resp.status == 500
+    assert server.stats() == {'quota_exceeded': 1, 'errors': 1, 'messages': 0}
+    assert not server.requests
+
+
+def test_latency(server):
+    chat = Chat.get_chat_service()
+    server.latency = 1
+    # The call is cut off at the deadline of the request.
+    with Deadline.deadline(0.2):
+        with pytest.raises(Exception):
+            Chat.execute(chat.spaces().messages().create(parent='spaces/team', body={'text': "Hello"}))
@@ -0,0 +1,40 @@
+import threading
+
+import bot.utils.Idempotency as Idempotency
+
+EVENT = {'type': 'MESSAGE', 'eventTime': '2023-01-09T08:00:00.123Z', 'message': {'name': 'spaces/a/messages/b'}}
+
+
+def test_get_key():
+    assert Idempotency.get_key(EVENT) == 'MESSAGE:spaces/a/messages/b:2023-01-09T08:00:00.123Z'
+    assert Idempotency.get_key({'type': 'ADDED_TO_SPACE', 'eventTime': '2023-01-09T08:00:00.123Z'}) is None
+
+
+def test_response_cache():
+    cache = Idempotency.ResponseCache(max_size=2, persist=False)
+    assert cache.begin('a') is None
+    cache.finish('a', 200, b'{"text":"a"}')
+    assert cache.begin('a') == (200, b'{"text":"a"}')
+
+    # A failed event is processed again.
+    assert cache.begin('b') is None
+    cache.finish('b')
+    assert cache.begin('b') is None
+    cache.finish('b', 200, b'{}')
+
+    # The least recently used response is evicted.
+    assert cache.begin('c') is None
+    cache.finish('c', 200, b'{}')
+    assert cache.begin('a') is None
+    cache.finish('a')
+
+
+def test_response_cache_in_flight():
+    cache = Idempotency.ResponseCache(persist=False)
+    assert cache.begin('a') is None
+    results = []
+    retry = threading.Thread(target=lambda: results.append(cache.begin('a')))
+    retry.start()
+    cache.finish('a', 200, b'{}')
+    retry.join()
+    assert results == [(200, b'{}')]
@@ -0,0 +1,28 @@
+import json
+
+import bot.utils.Json as Json
+
+MESSAGE = {'text': "🤕 Sorry, I couldn't add the new team 'Ünicode'.",
+           'cards': [{'sections': [{'widgets': [{'keyValue': {'content': "Order: 1", 'value': 3}}]}]}]}
+
+
+def test_dumps():
+    data = Json.dumps(MESSAGE)
+    assert json.loads(data.decode('utf-8')) == MESSAGE
+    # The emojis are written as UTF-8, and no whitespace is added.
+    assert "🤕".encode('utf-8') in data
+    assert len(data) == len(json.dumps(MESSAGE, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(Json, 'orjson', None)
+    data = Json.dumps(MESSAGE)
+    assert json.loads(data.decode('utf-8')) == MESSAGE
+    assert "🤕".encode('utf-8') in data
+
+
+def test_response():
+    response = Json.response(MESSAGE)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == MESSAGE
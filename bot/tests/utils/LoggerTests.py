@@ -0,0 +1,61 @@
+import json
+import logging
+
+from bot.utils.Logger import Fields, JsonFormatter, SamplingFilter, TextFormatter, fields, logger, \
+    parse_sampling_rates, setup_logger, stop_logger
+
+
+def _record(message, *args, **extra):
+    record = logging.LogRecord('chatbot', logging.INFO, __file__, 1, message, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_fields_are_lazy():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return 'value'
+
+    record_fields = Fields({'key': expensive, 'number': 1})
+    assert not calls
+    assert str(record_fields) == 'key=value number=1'
+    assert str(record_fields) == 'key=value number=1'
+    assert len(calls) == 1
+
+
+def test_sampling_filter():
+    sampling_filter = SamplingFilter(parse_sampling_rates('event=0, command=1'))
+    assert not sampling_filter.filter(_record("The event.", **fields('event')))
+    assert sampling_filter.filter(_record("The command.", **fields('command')))
+    assert sampling_filter.filter(_record("Other."))
+
+
+def test_formatters():
+    record = _record("Slash command %s", '13', **fields('command', user=lambda: 'abc'))
+    assert TextFormatter("%(message)s").format(record) == "Slash command 13  user=abc"
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == "Slash command 13"
+    assert entry['category'] == 'command'
+    assert entry['user'] == 'abc'
+    assert entry['level'] == 'INFO'
+
+
+def test_exception_through_queue(monkeypatch, capsys):
+    monkeypatch.setenv('LOG_FORMAT', 'json')
+    setup_logger(False, '')
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Could not divide %s.", 'one')
+    finally:
+        # Waits for the queued records.
+        stop_logger()
+    entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert entry['message'] == "Could not divide one."
+    assert entry['exception'].startswith("Traceback")
+    assert entry['exception'].endswith("ZeroDivisionError: division by zero")
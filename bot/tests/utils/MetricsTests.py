@@ -0,0 +1,80 @@
+import bot.utils.Metrics as Metrics
+
+
+def test_render(monkeypatch):
+    monkeypatch.setattr(Metrics, '_metrics', {})
+    events = Metrics.counter('events_total', "Events.", ['type'])
+    duration = Metrics.histogram('duration_seconds', "Duration.", ['type'], buckets=(0.1, 1.0))
+    Metrics.gauge('pool_connections', "Connections.", ['state'], callback=lambda: {('idle',): 3})
+
+    events.inc('MESSAGE')
+    events.inc('MESSAGE')
+    events.inc('CARD "CLICKED"')
+    duration.observe(0.05, 'MESSAGE')
+    duration.observe(0.5, 'MESSAGE')
+    duration.observe(5, 'MESSAGE')
+
+    lines = Metrics.render().splitlines()
+    assert '# TYPE events_total counter' in lines
+    assert 'events_total{type="MESSAGE"} 2' in lines
+    assert 'events_total{type="CARD \\"CLICKED\\""} 1' in lines
+    assert '# TYPE duration_seconds histogram' in lines
+    assert 'duration_seconds_bucket{type="MESSAGE",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{type="MESSAGE",le="1"} 2' in lines
+    assert 'duration_seconds_bucket{type="MESSAGE",le="+Inf"} 3' in lines
+    assert 'duration_seconds_sum{type="MESSAGE"} 5.55' in lines
+    assert 'duration_seconds_count{type="MESSAGE"} 3' in lines
+    assert 'pool_connections{state="idle"} 3' in lines
+
+
+def test_multiple_processes(monkeypatch, tmp_path):
+    monkeypatch.setattr(Metrics, '_metrics', {})
+    monkeypatch.setattr(Metrics, 'METRICS_DIR', str(tmp_path))
+    runs = Metrics.counter('runs_total', "Runs.")
+    users = Metrics.gauge('users', "Users.")
+
+    # A previous run of the scheduler.
+    runs.inc()
+    users.set(5)
+    Metrics.write_snapshot('scheduler')
+    runs.clear()
+    users.clear()
+    Metrics.restore_snapshot('scheduler')
+    assert runs.samples() == {(): 1.0}
+    assert users.samples() == {}
+
+    # The snapshot of the scheduler is merged with the metrics of the server process.
+    runs.clear()
+    runs.inc()
+    lines = Metrics.render().splitlines()
+    assert 'runs_total 2' in lines
+    assert 'users 5' in lines
+
+
+def test_exited_processes(monkeypatch, tmp_path):
+    monkeypatch.setattr(Metrics, '_metrics', {})
+    monkeypatch.setattr(Metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(Metrics, '_is_alive', lambda pid: pid == 2)
+    runs = Metrics.counter('runs_total', "Runs.")
+    users = Metrics.gauge('users', "Users.")
+
+    # The snapshots of two exited workers and a running one.
+    for pid in (1, 2, 3):
+        runs.clear()
+        runs.inc(amount=pid)
+        users.set(pid)
+        Metrics.write_snapshot(str(pid))
+    runs.clear()
+    users.clear()
+
+    lines = Metrics.render().splitlines()
+    assert 'runs_total 6' in lines
+    assert 'users 2' in lines
+    # The exited workers are folded into one snapshot, their counters keep counting.
+    assert sorted(path.name for path in tmp_path.glob('*.json')) == ['2.json', 'dead.json']
+    runs.clear()
+    runs.inc(amount=4)
+    Metrics.write_snapshot('4')
+    runs.clear()
+    assert 'runs_total 10' in Metrics.render().splitlines()
+    assert 'runs_total 10' in Metrics.render().splitlines()
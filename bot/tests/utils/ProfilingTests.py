@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import bot.utils.Profiling as Profiling
+
+EVENT = {'type': 'MESSAGE', 'user': {'name': 'users/1'},
+         'message': {'text': '/get_teams', 'slashCommand': {'commandId': '3'}}}
+
+
+@pytest.fixture
+def profiles(monkeypatch, tmp_path):
+    monkeypatch.setattr(Profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(Profiling, 'PROFILE_SAMPLE_RATE', 0)
+    monkeypatch.setattr(Profiling, 'PROFILE_TOKEN', '')
+    monkeypatch.setattr(Profiling, 'PROFILE_USERS', frozenset())
+    return tmp_path
+
+
+def busy():
+    return sum(i * i for i in range(10000))
+
+
+def test_disabled(profiles):
+    with Profiling.profile(EVENT, {'X-Profile-Token': ''}) as profiler:
+        assert profiler is None
+        busy()
+    assert not list(profiles.iterdir())
+
+
+def test_sample_rate(profiles, monkeypatch):
+    monkeypatch.setattr(Profiling, 'PROFILE_SAMPLE_RATE', 1)
+    with Profiling.profile(EVENT, {}) as profiler:
+        assert profiler is not None
+        busy()
+    prof, = profiles.glob('*.prof')
+    assert '-command_get_teams-' in prof.name
+    summary = prof.with_suffix('.txt').read_text()
+    assert summary.startswith("Event: command:get_teams\nWall time: ")
+    assert 'busy' in summary
+
+
+def test_token_and_users(profiles, monkeypatch):
+    monkeypatch.setattr(Profiling, 'PROFILE_TOKEN', 'secret')
+    assert Profiling.is_requested(EVENT, {'X-Profile-Token': 'secret'})
+    assert not Profiling.is_requested(EVENT, {'X-Profile-Token': 'wrong'})
+    assert not Profiling.is_requested(EVENT, {})
+    monkeypatch.setattr(Profiling, 'PROFILE_USERS', frozenset(['users/1']))
+    assert Profiling.is_requested(EVENT, {})
+    assert not Profiling.is_requested(dict(EVENT, user={'name': 'users/2'}), {})
+
+
+def test_one_at_a_time(profiles, monkeypatch):
+    monkeypatch.setattr(Profiling, 'PROFILE_SAMPLE_RATE', 1)
+    with Profiling.profile(EVENT, {}) as profiler:
+        assert profiler is not None
+        # A concurrent request is not profiled.
+        nested = []
+        thread = threading.Thread(target=lambda: nested.append(Profiling.profile(EVENT, {}).__enter__()))
+        thread.start()
+        thread.join()
+        assert nested == [None]
+    assert len(list(profiles.glob('*.prof'))) == 1
+
+
+def test_max_files(profiles, monkeypatch):
+    monkeypatch.setattr(Profiling, 'PROFILE_SAMPLE_RATE', 1)
+    monkeypatch.setattr(Profiling, 'PROFILE_MAX_FILES', 2)
+    for _ in range(4):
+        with Profiling.profile(EVENT, {}):
+            busy()
+    assert len(list(profiles.glob('*.prof'))) == 2
+    assert len(list(profiles.glob('*.txt'))) == 2
+
+
+def test_incomplete_events(profiles, monkeypatch):
+    assert Profiling.event_label({'type': 'CARD_CLICKED'}) == 'action:None'
+    assert Profiling.event_label({'type': 'MESSAGE', 'message': {'slashCommand': {'type': 'APP'}}}) == 'command:None'
+
+    # A failure before the profiling starts does not block the next profiles.
+    monkeypatch.setattr(Profiling, 'PROFILE_SAMPLE_RATE', 1)
+    event_label = Profiling.event_label
+    monkeypatch.setattr(Profiling, 'event_label', lambda event: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        Profiling.profile(EVENT, {})
+    monkeypatch.setattr(Profiling, 'event_label', event_label)
+    with Profiling.profile(EVENT, {}) as profiler:
+        assert profiler is not None
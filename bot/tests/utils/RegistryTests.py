@@ -0,0 +1,69 @@
+import pytest
+from flask import Flask
+
+import bot.events.CardClicked as CardClicked
+import bot.events.Message as Message
+from bot.utils.Registry import DM_ONLY, ROOM_ONLY, Registry
+from bot.utils.User import User
+
+USER = User(0, 'abc', 'John Doe', 'john.doe@example.com', '', 'space/abc', True, '')
+
+
+@pytest.fixture
+def registry():
+    app = Flask(__name__)
+    registry = Registry('test', {DM_ONLY: "dm only", ROOM_ONLY: "room only"})
+
+    @registry.register('1', '2')
+    def echo(event, user, space, is_room):
+        return event
+
+    @registry.register('dm', requires=DM_ONLY)
+    def dm(event, user, space, is_room):
+        return 'dm'
+
+    @registry.register('room', requires=ROOM_ONLY)
+    def room(event, user, space, is_room):
+        return 'room'
+
+    @registry.register('fail')
+    def fail(event, user, space, is_room):
+        raise RuntimeError()
+
+    with app.app_context():
+        yield registry
+
+
+def test_dispatch(registry):
+    assert registry.dispatch('1', 'event 1', USER, 'space', False) == 'event 1'
+    assert registry.dispatch('2', 'event 2', USER, 'space', True) == 'event 2'
+    assert registry.dispatch('unknown', {}, USER, 'space', False) is None
+    assert registry.metrics()['echo']['calls'] == 2
+
+    with pytest.raises(ValueError):
+        registry.register('1')(lambda event, user, space, is_room: None)
+
+
+def test_requirements(registry):
+    assert registry.dispatch('dm', {}, USER, 'space', False) == 'dm'
+    assert registry.dispatch('dm', {}, USER, 'space', True).get_json() == {'text': "dm only"}
+    assert registry.dispatch('room', {}, USER, 'space', True) == 'room'
+    assert registry.dispatch('room', {}, USER, 'space', False).get_json() == {'text': "room only"}
+    metrics = registry.metrics()
+    assert metrics['dm']['calls'] == 1 and metrics['dm']['rejected'] == 1
+    assert metrics['room']['calls'] == 1 and metrics['room']['rejected'] == 1
+
+
+def test_errors(registry):
+    with pytest.raises(RuntimeError):
+        registry.dispatch('fail', {}, USER, 'space', False)
+    metrics = registry.metrics()['fail']
+    assert metrics['calls'] == 1 and metrics['errors'] == 1
+
+
+def test_registered_commands_and_actions():
+    for command in ['1'] + [str(command) for command in range(3, 17)]:
+        assert Message.commands.get(command) is not None
+    for action in ['join_team', 'remove_team', 'send_answers', 'enable_schedule', 'remove_question',
+                   'reorder_questions']:
+        assert CardClicked.actions.get(action) is not None
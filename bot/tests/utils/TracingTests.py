@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+
+import bot.utils.Tracing as Tracing
+
+
+@pytest.fixture
+def exporter():
+    exporter = Tracing.InMemoryExporter()
+    Tracing.set_exporter(exporter)
+    yield exporter
+    Tracing.set_exporter(None)
+
+
+def test_no_trace(exporter):
+    # Spans are only recorded within a trace.
+    with Tracing.span('storage.get_teams') as span:
+        assert span is None
+    assert not exporter.traces
+
+
+def test_disabled():
+    with Tracing.span('on_event', root=True) as span:
+        assert span is None
+        assert Tracing.trace_id() is None
+
+
+def test_trace(exporter):
+    with Tracing.span('on_event', root=True, type='MESSAGE') as root:
+        with Tracing.span('auth'):
+            pass
+        with Tracing.span('commands.add_team'):
+            with Tracing.span('storage.add_team') as span:
+                span.set('rows', 1)
+        with pytest.raises(ValueError):
+            with Tracing.span('chat.create'):
+                raise ValueError()
+        assert Tracing.trace_id() == root.trace_id
+
+    assert Tracing.trace_id() is None
+    trace, = exporter.traces
+    assert [span['name'] for span in trace] == ['auth', 'storage.add_team', 'commands.add_team', 'chat.create',
+                                                'on_event']
+    spans = {span['name']: span for span in trace}
+    assert all(span['trace_id'] == root.trace_id for span in trace)
+    assert spans['on_event']['parent_id'] is None
+    assert spans['on_event']['attributes'] == {'type': 'MESSAGE'}
+    assert spans['auth']['parent_id'] == spans['on_event']['span_id']
+    assert spans['storage.add_team']['parent_id'] == spans['commands.add_team']['span_id']
+    assert spans['storage.add_team']['attributes'] == {'rows': 1}
+    assert spans['chat.create']['error'] == 'ValueError'
+    assert spans['on_event']['duration_ms'] >= spans['commands.add_team']['duration_ms']
+
+
+def test_trace_id_filter(exporter):
+    record = logging.LogRecord('chatbot', logging.INFO, __file__, 1, "Message.", None, None)
+    with Tracing.span('on_event', root=True) as root:
+        assert Tracing.TraceIdFilter().filter(record)
+    assert record.trace_id == root.trace_id
+
+
+def test_file_exporter(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    Tracing.set_exporter(Tracing.FileExporter(str(path)))
+    try:
+        with Tracing.span('on_event', root=True):
+            with Tracing.span('auth'):
+                pass
+        with Tracing.span('on_event', root=True):
+            pass
+    finally:
+        Tracing.set_exporter(None)
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert '"auth"' in lines[0]
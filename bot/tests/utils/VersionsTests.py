@@ -0,0 +1,13 @@
+import os
+
+import bot.utils.storage.Versions as Versions
+
+
+def test_versions_are_shared_with_forked_processes():
+    teams_version = Versions.get(Versions.TEAMS)
+    pid = os.fork()
+    if pid == 0:
+        Versions.bump(Versions.TEAMS)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert Versions.get(Versions.TEAMS) == teams_version + 1
@@ -1,43 +1,89 @@
 #!/usr/bin/env python3
 
+import time
 from datetime import datetime
 
 import bot.utils.Chat as Chat
+import bot.utils.Health as Health
+import bot.utils.Metrics as Metrics
+import bot.utils.Tracing as Tracing
 import bot.utils.storage.Storage as Storage
 from bot.utils.Logger import logger, setup_logger
 
+SCHEDULER_RUNS = Metrics.counter('standup_bot_scheduler_runs_total', "Runs of the scheduler.")
+SCHEDULER_DURATION = Metrics.histogram('standup_bot_scheduler_duration_seconds', "Duration of the scheduler runs.")
+SCHEDULER_USERS = Metrics.gauge('standup_bot_scheduler_users', "Users triggered by the last run of the scheduler.")
+SCHEDULER_MESSAGES = Metrics.counter('standup_bot_scheduler_messages_total', "Standup messages sent by the scheduler.")
+SCHEDULER_ERRORS = Metrics.counter('standup_bot_scheduler_errors_total', "Standup messages which could not be sent.")
+SCHEDULER_LAST_RUN = Metrics.gauge('standup_bot_scheduler_last_run_timestamp_seconds',
+                                   "Unix time of the last run of the scheduler.")
 
-if __name__ == '__main__':
-    setup_logger(True, '')
 
-    # Get current time and weekday.
-    now = datetime.now()
+def get_standup_text(user) -> str:
+    next_question = Storage.get_current_question(google_id=user.google_id)
+    if next_question is None:
+        return "🤕 Sorry, I could not find a standup question. " \
+               "Add new questions with `/add_question QUESTION`."
+    return f"*Hi {user.name}!*\nIt is standup time.\n\n" \
+           f"_{next_question.question}_"
+
+
+def trigger_standup(user) -> bool:
+    """
+    Start the standup of a user, and send the first question.
+    :return: Whether the message was sent.
+    """
+    with Tracing.span('scheduler.trigger', root=True, user=user.google_id):
+        logger.info(f"Trigger for user: {user.name}, {user.google_id}, {user.space}")
+        try:
+            chat = Chat.get_chat_service()
+            Storage.reset_standup(google_id=user.google_id)
+            text = get_standup_text(user)
+            response = Chat.execute(chat.spaces().messages().create(
+                parent=user.space,
+                body={'text': text}
+            ))
+        except Exception as e:
+            # Continue with the other users.
+            logger.error("Could not trigger the standup of %s: %s", user.google_id, e)
+            SCHEDULER_ERRORS.inc()
+            return False
+        logger.debug("Response: %s", response)
+        SCHEDULER_MESSAGES.inc()
+        return True
+
+
+def trigger_standups(now: datetime = None) -> int:
+    """
+    Send the first standup question to all users with an active schedule, which was not yet triggered today.
+    :param now: The time of the schedule, defaults to the current time.
+    :return: The number of sent messages.
+    """
+    start = time.perf_counter()
+    now = now or datetime.now()
+
+    # Forget the processed events, Google Chat does not retry them after such a long time.
+    Storage.remove_processed_events(max_age_hours=24)
+
+    # Get the users with an active schedule, which was not yet triggered.
     time_str = now.strftime("%H:%M:%S")
     schedule_day = now.strftime("%A")
-    # Get the users with an active schedule, which was not yet triggered.
-    users = Storage.get_users_with_schedule(day=schedule_day, time=time_str)
-    if not users:
-        exit(0)
-
-    # Initialize the chat service.
-    chat = Chat.get_chat_service()
+    users = Storage.get_users_with_schedule(day=schedule_day, time=time_str) or []
+    SCHEDULER_USERS.set(len(users))
 
     # Send the standup message.
-    for user in users:
-        if not user.space:
-            continue
-        logger.info(f"Trigger for user: {user.name}, {user.google_id}, {user.space}")
-        Storage.reset_standup(google_id=user.google_id)
-        next_question = Storage.get_current_question(google_id=user.google_id)
-        if next_question is None:
-            text = "🤕 Sorry, I could not find a standup question. " \
-                   "Add new questions with `/add_question QUESTION`."
-        else:
-            text = f"*Hi {user.name}!*\nIt is standup time.\n\n" \
-                   f"_{next_question.question}_"
-
-        response = chat.spaces().messages().create(
-            parent=user.space,
-            body={'text': text}
-        ).execute()
-        logger.debug(f"Response: {response}")
+    sent = sum(trigger_standup(user) for user in users if user.space)
+
+    SCHEDULER_RUNS.inc()
+    SCHEDULER_DURATION.observe(time.perf_counter() - start)
+    SCHEDULER_LAST_RUN.set(time.time())
+    return sent
+
+
+if __name__ == '__main__':
+    setup_logger(True, '')
+    Tracing.setup_tracing()
+    Metrics.restore_snapshot('scheduler')
+    trigger_standups()
+    Metrics.write_snapshot('scheduler')
+    Health.write_heartbeat()
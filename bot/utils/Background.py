@@ -0,0 +1,51 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from bot.utils.Logger import logger
+
+MAX_WORKERS = int(os.environ.get('BACKGROUND_THREADS', 2))
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _reset_after_fork():
+    # The threads of the executor do not exist in the forked child process.
+    global _lock, _executor
+    _lock = threading.Lock()
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _run(name: str, func: Callable, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed.", name)
+
+
+def pending() -> int:
+    """
+    Get the number of tasks, which wait for a free thread.
+    """
+    executor = _executor
+    if executor is None:
+        return 0
+    return executor._work_queue.qsize()
+
+
+def submit(name: str, func: Callable, *args, **kwargs) -> Future:
+    """
+    Run a task after the response has been sent, e.g. a slow Chat API call. The task runs without deadline.
+    :param name: The name of the task, for the log.
+    :param func: The task.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='background')
+        return _executor.submit(_run, name, func, *args, **kwargs)
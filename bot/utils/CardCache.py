@@ -0,0 +1,45 @@
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+import bot.utils.Json as Json
+import bot.utils.storage.Versions as Versions
+
+MAX_SIZE = 1024
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def size() -> int:
+    return len(_cache)
+
+
+def render(key: Hashable, version_key: str, build: Callable[[], Optional[Any]]) -> Optional[bytes]:
+    """
+    Get a serialized card from the cache, or build and serialize it if the data changed since it was cached.
+    :param key: The key of the card, e.g. the card type and its parameters.
+    :param version_key: The key of the data version the card depends on, see bot.utils.storage.Versions.
+    :param build: Fetches the data and builds the card. If it returns None nothing is cached.
+    :return: The serialized card, or None if build returned None.
+    """
+    # Read the version before the data is fetched. If the data is changed in the meantime, the version is
+    # increased after the commit and the card is rebuilt on the next call.
+    version = Versions.get(version_key)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    card = build()
+    if card is None:
+        return None
+    data = Json.dumps(card)
+    with _lock:
+        if len(_cache) >= MAX_SIZE:
+            _cache.clear()
+        _cache[key] = (version, data)
+    return data
+
+
+def clear():
+    with _lock:
+        _cache.clear()
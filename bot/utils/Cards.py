@@ -1,8 +1,10 @@
 from datetime import date
-from typing import Sequence
+from typing import Optional, Sequence
 
 from bot.utils.Question import Question
 from bot.utils.Schedule import Schedule
+from bot.utils.Search import SearchQuery, SearchResult
+from bot.utils.Stats import TeamStats, UserStats
 from bot.utils.Team import Team
 from bot.utils.User import User
 
@@ -372,3 +374,114 @@ def get_question_reorder_card(questions: Sequence[Question], order_step: int):
     if order_step > 1:
         result['actionResponse'] = {"type": "UPDATE_MESSAGE"}
     return result
+
+
+def _format_rate(completed: int, prompted: int, rate: Optional[float]) -> str:
+    if rate is None:
+        return "No standups yet."
+    return f"{rate:.0%} ({completed} of {prompted} standups)"
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours} h {minutes} min"
+    if minutes:
+        return f"{minutes} min {seconds} s"
+    return f"{seconds} s"
+
+
+def get_stats_card(user_stats: Optional[UserStats], team_stats: Optional[TeamStats]):
+    sections = []
+    if user_stats is not None:
+        sections.append({
+            "header": "Your standups",
+            "widgets": [
+                {"keyValue": {"topLabel": "Participation",
+                              "content": _format_rate(user_stats.completed, user_stats.prompted,
+                                                      user_stats.participation)}},
+                {"keyValue": {"topLabel": "Streak",
+                              "content": f"{user_stats.current_streak} (longest {user_stats.longest_streak})"}},
+                {"keyValue": {"topLabel": "Average time to answer",
+                              "content": _format_duration(user_stats.average_completion_seconds)}}
+            ]
+        })
+    if team_stats is not None:
+        widgets = [
+            {"keyValue": {"topLabel": f"Participation, last {team_stats.days} days",
+                          "content": _format_rate(team_stats.completed, team_stats.prompted,
+                                                  team_stats.participation)}},
+            {"keyValue": {"topLabel": "Average time to answer",
+                          "content": _format_duration(team_stats.average_completion_seconds)}}
+        ]
+        for name, streak in team_stats.streaks:
+            widgets.append({"keyValue": {"topLabel": "Streak", "content": f"{name}: {streak}"}})
+        sections.append({"header": f"Team {team_stats.name}", "widgets": widgets})
+    if not sections:
+        sections.append({"widgets": [{
+            "keyValue": {
+                "contentMultiline": "true",
+                "content": "No statistics found. Join a team with `/join_team` and do your first standup.",
+            }
+        }]})
+    return {"cards": [{
+                "header": {"title": "Statistics"},
+                "sections": sections
+            }]}
+
+
+def _search_button(text: str, query: SearchQuery, page: int):
+    return {"textButton": {
+        "text": text,
+        "onClick": {
+            "action": {
+                "actionMethodName": "search",
+                "parameters": query.to_parameters(page)
+            }
+        }
+    }}
+
+
+def get_search_card(query: SearchQuery, results: Sequence[SearchResult], has_more: bool, is_update: bool):
+    widgets = []
+    if not results:
+        widgets.append({
+            "keyValue": {
+                "contentMultiline": "true",
+                "content": "No answers found.",
+            }
+        })
+    for result in results:
+        widgets.append({
+            "keyValue": {
+                "topLabel": f"{result.user_name}, {result.team_name}, {result.added.strftime('%Y-%m-%d')}",
+                "contentMultiline": "true",
+                "content": result.excerpt,
+                "bottomLabel": result.question
+            }
+        })
+    sections = [{"widgets": widgets}]
+    buttons = []
+    if query.page > 1:
+        buttons.append(_search_button("PREVIOUS", query, query.page - 1))
+    if has_more:
+        buttons.append(_search_button("NEXT", query, query.page + 1))
+    if buttons:
+        sections.append({"widgets": [{"buttons": buttons}]})
+    filters = [f"team {query.team}"] if query.team else []
+    if query.since:
+        filters.append(f"since {query.since.isoformat()}")
+    if query.until:
+        filters.append(f"until {query.until.isoformat()}")
+    subtitle = f"'{query.text}'{', ' if filters else ''}{', '.join(filters)}, page {query.page}"
+    result = \
+        {"cards": [{
+            "header": {"title": "Search", "subtitle": subtitle},
+            "sections": sections
+        }]}
+    if is_update:
+        result['actionResponse'] = {"type": "UPDATE_MESSAGE"}
+    return result
@@ -1,14 +1,94 @@
 import os
-
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+import threading
+import time
 from pathlib import Path
 
+import bot.utils.Deadline as Deadline
+import bot.utils.Metrics as Metrics
+import bot.utils.Tracing as Tracing
+
+# Timeout in seconds of a Chat API call, it is shortened to the deadline of the current request.
+CHAT_TIMEOUT = float(os.environ.get('CHAT_TIMEOUT', 10))
+# The root URL of another Chat API, e.g. the fake server of benchmarks/fake_chat.py. It is used without credentials.
+CHAT_API_ROOT = os.environ.get('CHAT_API_ROOT', '')
+
+CHAT_API_DURATION = Metrics.histogram('standup_bot_chat_api_duration_seconds', "Duration of the Chat API calls.",
+                                      ['method'])
+CHAT_API_ERRORS = Metrics.counter('standup_bot_chat_api_errors_total', "Failed Chat API calls.", ['method', 'reason'])
+
+# The chat services are cached per thread, because the underlying HTTP client is not thread-safe.
+_local = threading.local()
+
+
+def _reset_after_fork():
+    global _local
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def credentials_path() -> Path:
+    return Path('/root/credentials') / os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON', '')
+
 
 def get_chat_service():
-    # Initialize the chat service.
-    credentials_dir = Path('/root/credentials')
-    credentials = service_account.Credentials.from_service_account_file(
-        credentials_dir / os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON', ''),
-        scopes=['https://www.googleapis.com/auth/chat.bot'])
-    return build('chat', 'v1', credentials=credentials)
+    service = getattr(_local, 'service', None)
+    if service is None:
+        # The Google API client is imported on first use, it is slow to import and most events do not need it.
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build
+        from google.oauth2 import service_account
+
+        # Initialize the chat service.
+        _local.http = httplib2.Http(timeout=CHAT_TIMEOUT)
+        if CHAT_API_ROOT:
+            root = CHAT_API_ROOT.rstrip('/')
+            service = build('chat', 'v1', http=_local.http, cache_discovery=False,
+                            discoveryServiceUrl=f"{root}/$discovery/rest?version={{apiVersion}}")
+        else:
+            credentials = service_account.Credentials.from_service_account_file(
+                credentials_path(),
+                scopes=['https://www.googleapis.com/auth/chat.bot'])
+            service = build('chat', 'v1', http=AuthorizedHttp(credentials, http=_local.http))
+        _local.service = service
+    return service
+
+
+def _set_timeout(timeout: float):
+    http = getattr(_local, 'http', None)
+    if http is None:
+        return
+    http.timeout = timeout
+    # Open connections are reused, they keep the timeout they were created with.
+    for connection in http.connections.values():
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        connection.timeout = timeout
+
+
+def execute(request):
+    """
+    Execute a request of the chat service, with a timeout which ends no later than the deadline of the current
+    request.
+    E.g. Chat.execute(Chat.get_chat_service().spaces().messages().create(...))
+    :raise Deadline.DeadlineExceeded: If the deadline has already passed.
+    """
+    method = getattr(request, 'methodId', None) or 'unknown'
+    try:
+        _set_timeout(Deadline.timeout(CHAT_TIMEOUT))
+    except Deadline.DeadlineExceeded:
+        CHAT_API_ERRORS.inc(method, 'deadline')
+        raise
+    start = time.perf_counter()
+    try:
+        with Tracing.span(f"chat.{method}"):
+            return request.execute()
+    except Exception as e:
+        # E.g. the HTTP status of an HttpError, or the type of the exception.
+        status = getattr(getattr(e, 'resp', None), 'status', None)
+        CHAT_API_ERRORS.inc(method, str(status) if status else type(e).__name__)
+        raise
+    finally:
+        CHAT_API_DURATION.observe(time.perf_counter() - start, method)
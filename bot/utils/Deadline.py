@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# The absolute deadline (time.monotonic()) of the current request, None if there is no deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Set the deadline of the code in the context, e.g. of a webhook request. A nested deadline can only shorten
+    the current deadline. Threads started in the context do not inherit the deadline.
+    :param seconds: The time budget from now on.
+    """
+    value = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        value = min(value, current)
+    token = _deadline.set(value)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Get the remaining time budget in seconds, None if there is no deadline.
+    """
+    value = _deadline.get()
+    if value is None:
+        return None
+    return value - time.monotonic()
+
+
+def has_budget(seconds: float) -> bool:
+    """
+    Whether at least the given time is left before the deadline.
+    """
+    budget = remaining()
+    return budget is None or budget >= seconds
+
+
+def timeout(default: float) -> float:
+    """
+    Get the timeout for a blocking call, which is the default timeout limited by the deadline.
+    :raise DeadlineExceeded: If the deadline has already passed.
+    """
+    budget = remaining()
+    if budget is None:
+        return default
+    if budget <= 0:
+        raise DeadlineExceeded()
+    return min(default, budget)
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Mapping, Tuple
+
+import bot.utils.Chat as Chat
+import bot.utils.Deadline as Deadline
+import bot.utils.storage.DatabaseSchema as DatabaseSchema
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import logger
+
+# The time budget of the database check in seconds.
+DB_CHECK_TIMEOUT = float(os.environ.get('READY_DB_TIMEOUT', 1))
+# The scheduler touches this file after every run.
+SCHEDULER_HEARTBEAT = os.environ.get('SCHEDULER_HEARTBEAT',
+                                     str(Path(os.environ.get('LOGS_DIR', '.')) / 'scheduler.heartbeat'))
+# The maximum age of the heartbeat in seconds, 0 disables the check.
+SCHEDULER_MAX_AGE = float(os.environ.get('SCHEDULER_MAX_AGE', 1800))
+
+_started = time.time()
+
+
+def write_heartbeat():
+    try:
+        Path(SCHEDULER_HEARTBEAT).touch()
+    except OSError as e:
+        logger.warning("Could not write the scheduler heartbeat %s: %s", SCHEDULER_HEARTBEAT, e)
+
+
+def check_database() -> Tuple[bool, str]:
+    """
+    Check that the database is reachable within the time budget and that all migrations have been applied.
+    """
+    def get_schema_version():
+        with Deadline.deadline(DB_CHECK_TIMEOUT):
+            result.append(Storage.get_schema_version())
+
+    # The query is limited by the deadline, but opening a new connection is not. Wait only until the deadline.
+    result = []
+    thread = threading.Thread(target=get_schema_version, name='readiness', daemon=True)
+    thread.start()
+    thread.join(DB_CHECK_TIMEOUT)
+    if not result:
+        return False, f"The database did not answer within {DB_CHECK_TIMEOUT:g} seconds."
+    version = result[0]
+    if version is None:
+        return False, "The database is not reachable."
+    expected = len(DatabaseSchema.migrations)
+    if version != expected:
+        return False, f"The schema version is {version}, expected {expected}."
+    return True, f"Schema version {version}."
+
+
+def check_chat() -> Tuple[bool, str]:
+    """
+    Check that the credentials of the Chat API are readable, without loading the API client.
+    """
+    if Chat.CHAT_API_ROOT:
+        return True, f"The Chat API at {Chat.CHAT_API_ROOT} is used without credentials."
+    path = Chat.credentials_path()
+    if not os.access(path, os.R_OK) or not path.is_file():
+        return False, f"The credentials {path.name} are not readable."
+    return True, "The credentials are readable."
+
+
+def check_scheduler() -> Tuple[bool, str]:
+    """
+    Check that the scheduler ran recently. Before the first run, the age is measured from the start of the server.
+    """
+    if SCHEDULER_MAX_AGE <= 0:
+        return True, "The check is disabled."
+    try:
+        last_run = os.stat(SCHEDULER_HEARTBEAT).st_mtime
+    except OSError:
+        last_run = _started
+    age = time.time() - last_run
+    if age > SCHEDULER_MAX_AGE:
+        return False, f"The scheduler did not run for {age:.0f} seconds."
+    return True, f"The scheduler ran {age:.0f} seconds ago."
+
+
+CHECKS = {
+    'database': check_database,
+    'chat': check_chat,
+    'scheduler': check_scheduler
+}
+
+
+def readiness() -> Tuple[bool, Mapping[str, Mapping[str, object]]]:
+    """
+    Run all readiness checks.
+    :return: Whether all checks passed, and the result per check.
+    """
+    results = {}
+    for name, check in CHECKS.items():
+        start = time.perf_counter()
+        try:
+            ok, message = check()
+        except Exception as e:
+            ok, message = False, f"{type(e).__name__}: {e}"
+        results[name] = {'ok': ok, 'message': message, 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
+    return all(result['ok'] for result in results.values()), results
+
+
+def uptime() -> float:
+    return time.time() - _started
@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Mapping, Optional, Tuple
+
+import bot.utils.storage.Storage as Storage
+from bot.utils.Logger import logger
+
+DEFAULT_MAX_SIZE = 4096
+# How long a retried event waits for the response of the same event, which is still processed by another thread.
+IN_FLIGHT_WAIT = 10
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of the responses to processed events, backed by the processed_events table. The table covers
+    retries which reach another worker process or arrive after a restart.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, persist: bool = True):
+        self.max_size = max_size
+        self.persist = persist
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _get_cached(self, key: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put_cached(self, key: str, entry: Tuple[int, bytes]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def begin(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Start processing an event.
+        :param key: The idempotency key of the event.
+        :return: The status and body of the previous response, if the event was already processed. Otherwise None,
+                 and the caller must call finish() with the same key.
+        """
+        entry = self._get_cached(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                self._in_flight[key] = threading.Event()
+        if in_flight is not None:
+            # The same event is processed by another thread, e.g. a retry after a slow response.
+            in_flight.wait(IN_FLIGHT_WAIT)
+            entry = self._get_cached(key)
+            if entry is not None:
+                return entry
+            with self._lock:
+                self._in_flight.setdefault(key, threading.Event())
+
+        if self.persist:
+            try:
+                entry = Storage.get_processed_event(key)
+            except Exception as e:
+                logger.warning("Could not read the processed event %s: %s", key, e)
+                entry = None
+            if entry is not None:
+                self._put_cached(key, entry)
+                self._done(key)
+                return entry
+        return None
+
+    def finish(self, key: str, status: Optional[int] = None, response: Optional[bytes] = None):
+        """
+        Finish processing an event.
+        :param key: The idempotency key of the event.
+        :param status: The status of the response, no response is stored if None (e.g. the processing failed).
+        :param response: The body of the response.
+        """
+        try:
+            if status is not None:
+                entry = (status, response)
+                self._put_cached(key, entry)
+                if self.persist:
+                    try:
+                        Storage.add_processed_event(key, status, response)
+                    except Exception as e:
+                        logger.warning("Could not store the processed event %s: %s", key, e)
+        finally:
+            self._done(key)
+
+    def _done(self, key: str):
+        with self._lock:
+            in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None:
+            in_flight.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Mapping[str, int]:
+        with self._lock:
+            return {'size': len(self._entries), 'in_flight': len(self._in_flight)}
+
+
+def get_key(event) -> Optional[str]:
+    """
+    Get the idempotency key of an event, which is the same for all deliveries of the event.
+    :return: The key, or None if the event cannot be identified (e.g. an event without message).
+    """
+    message_name = (event.get('message') or {}).get('name')
+    event_time = event.get('eventTime')
+    if not message_name or not event_time:
+        return None
+    return f"{event['type']}:{message_name}:{event_time}"
@@ -0,0 +1,34 @@
+import json
+from flask import Response
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MIMETYPE = 'application/json'
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Serialize the data to compact UTF-8 encoded JSON. Uses orjson if it is installed, otherwise the standard library.
+    Non-ASCII characters, e.g. the emojis in the messages, are written as UTF-8 and not escaped.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def response(data: Any, status: int = 200) -> Response:
+    """
+    Create a JSON response, replaces flask.json.jsonify.
+    """
+    return Response(dumps(data), status=status, mimetype=MIMETYPE)
+
+
+def raw_response(data: bytes, status: int = 200) -> Response:
+    """
+    Create a JSON response from already serialized data.
+    """
+    return Response(data, status=status, mimetype=MIMETYPE)
@@ -1,26 +1,193 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Mapping, Optional
 
 logger = logging.getLogger("chatbot")
 
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_sampling_filter: Optional[logging.Filter] = None
+
+
+class Fields:
+    """
+    Structured fields of a log record. Callable values are only evaluated when the record is emitted, so that
+    expensive fields (e.g. the payload of an event) cost nothing if the record is filtered out.
+    """
+    __slots__ = ['values', '_resolved']
+
+    def __init__(self, values: Mapping[str, Any]):
+        self.values = values
+        self._resolved = None
+
+    def resolve(self) -> Mapping[str, Any]:
+        if self._resolved is None:
+            self._resolved = {key: value() if callable(value) else value for key, value in self.values.items()}
+        return self._resolved
+
+    def __str__(self):
+        return ' '.join(f"{key}={value}" for key, value in self.resolve().items())
+
+
+def fields(category: str = None, **kwargs) -> dict:
+    """
+    Create the 'extra' argument of a log call with structured fields.
+    E.g. logger.debug("Slash command.", extra=fields('command', command=lambda: command))
+    :param category: The category of the record, used for the sampling.
+    :param kwargs: The fields, callables are evaluated lazily.
+    """
+    return {'category': category, 'fields': Fields(kwargs)}
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes only a fraction of the records of a category, e.g. to log only every hundredth event payload.
+    Records without category are always passed.
+    """
+
+    def __init__(self, rates: Mapping[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, 'category', None)
+        if category is None or category not in self.rates:
+            return True
+        return random.random() < self.rates[category]
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        record_fields = getattr(record, 'fields', None)
+        if record_fields is not None:
+            message = f"{message}  {record_fields}"
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            message = f"{message}  trace_id={trace_id}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        category = getattr(record, 'category', None)
+        if category:
+            entry['category'] = category
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            entry['trace_id'] = trace_id
+        record_fields = getattr(record, 'fields', None)
+        if record_fields is not None:
+            entry.update(record_fields.resolve())
+        # The queued records carry the formatted traceback, see _QueueHandler.prepare().
+        exception = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exception:
+            entry['exception'] = exception
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the lazy fields before the record is queued, the values may change after the call returns.
+        record_fields = getattr(record, 'fields', None)
+        if record_fields is not None:
+            record_fields.resolve()
+        # Unlike QueueHandler.prepare(), the traceback is not appended to the message, so the formatters keep it apart.
+        # It is formatted now, the traceback does not outlive the call.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def parse_sampling_rates(value: str) -> Mapping[str, float]:
+    """
+    Parse the sampling rates, e.g. 'event=0.01,command=0.5'.
+    """
+    rates = {}
+    for item in value.split(','):
+        if '=' in item:
+            category, rate = item.split('=', 1)
+            rates[category.strip()] = float(rate)
+    return rates
+
+
+def stop_logger():
+    global _listener, _queue_handler
+    if _listener:
+        _listener.stop()
+        _listener = None
+    if _queue_handler:
+        logger.removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def _start_listener(handlers, sampling_filter: logging.Filter):
+    global _listener, _queue_handler, _sampling_filter
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(log_queue)
+    _queue_handler.addFilter(sampling_filter)
+    _sampling_filter = sampling_filter
+    logger.addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not exist in the forked child process.
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    logger.removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+    _start_listener(handlers, _sampling_filter)
+
 
 def setup_logger(debug: bool, log_file: str):
+    """
+    Set up the logger. The records are put into a queue and written by a background thread.
+    The output format and sampling are configured by the environment variables LOG_FORMAT ('text' or 'json')
+    and LOG_SAMPLING (e.g. 'event=0.01').
+    :param debug: Whether to log debug records.
+    :param log_file: Optional file to write the log to, in addition to the console.
+    """
     # Disable the 'file_cache is unavailable when using oauth2client >= 4.0.0' warning.
     # See https://github.com/googleapis/google-api-python-client/issues/299
     logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
 
-    logger.setLevel(logging.DEBUG)
-
-    # logFormatter = logging.Formatter("%(asctime)s [%(name)s][%(levelname)-5.5s]  %(message)s")
-    # fileHandler = logging.FileHandler(log_file, mode='w')
-    # fileHandler.setLevel(logging.DEBUG)
-    # fileHandler.setFormatter(logFormatter)
-    # logger.addHandler(fileHandler)
+    stop_logger()
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
 
-    log_formatter = logging.Formatter("%(asctime)s [%(name)s][%(levelname)-5.5s]  %(message)s")
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(log_formatter)
-    if debug:
-        console_handler.setLevel(logging.DEBUG)
+    if os.environ.get('LOG_FORMAT', 'text').lower() == 'json':
+        log_formatter = JsonFormatter()
     else:
-        console_handler.setLevel(logging.INFO)
-    logger.addHandler(console_handler)
+        log_formatter = TextFormatter("%(asctime)s [%(name)s][%(levelname)-5.5s]  %(message)s")
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(log_formatter)
+
+    _start_listener(handlers, SamplingFilter(parse_sampling_rates(os.environ.get('LOG_SAMPLING', ''))))
+
+
+atexit.register(stop_logger)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,338 @@
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from bot.utils.Logger import logger
+
+# The default latency buckets in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+# With multiple worker processes, every process writes a snapshot of its metrics to this directory, and /metrics
+# merges the snapshots of all processes. The scheduler, which runs in its own process, writes its snapshot there too.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', 15))
+# The snapshot with the counters and histograms of the exited worker processes.
+DEAD_SNAPSHOT = 'dead'
+
+_metrics: Dict[str, 'Metric'] = {}
+_writer: Optional[threading.Timer] = None
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Mapping[Tuple[str, ...], object]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    """
+    A gauge, which is either set explicitly or read from a callback when the metrics are collected.
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 callback: Callable[[], Mapping[Tuple[str, ...], float]] = None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def samples(self) -> Mapping[Tuple[str, ...], object]:
+        if self.callback is not None:
+            try:
+                return dict(self.callback())
+            except Exception as e:
+                logger.warning("Could not collect the metric %s: %s", self.name, e)
+                return {}
+        return super().samples()
+
+
+class Histogram(Metric):
+    """
+    A histogram, the samples per label values are [bucket counts, sum, count]. The bucket counts are not
+    cumulative, they are summed up when the metrics are rendered.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(labels)
+            if sample is None:
+                sample = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self) -> Mapping[Tuple[str, ...], object]:
+        with self._lock:
+            return {labels: [list(buckets), total, count] for labels, (buckets, total, count) in self._values.items()}
+
+
+def _register(metric: Metric) -> Metric:
+    if metric.name in _metrics:
+        raise ValueError(f"The metric '{metric.name}' is already registered.")
+    _metrics[metric.name] = metric
+    return metric
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: Sequence[str] = (),
+          callback: Callable[[], Mapping[Tuple[str, ...], float]] = None) -> Gauge:
+    return _register(Gauge(name, documentation, labels, callback))
+
+
+def histogram(name: str, documentation: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = BUCKETS) -> Histogram:
+    return _register(Histogram(name, documentation, labels, buckets))
+
+
+def snapshot() -> dict:
+    """
+    Get the current values of all metrics of this process, as JSON-serializable data.
+    """
+    return {name: [[list(labels), value] for labels, value in metric.samples().items()]
+            for name, metric in _metrics.items()}
+
+
+def _merge(total: dict, other: dict, include_gauges: bool):
+    for name, samples in other.items():
+        metric = _metrics.get(name)
+        if metric is None or (metric.type == 'gauge' and not include_gauges):
+            continue
+        values = total.setdefault(name, {})
+        for labels, value in samples:
+            labels = tuple(labels)
+            current = values.get(labels)
+            if current is None:
+                values[labels] = value
+            elif metric.type == 'histogram':
+                values[labels] = [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1],
+                                  current[2] + value[2]]
+            else:
+                values[labels] = current + value
+
+
+def _snapshot_path(process: str = None) -> Path:
+    return Path(METRICS_DIR) / f"{process or os.getpid()}.json"
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_snapshot(process: str = None):
+    """
+    Write the snapshot of this process to the metrics directory.
+    :param process: The name of the snapshot, defaults to the process id.
+    """
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(process)
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(snapshot()))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write the metrics to %s: %s", path, e)
+
+
+def restore_snapshot(process: str):
+    """
+    Load the counters and histograms of a previous run of a short-lived process, e.g. the scheduler, so that they
+    keep increasing across runs.
+    """
+    if not METRICS_DIR:
+        return
+    path = _snapshot_path(process)
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return
+    merged = {}
+    _merge(merged, data, include_gauges=False)
+    for name, values in merged.items():
+        metric = _metrics[name]
+        with metric._lock:
+            metric._values.update(values)
+
+
+def _fold_dead_snapshot(path: Path):
+    """
+    Add the counters and histograms of the snapshot of an exited process to the snapshot DEAD_SNAPSHOT and remove it,
+    so that the metrics directory does not grow with every restarted worker. Called with the lock of the directory.
+    """
+    dead_path = _snapshot_path(DEAD_SNAPSHOT)
+    try:
+        total = {}
+        if dead_path.exists():
+            _merge(total, json.loads(dead_path.read_text()), include_gauges=False)
+        _merge(total, json.loads(path.read_text()), include_gauges=False)
+        tmp_path = dead_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({name: [[list(labels), value] for labels, value in values.items()]
+                                        for name, values in total.items()}))
+        os.replace(tmp_path, dead_path)
+        path.unlink()
+    except (OSError, ValueError) as e:
+        logger.warning("Could not fold the metrics of %s: %s", path, e)
+
+
+def collect() -> Mapping[str, Mapping[Tuple[str, ...], object]]:
+    """
+    Collect the metrics of this process, merged with the snapshots of the other processes. The counters and
+    histograms of exited processes are kept in the snapshot DEAD_SNAPSHOT, so that they never decrease, but their
+    gauges are dropped.
+    """
+    total = {}
+    _merge(total, snapshot(), include_gauges=True)
+    if not METRICS_DIR:
+        return total
+    directory = Path(METRICS_DIR)
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        lock = open(directory / f"{DEAD_SNAPSHOT}.lock", 'w')
+    except OSError as e:
+        logger.warning("Could not read the metrics of the other processes: %s", e)
+        return total
+    with lock:
+        # The processes collect one at a time, so that a snapshot is neither folded twice nor read twice.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for path in directory.glob('*.json'):
+            name = path.stem
+            if name.isdigit() and name != str(os.getpid()) and not _is_alive(int(name)):
+                _fold_dead_snapshot(path)
+        for path in directory.glob('*.json'):
+            if path.stem == str(os.getpid()):
+                continue
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            _merge(total, data, include_gauges=True)
+    return total
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render() -> str:
+    """
+    Render all metrics in the Prometheus text format.
+    """
+    values = collect()
+    lines: List[str] = []
+    for name, metric in _metrics.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        for labels, value in sorted(values.get(name, {}).items()):
+            if metric.type == 'histogram':
+                buckets, total, count = value
+                cumulative = 0
+                for bound, bucket in zip(metric.buckets + (float('inf'),), buckets):
+                    cumulative += bucket
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(metric.labels, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(metric.labels, labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(metric.labels, labels)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(metric.labels, labels)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _write_periodically():
+    global _writer
+    write_snapshot()
+    _writer = threading.Timer(WRITE_INTERVAL, _write_periodically)
+    _writer.daemon = True
+    _writer.start()
+
+
+def start_writer():
+    """
+    Write the snapshot of this process periodically, if a metrics directory is configured.
+    """
+    if METRICS_DIR and _writer is None:
+        _write_periodically()
+
+
+def _reset_after_fork():
+    global _writer
+    for metric in _metrics.values():
+        metric._reset_after_fork()
+        # The metrics of the parent process are reported by the parent.
+        metric.clear()
+    if _writer is not None:
+        # The timer thread does not exist in the forked child process.
+        _writer = None
+        start_writer()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,132 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import ContextManager, Mapping
+
+import bot.utils.Tracing as Tracing
+from bot.utils.Logger import fields, logger
+
+# The fraction of the events, which are profiled.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# Events with the header 'X-Profile-Token: <token>' are profiled, if set.
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# The events of these users (comma separated Google ids, e.g. users/123) are profiled.
+PROFILE_USERS = frozenset(filter(None, os.environ.get('PROFILE_USERS', '').split(',')))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(Path(os.environ.get('LOGS_DIR', '.')) / 'profiles'))
+# The number of profiles to keep, the oldest are removed.
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 100))
+# The number of functions in the summary of a profile.
+SUMMARY_LINES = 40
+
+# Only one request is profiled at a time, the profilers of concurrent threads would interfere.
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def event_label(event) -> str:
+    """
+    The name of an event in the profiles, e.g. 'command:get_teams', 'action:send_answers' or 'answer'.
+    """
+    import bot.events.CardClicked as CardClicked
+    import bot.events.Message as Message
+
+    if event.get('type') == 'MESSAGE':
+        slash_command = (event.get('message') or {}).get('slashCommand')
+        if not slash_command:
+            return 'answer'
+        command_id = slash_command.get('commandId')
+        handler = Message.commands.get(command_id)
+        return f"command:{handler.name if handler else command_id}"
+    if event.get('type') == 'CARD_CLICKED':
+        action = (event.get('action') or {}).get('actionMethodName')
+        handler = CardClicked.actions.get(action)
+        return f"action:{handler.name if handler else action}"
+    return str(event.get('type'))
+
+
+def is_requested(event, headers: Mapping[str, str]) -> bool:
+    if PROFILE_SAMPLE_RATE <= 0 and not PROFILE_TOKEN and not PROFILE_USERS:
+        return False
+    if PROFILE_TOKEN and headers.get('X-Profile-Token') == PROFILE_TOKEN:
+        return True
+    if PROFILE_USERS and (event.get('user') or {}).get('name') in PROFILE_USERS:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile(event, headers: Mapping[str, str]) -> ContextManager:
+    """
+    Profile the handling of an event, if it is requested by the sampling rate, the profile token header or the user.
+    The profile is written to PROFILE_DIR. Without profiling, the context manager does nothing.
+    """
+    if not is_requested(event, headers):
+        return nullcontext()
+    return _profile(event_label(event))
+
+
+@contextmanager
+def _profile(label: str):
+    # The lock is taken on entering the context, so it is always released by it.
+    if not _lock.acquire(blocking=False):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+    finally:
+        _lock.release()
+        duration, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+        try:
+            path = write_profile(profiler, label, duration, cpu)
+        except Exception as e:
+            logger.warning("Could not write the profile of %s: %s", label, e)
+        else:
+            logger.info("Profiled %s: %.1f ms, written to %s.", label, duration * 1000, path,
+                        extra=fields('profile', label=label, duration_ms=round(duration * 1000, 1), path=str(path)))
+
+
+def write_profile(profiler: cProfile.Profile, label: str, duration: float, cpu: float) -> Path:
+    """
+    Write the profile (for pstats or snakeviz) and a text summary sorted by cumulative time.
+    :return: The path of the profile.
+    """
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{re.sub(r'[^A-Za-z0-9_-]', '_', label)}-{os.getpid()}"
+    path = directory / f"{name}.prof"
+    profiler.dump_stats(str(path))
+
+    summary = io.StringIO()
+    summary.write(f"Event: {label}\nWall time: {duration * 1000:.1f} ms\nCPU time (process): {cpu * 1000:.1f} ms\n"
+                  f"Trace id: {Tracing.trace_id() or '-'}\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    (directory / f"{name}.txt").write_text(summary.getvalue(), encoding='utf-8')
+    _remove_old_profiles(directory)
+    return path
+
+
+def _remove_old_profiles(directory: Path):
+    profiles = sorted(directory.glob('*.prof'))
+    for old in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.txt').unlink(missing_ok=True)
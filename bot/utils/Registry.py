@@ -0,0 +1,123 @@
+import threading
+import time
+from typing import Any, Callable, Mapping, Optional
+
+import bot.utils.Json as Json
+import bot.utils.Metrics as Metrics
+import bot.utils.Tracing as Tracing
+from bot.utils.User import User
+
+# Requirements of a handler.
+DM_ONLY = 'dm_only'
+ROOM_ONLY = 'room_only'
+
+HANDLER_DURATION = Metrics.histogram('standup_bot_handler_duration_seconds',
+                                     "Duration of the slash command and card action handlers.", ['registry', 'handler'])
+HANDLER_ERRORS = Metrics.counter('standup_bot_handler_errors_total',
+                                 "Handlers which raised an exception.", ['registry', 'handler'])
+HANDLER_REJECTED = Metrics.counter('standup_bot_handler_rejected_total',
+                                   "Calls rejected because of the requirements of the handler.",
+                                   ['registry', 'handler'])
+
+
+class Handler:
+    __slots__ = ['name', 'func', 'requires']
+
+    def __init__(self, name: str, func: Callable, requires: Optional[str]):
+        self.name = name
+        self.func = func
+        self.requires = requires
+
+
+class HandlerMetrics:
+    __slots__ = ['calls', 'errors', 'rejected', 'total_time', 'max_time']
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+
+class Registry:
+    """
+    Maps keys, e.g. the slash command ids or the card action names, to handlers with the signature
+    handler(event, user, space, is_room). The dispatch checks the declared requirements of the handler and
+    records the number of calls, errors, rejections and the timing per handler.
+    """
+
+    def __init__(self, name: str, rejection_texts: Mapping[str, str]):
+        self.name = name
+        self.rejection_texts = rejection_texts
+        self._handlers = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, *keys: str, name: str = None, requires: str = None) -> Callable:
+        """
+        Decorator to register a handler for one or multiple keys.
+        :param keys: The keys of the handler.
+        :param name: The name of the handler in the metrics, defaults to the function name.
+        :param requires: Either DM_ONLY or ROOM_ONLY, if the handler is only allowed in a direct message or a room.
+        """
+        def decorator(func):
+            handler = Handler(name or func.__name__, func, requires)
+            for key in keys:
+                if key in self._handlers:
+                    raise ValueError(f"{self.name}: '{key}' is already registered.")
+                self._handlers[key] = handler
+            self._metrics.setdefault(handler.name, HandlerMetrics())
+            return func
+        return decorator
+
+    def get(self, key: str) -> Optional[Handler]:
+        return self._handlers.get(key)
+
+    def dispatch(self, key: str, event, user: User, space: str, is_room: bool) -> Optional[Any]:
+        """
+        Call the handler of the key.
+        :return: The response of the handler, or None if there is no handler for the key.
+        """
+        handler = self._handlers.get(key)
+        if handler is None:
+            return None
+        metrics = self._metrics[handler.name]
+
+        if (handler.requires == DM_ONLY and is_room) or (handler.requires == ROOM_ONLY and not is_room):
+            with self._lock:
+                metrics.rejected += 1
+            HANDLER_REJECTED.inc(self.name, handler.name)
+            return Json.response({'text': self.rejection_texts[handler.requires]})
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            with Tracing.span(f"{self.name}.{handler.name}"):
+                response = handler.func(event, user, space, is_room)
+            failed = False
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                metrics.calls += 1
+                metrics.total_time += elapsed
+                metrics.max_time = max(metrics.max_time, elapsed)
+                if failed:
+                    metrics.errors += 1
+            HANDLER_DURATION.observe(elapsed, self.name, handler.name)
+            if failed:
+                HANDLER_ERRORS.inc(self.name, handler.name)
+
+    def metrics(self) -> Mapping[str, Mapping[str, float]]:
+        """
+        Get a snapshot of the metrics per handler name.
+        """
+        with self._lock:
+            return {name: {'calls': m.calls,
+                           'errors': m.errors,
+                           'rejected': m.rejected,
+                           'total_time': m.total_time,
+                           'max_time': m.max_time,
+                           'mean_time': m.total_time / m.calls if m.calls else 0.0}
+                    for name, m in self._metrics.items()}
@@ -0,0 +1,92 @@
+import re
+import shlex
+from datetime import date, datetime
+from typing import Optional
+
+# The number of results per page of the search card.
+PAGE_SIZE = 5
+
+_WORD = re.compile(r'\w+')
+_FILTERS = ('team', 'since', 'until', 'page')
+
+
+class SearchQuery:
+    """
+    A search over the standup answers, e.g. parsed from '/search payment outage team:Backend since:2023-01-01'.
+    The dates are inclusive, the pages start at 1.
+    """
+    __slots__ = ['text', 'team', 'since', 'until', 'page']
+
+    def __init__(self, text: str, team: str = '', since: Optional[date] = None, until: Optional[date] = None,
+                 page: int = 1):
+        self.text = text
+        self.team = team
+        self.since = since
+        self.until = until
+        self.page = page
+
+    def to_tsquery(self) -> str:
+        """
+        All words must match, a word also matches as prefix (e.g. 'pay' matches 'payment').
+        """
+        return ' & '.join(f"{word}:*" for word in _WORD.findall(self.text.lower()))
+
+    def to_parameters(self, page: int):
+        return [{"key": "text", "value": self.text},
+                {"key": "team", "value": self.team},
+                {"key": "since", "value": self.since.isoformat() if self.since else ''},
+                {"key": "until", "value": self.until.isoformat() if self.until else ''},
+                {"key": "page", "value": page}]
+
+    @staticmethod
+    def from_parameters(parameters) -> 'SearchQuery':
+        """
+        Read the query from the parameters of a card action, see to_parameters().
+        :raise ValueError: If the parameters are invalid, e.g. changed by the client.
+        """
+        try:
+            values = {parameter['key']: parameter['value'] for parameter in parameters}
+            return SearchQuery(str(values.get('text', '')), str(values.get('team', '')),
+                               _parse_date(values.get('since')), _parse_date(values.get('until')),
+                               max(1, int(values.get('page') or 1)))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid search parameters: {e!r}") from e
+
+
+class SearchResult:
+    __slots__ = ['added', 'user_name', 'team_name', 'question', 'excerpt']
+
+    def __init__(self, added: datetime, user_name: str, team_name: str, question: str, excerpt: str):
+        self.added = added
+        self.user_name = user_name
+        self.team_name = team_name
+        self.question = question
+        self.excerpt = excerpt
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+def parse(argument: str) -> SearchQuery:
+    """
+    Parse the argument of the search command, the words and the filters team:NAME, since:YYYY-MM-DD,
+    until:YYYY-MM-DD and page:N. Names with spaces are quoted, e.g. team:"Team A".
+    :raise ValueError: If a filter is invalid.
+    """
+    try:
+        tokens = shlex.split(argument)
+    except ValueError:
+        tokens = argument.split()
+    words, filters = [], {}
+    for token in tokens:
+        key, separator, value = token.partition(':')
+        if separator and key.lower() in _FILTERS:
+            filters[key.lower()] = value
+        else:
+            words.append(token)
+    page = int(filters.get('page') or 1)
+    if page < 1:
+        raise ValueError(f"Invalid page {page}.")
+    return SearchQuery(' '.join(words), filters.get('team', ''), _parse_date(filters.get('since')),
+                       _parse_date(filters.get('until')), page)
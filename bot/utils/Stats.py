@@ -0,0 +1,49 @@
+from typing import Optional, Sequence, Tuple
+
+
+def _rate(completed: int, prompted: int) -> Optional[float]:
+    return completed / prompted if prompted else None
+
+
+class UserStats:
+    __slots__ = ['prompted', 'completed', 'current_streak', 'longest_streak', 'completion_seconds']
+
+    def __init__(self, prompted: int, completed: int, current_streak: int, longest_streak: int,
+                 completion_seconds: float):
+        self.prompted = prompted
+        self.completed = completed
+        self.current_streak = current_streak
+        self.longest_streak = longest_streak
+        self.completion_seconds = completion_seconds
+
+    @property
+    def participation(self) -> Optional[float]:
+        return _rate(self.completed, self.prompted)
+
+    @property
+    def average_completion_seconds(self) -> Optional[float]:
+        return self.completion_seconds / self.completed if self.completed else None
+
+
+class TeamStats:
+    """
+    The statistics of a team over the last days, and the current streaks of its members (name, streak).
+    """
+    __slots__ = ['name', 'days', 'prompted', 'completed', 'completion_seconds', 'streaks']
+
+    def __init__(self, name: str, days: int, prompted: int, completed: int, completion_seconds: float,
+                 streaks: Sequence[Tuple[str, int]]):
+        self.name = name
+        self.days = days
+        self.prompted = prompted
+        self.completed = completed
+        self.completion_seconds = completion_seconds
+        self.streaks = streaks
+
+    @property
+    def participation(self) -> Optional[float]:
+        return _rate(self.completed, self.prompted)
+
+    @property
+    def average_completion_seconds(self) -> Optional[float]:
+        return self.completion_seconds / self.completed if self.completed else None
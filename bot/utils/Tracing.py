@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+from bot.utils.Logger import logger
+
+# The exporter ('memory' or 'file'), tracing is disabled if empty.
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', '')
+TRACE_FILE = os.environ.get('TRACE_FILE', str(Path(os.environ.get('LOGS_DIR', '.')) / 'traces.jsonl'))
+# The fraction of the requests, which are traced.
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+
+
+class Span:
+    __slots__ = ['trace_id', 'span_id', 'parent_id', 'name', 'start', 'duration', 'attributes', 'error', '_spans']
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.error = None
+        # The finished spans of the trace.
+        self._spans = []
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration * 1000,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class Exporter:
+    """
+    Receives the spans of each finished trace, the root span last.
+    """
+
+    def export(self, spans: Sequence[Span]):
+        raise NotImplementedError()
+
+
+class InMemoryExporter(Exporter):
+    """
+    Keeps the last traces in memory, e.g. for tests and benchmarks.
+    """
+
+    def __init__(self, max_traces: int = 1000):
+        self.traces = deque(maxlen=max_traces)
+
+    def export(self, spans: Sequence[Span]):
+        self.traces.append([span.to_dict() for span in spans])
+
+
+class FileExporter(Exporter):
+    """
+    Appends every trace as one JSON line to a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]):
+        line = json.dumps([span.to_dict() for span in spans], default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line)
+
+
+_exporter: Optional[Exporter] = None
+_current: ContextVar[Optional[Span]] = ContextVar('span', default=None)
+
+
+def set_exporter(exporter: Optional[Exporter]):
+    """
+    Set the exporter of the traces, None disables the tracing.
+    """
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def trace_id() -> Optional[str]:
+    span_ = _current.get()
+    return span_.trace_id if span_ is not None else None
+
+
+@contextmanager
+def span(name: str, root: bool = False, **attributes):
+    """
+    Record a span. A root span starts a new trace, e.g. per request, all other spans are only recorded within a
+    trace. Without exporter, or if the trace is not sampled, nothing is recorded.
+    :param name: The name of the span.
+    :param root: Whether to start a new trace, if there is no current span.
+    :param attributes: The attributes of the span.
+    """
+    parent = _current.get()
+    if parent is None and (not root or _exporter is None or random.random() >= TRACE_SAMPLE_RATE):
+        yield None
+        return
+
+    if parent is None:
+        new_span = Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    else:
+        new_span = Span(name, parent.trace_id, parent.span_id, attributes)
+        # All spans of a trace share the list of finished spans of the root span.
+        new_span._spans = parent._spans
+    token = _current.set(new_span)
+    start = time.perf_counter()
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = type(e).__name__
+        raise
+    finally:
+        new_span.duration = time.perf_counter() - start
+        _current.reset(token)
+        new_span._spans.append(new_span)
+        if parent is None:
+            _export(new_span._spans)
+
+
+def _export(spans: List[Span]):
+    exporter = _exporter
+    if exporter is None:
+        return
+    try:
+        exporter.export(spans)
+    except Exception as e:
+        logger.warning("Could not export the trace: %s", e)
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Adds the id of the current trace to the log records.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span_ = _current.get()
+        if span_ is not None:
+            record.trace_id = span_.trace_id
+        return True
+
+
+def setup_tracing():
+    """
+    Set the exporter configured by the environment variable TRACE_EXPORTER.
+    """
+    if TRACE_EXPORTER == 'memory':
+        set_exporter(InMemoryExporter())
+    elif TRACE_EXPORTER == 'file':
+        set_exporter(FileExporter(TRACE_FILE))
+    elif TRACE_EXPORTER:
+        logger.warning("Unknown trace exporter '%s'.", TRACE_EXPORTER)
+
+
+logger.addFilter(TraceIdFilter())
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Mapping, Optional
+
+from google.auth import exceptions
+
+from bot.utils.Logger import logger
+
+# Lifetime used if the response does not carry any cache headers.
+DEFAULT_MAX_AGE = 300
+# Refresh the certificates this many seconds before they expire.
+REFRESH_MARGIN = 60
+# Wait time before retrying after a failed fetch.
+RETRY_INTERVAL = 30
+# Minimum time between two forced refreshes caused by an unknown key id.
+MIN_FORCED_REFRESH_INTERVAL = 30
+
+_MAX_AGE_PATTERN = re.compile(r'max-age\s*=\s*(\d+)')
+
+
+def get_max_age(headers: Mapping[str, str], now: Optional[float] = None) -> int:
+    """
+    Get the lifetime in seconds of a HTTP response from its cache headers.
+    :param headers: The response headers.
+    :param now: The current unix time, used to evaluate the 'Expires' header.
+    :return: The number of seconds the response may be cached.
+    """
+    headers = {key.lower(): value for key, value in headers.items()}
+    cache_control = headers.get('cache-control', '')
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    match = _MAX_AGE_PATTERN.search(cache_control)
+    if match:
+        max_age = int(match.group(1))
+        try:
+            max_age -= int(headers.get('age', 0))
+        except ValueError:
+            pass
+        return max(max_age, 0)
+    if 'expires' in headers:
+        try:
+            expires = parsedate_to_datetime(headers['expires']).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(int(expires - (time.time() if now is None else now)), 0)
+    return DEFAULT_MAX_AGE
+
+
+class CertificateCache:
+    """
+    Caches the public certificates of a token issuer for the lifetime announced by its HTTP cache headers.
+    The certificates are refreshed in a background thread before they expire, so that the token verification
+    does not need to wait for the network. An unknown key id triggers an immediate (rate limited) refresh,
+    which handles the rotation of the issuer keys.
+    """
+
+    def __init__(self, certs_url: str, request: Callable = None):
+        self.certs_url = certs_url
+        self._request = request
+        self._lock = threading.Lock()
+        self._certs = {}
+        self._expires = 0.0
+        self._last_fetch = 0.0
+        self._timer = None
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # The refresh timer does not exist in the forked child process, and the HTTP session must not be shared.
+        self._lock = threading.Lock()
+        self._request = None
+        self._timer = None
+        if self._certs:
+            self._schedule(max(self._expires - time.time() - REFRESH_MARGIN, RETRY_INTERVAL))
+
+    def get(self, key_id: str = None) -> Mapping[str, str]:
+        """
+        Get the certificates. Only fetches them in the calling thread if there are none yet, if they have expired,
+        or if the requested key id is unknown.
+        :param key_id: The key id of the token to verify.
+        :return: The mapping of the key ids to the x509 certificates.
+        """
+        certs = self._certs
+        if certs and time.time() < self._expires and (key_id is None or key_id in certs):
+            return certs
+
+        with self._lock:
+            certs = self._certs
+            now = time.time()
+            if not certs or now >= self._expires:
+                self._refresh()
+            elif key_id is not None and key_id not in certs \
+                    and now - self._last_fetch >= MIN_FORCED_REFRESH_INTERVAL:
+                logger.info("Unknown key id %s, refresh the certificates.", key_id)
+                self._refresh()
+            return self._certs
+
+    def refresh(self):
+        """
+        Fetch the certificates now, independent of their expiry time.
+        """
+        with self._lock:
+            self._refresh()
+
+    def stop(self):
+        """
+        Stop the background refresh.
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _refresh(self):
+        self._last_fetch = time.time()
+        try:
+            if self._request is None:
+                from google.auth.transport import requests as google_requests
+                self._request = google_requests.Request()
+            response = self._request(self.certs_url, method='GET')
+            if response.status != 200:
+                raise exceptions.TransportError(f"Could not fetch certificates at {self.certs_url}")
+            certs = json.loads(response.data.decode('utf-8'))
+            max_age = get_max_age(response.headers)
+        except (exceptions.GoogleAuthError, ValueError) as e:
+            logger.error(f"Failed to fetch the certificates: {e}")
+            if not self._certs:
+                raise
+            # Keep using the previous certificates until the next attempt succeeds.
+            self._expires = time.time() + RETRY_INTERVAL
+            self._schedule(RETRY_INTERVAL)
+            return
+
+        self._certs = certs
+        self._expires = self._last_fetch + max_age
+        self._schedule(max(max_age - REFRESH_MARGIN, RETRY_INTERVAL))
+
+    def _schedule(self, delay: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Background refresh of the certificates failed: {e}")
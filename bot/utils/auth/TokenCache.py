@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Optional
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_MAX_TTL = 300
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified bearer tokens. The tokens are stored as SHA-256 digests together with their
+    decoded claims, and every entry expires no later than the 'exp' claim of its token.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, max_ttl: float = DEFAULT_MAX_TTL):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[Mapping[str, Any]]:
+        """
+        Get the claims of a previously verified token.
+        :param token: The encoded token.
+        :return: The decoded claims, or None if the token is not cached or has expired.
+        """
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, claims = entry
+                if now < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: Mapping[str, Any]):
+        """
+        Add a verified token to the cache.
+        :param token: The encoded token.
+        :param claims: The decoded claims of the token.
+        """
+        expires = min(float(claims.get('exp', 0)), time.time() + self.max_ttl)
+        if expires <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Mapping[str, float]:
+        """
+        Get the cache metrics.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
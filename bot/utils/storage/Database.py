@@ -1,30 +1,33 @@
 import psycopg2
-from typing import Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from bot.utils.Logger import logger
 from bot.utils.Question import Question
 from bot.utils.Schedule import Schedule
+from bot.utils.Search import SearchQuery, SearchResult
+from bot.utils.Stats import TeamStats, UserStats
 from bot.utils.Team import Team
 from bot.utils.User import User
 
 
 def add_user(connection, user: User) -> bool:
     with connection.cursor() as cursor:
-        logger.debug(f"Add/update user: {user}")
+        logger.debug("Add/update user: %s", user.google_id)
         sql = "SELECT * " \
               "FROM users AS u " \
               "WHERE u.google_id = %s"
         cursor.execute(sql, (user.google_id,))
         ret = cursor.fetchall()
         if ret:
-            logger.debug(f"Update user: {user}")
+            logger.debug("Update user: %s", user.google_id)
             sql = "UPDATE users " \
                   "SET name = %s, email = %s, avatar_url = %s, space = %s, active = %s " \
                   "WHERE google_id = %s " \
                   "RETURNING id"
             cursor.execute(sql, (user.name, user.email, user.avatar_url, user.space, True, user.google_id))
         else:
-            logger.debug(f"Add new user: {user}")
+            logger.debug("Add new user: %s", user.google_id)
             sql = "INSERT INTO users (google_id, name, email, avatar_url, space, active) " \
                   "VALUES (%s, %s, %s, %s, %s, %s) " \
                   "RETURNING id"
@@ -200,10 +203,23 @@ def get_questions(connection, google_id: str) -> Sequence[Question]:
         return [Question(id_, team_id, question, order) for id_, team_id, question, order in ret]
 
 
-def add_question(connection, google_id: str, question: str) -> bool:
-    team = get_team_of_user(connection, google_id=google_id)
-    if not team:
-        return False
+def get_question(connection, question_id: int) -> Optional[Question]:
+    with connection.cursor() as cursor:
+        sql = "SELECT q.id, q.team_id, q.question, q.question_order " \
+              "FROM questions AS q " \
+              "WHERE q.id = %s"
+        cursor.execute(sql, (question_id,))
+        ret = cursor.fetchone()
+        if not ret:
+            return None
+        return Question(ret[0], ret[1], ret[2], ret[3])
+
+
+def add_question(connection, google_id: str, question: str, team: Team = None) -> bool:
+    if team is None:
+        team = get_team_of_user(connection, google_id=google_id)
+        if not team:
+            return False
 
     with connection.cursor() as cursor:
         sql = "INSERT INTO questions (team_id, question, question_order)" \
@@ -211,7 +227,7 @@ def add_question(connection, google_id: str, question: str) -> bool:
               "  FROM questions AS q " \
               "  WHERE q.team_id = %s " \
               "  ORDER BY q.question_order DESC " \
-              "  LIMIT 1" \
+              "  LIMIT 1 " \
               "ON CONFLICT DO NOTHING " \
               "RETURNING id"
         cursor.execute(sql, (question, team.id_))
@@ -221,6 +237,15 @@ def add_question(connection, google_id: str, question: str) -> bool:
 
 def remove_question(connection, question_id: int) -> bool:
     with connection.cursor() as cursor:
+        # The conversations at the removed question continue with the next question.
+        sql = "UPDATE conversation_cursors AS c " \
+              "SET question_id = (SELECT n.id FROM questions AS n " \
+              "                   WHERE n.team_id = q.team_id AND n.question_order > q.question_order " \
+              "                   ORDER BY n.question_order LIMIT 1), " \
+              "    updated = NOW() " \
+              "FROM questions AS q " \
+              "WHERE q.id = %s AND c.question_id = q.id"
+        cursor.execute(sql, (question_id,))
         sql = "DELETE FROM questions " \
               "WHERE id = %s " \
               "RETURNING id"
@@ -254,15 +279,17 @@ def reorder_questions(connection, team_id: int, question_id: int, order_step: in
         return ret is not None
 
 
-def get_previous_question(connection, google_id: str) -> Optional[Question]:
+def get_current_question(connection, google_id: str) -> Optional[Question]:
+    """
+    Get the question of the standup of today, which is answered by the next message of the user.
+    """
     with connection.cursor() as cursor:
         sql = "SELECT q.id, q.team_id, q.question, q.question_order " \
-              "FROM standups AS s " \
-              "INNER JOIN questions AS q ON q.id = s.question_id " \
-              "INNER JOIN users AS u ON u.id = s.user_id AND u.google_id = %s " \
-              "WHERE s.added::date = NOW()::date " \
-              "ORDER BY s.added DESC " \
-              "LIMIT 1"
+              "FROM users AS u " \
+              "INNER JOIN conversation_cursors AS c ON c.user_id = u.id " \
+              "INNER JOIN standup_sessions AS ss ON ss.id = c.session_id AND ss.day = NOW()::date " \
+              "INNER JOIN questions AS q ON q.id = c.question_id AND q.team_id = u.team_id " \
+              "WHERE u.google_id = %s"
         cursor.execute(sql, (google_id,))
         ret = cursor.fetchone()
         if not ret:
@@ -270,27 +297,6 @@ def get_previous_question(connection, google_id: str) -> Optional[Question]:
         return Question(ret[0], ret[1], ret[2], ret[3])
 
 
-def get_current_question(connection, google_id: str, previous_question: Question = None) -> Optional[Question]:
-    if previous_question is None:
-        previous_question = get_previous_question(connection, google_id=google_id)
-        if not previous_question:
-            return None
-
-    with connection.cursor() as cursor:
-        sql = "SELECT q.id, q.team_id, q.question, q.question_order " \
-              "FROM questions AS q " \
-              "INNER JOIN teams AS t ON t.id = q.team_id " \
-              "INNER JOIN users AS u ON u.team_id = t.id AND u.google_id = %s " \
-              "WHERE q.question_order > %s " \
-              "ORDER BY q.question_order ASC " \
-              "LIMIT 1"
-        cursor.execute(sql, (google_id, previous_question.order))
-        ret = cursor.fetchone()
-        if not ret:
-            return None
-        return Question(ret[0], ret[1], ret[2], ret[3])
-
-
 def reset_standup(connection, google_id: str) -> bool:
     with connection.cursor() as cursor:
         sql = "INSERT INTO standups (user_id, question_id, added) " \
@@ -299,50 +305,230 @@ def reset_standup(connection, google_id: str) -> bool:
               "INNER JOIN teams AS t ON t.id = u.team_id " \
               "INNER JOIN questions AS q ON q.team_id = t.id AND q.question_order = 0 " \
               "WHERE u.google_id = %s " \
-              "RETURNING id"
+              "RETURNING user_id"
         cursor.execute(sql, (google_id,))
         ret = cursor.fetchone()
-        return ret is not None
+        if ret is None:
+            return False
+        user_id, = ret
+        # A restart on the same day keeps the answers and the card of the session.
+        sql = "INSERT INTO standup_sessions AS ss (user_id, day, started) " \
+              "VALUES (%s, NOW()::date, NOW()) " \
+              "ON CONFLICT (user_id, day) DO UPDATE " \
+              "SET started = NOW() " \
+              "RETURNING ss.id"
+        cursor.execute(sql, (user_id,))
+        session_id, = cursor.fetchone()
+        # The answers are kept in the standups, the sessions of the days before only keep their message id.
+        sql = "DELETE FROM standup_session_answers AS a " \
+              "USING standup_sessions AS ss " \
+              "WHERE ss.user_id = %s AND ss.day < NOW()::date AND a.session_id = ss.id"
+        cursor.execute(sql, (user_id,))
+        # The user changed the team since the last start, the answers and the card belong to the other team.
+        sql = "DELETE FROM standup_session_answers AS a " \
+              "USING questions AS q, users AS u " \
+              "WHERE a.session_id = %s AND q.id = a.question_id AND u.id = %s " \
+              "      AND q.team_id IS DISTINCT FROM u.team_id " \
+              "RETURNING a.session_id"
+        cursor.execute(sql, (session_id, user_id))
+        if cursor.fetchone():
+            cursor.execute("UPDATE standup_sessions SET message_id = NULL WHERE id = %s", (session_id,))
+        # The conversation starts again with the first question.
+        sql = "INSERT INTO conversation_cursors AS c (user_id, session_id, question_id, updated) " \
+              "SELECT u.id, %s, (SELECT q.id FROM questions AS q " \
+              "                  WHERE q.team_id = u.team_id AND q.question_order > 0 " \
+              "                  ORDER BY q.question_order LIMIT 1), NOW() " \
+              "FROM users AS u " \
+              "WHERE u.id = %s " \
+              "ON CONFLICT (user_id) DO UPDATE " \
+              "SET session_id = EXCLUDED.session_id, question_id = EXCLUDED.question_id, updated = EXCLUDED.updated"
+        cursor.execute(sql, (session_id, user_id))
+    _record_prompt(connection, google_id)
+    return True
 
 
 def add_standup_answer(connection, google_id: str, answer: str, current_question: Question = None) -> bool:
+    """
+    Answer the current question, and move the conversation to the next question.
+    :param current_question: The question, which is answered. Defaults to the current question.
+    :return: False if there is no current question, or if the given question is not the current one anymore, e.g.
+             because a concurrent message answered it.
+    """
     if current_question is None:
         current_question = get_current_question(connection, google_id=google_id)
         if not current_question:
             return False
 
     with connection.cursor() as cursor:
+        # Compare and swap, the row lock orders concurrent answers.
+        sql = "UPDATE conversation_cursors AS c " \
+              "SET question_id = (SELECT n.id FROM questions AS n " \
+              "                   WHERE n.team_id = %(team_id)s AND n.question_order > %(order)s " \
+              "                   ORDER BY n.question_order LIMIT 1), " \
+              "    updated = NOW() " \
+              "FROM users AS u, standup_sessions AS ss " \
+              "WHERE c.user_id = u.id AND u.google_id = %(google_id)s AND c.question_id = %(question_id)s " \
+              "      AND ss.id = c.session_id AND ss.day = NOW()::date " \
+              "RETURNING c.user_id, c.session_id"
+        cursor.execute(sql, {'team_id': current_question.team_id, 'order': current_question.order,
+                             'google_id': google_id, 'question_id': current_question.id_})
+        ret = cursor.fetchone()
+        if ret is None:
+            return False
+        user_id, session_id = ret
         sql = "INSERT INTO standups (user_id, question_id, answer, added) " \
-              "SELECT u.id, %s, %s, NOW() " \
+              "VALUES (%s, %s, %s, NOW())"
+        cursor.execute(sql, (user_id, current_question.id_, answer))
+        # Only the latest answer per question is kept in the session.
+        sql = "INSERT INTO standup_session_answers AS a (session_id, question_id, answer, added) " \
+              "VALUES (%s, %s, %s, NOW()) " \
+              "ON CONFLICT (session_id, question_id) DO UPDATE " \
+              "SET answer = EXCLUDED.answer, added = EXCLUDED.added"
+        cursor.execute(sql, (session_id, current_question.id_, answer))
+    _record_answer(connection, google_id, current_question)
+    return True
+
+
+def _record_prompt(connection, google_id: str):
+    """
+    Count the start of a standup in the statistics. A restart on the same day only moves the start time.
+    """
+    with connection.cursor() as cursor:
+        sql = "SELECT u.id, u.team_id, us.last_prompted::date = NOW()::date, " \
+              "       us.last_prompted::date < NOW()::date " \
+              "       AND (us.last_completed IS NULL OR us.last_completed < us.last_prompted::date) " \
               "FROM users AS u " \
+              "LEFT JOIN user_stats AS us ON us.user_id = u.id " \
               "WHERE u.google_id = %s " \
-              "RETURNING standups.id"
-        cursor.execute(sql, (current_question.id_, answer, google_id))
+              "FOR UPDATE OF u"
+        cursor.execute(sql, (google_id,))
+        user_id, team_id, is_restart, is_missed = cursor.fetchone()
+        # The previous standup was not completed, which ends the streak.
+        sql = "INSERT INTO user_stats AS us (user_id, prompted, last_prompted) " \
+              "VALUES (%s, 1, NOW()) " \
+              "ON CONFLICT (user_id) DO UPDATE " \
+              "SET prompted = us.prompted + %s, " \
+              "    current_streak = CASE WHEN %s THEN 0 ELSE us.current_streak END, " \
+              "    last_prompted = NOW()"
+        cursor.execute(sql, (user_id, 0 if is_restart else 1, bool(is_missed)))
+        if not is_restart:
+            sql = "INSERT INTO team_daily_stats AS ts (team_id, day, prompted) " \
+                  "VALUES (%s, NOW()::date, 1) " \
+                  "ON CONFLICT (team_id, day) DO UPDATE " \
+                  "SET prompted = ts.prompted + 1"
+            cursor.execute(sql, (team_id,))
+
+
+def _record_answer(connection, google_id: str, question: Question):
+    """
+    Count the completion of the standup in the statistics, if the question was the last one of the team. Only the
+    first completion of a day is counted.
+    """
+    with connection.cursor() as cursor:
+        sql = "UPDATE user_stats AS us " \
+              "SET completed = us.completed + 1, " \
+              "    current_streak = us.current_streak + 1, " \
+              "    longest_streak = greatest(us.longest_streak, us.current_streak + 1), " \
+              "    completion_seconds = us.completion_seconds + extract(epoch FROM NOW() - us.last_prompted), " \
+              "    last_completed = NOW()::date " \
+              "FROM users AS u " \
+              "WHERE us.user_id = u.id AND u.google_id = %s " \
+              "      AND us.last_prompted::date = NOW()::date " \
+              "      AND us.last_completed IS DISTINCT FROM NOW()::date " \
+              "      AND NOT EXISTS (SELECT 1 FROM questions AS q " \
+              "                      WHERE q.team_id = %s AND q.question_order > %s) " \
+              "RETURNING extract(epoch FROM NOW() - us.last_prompted)"
+        cursor.execute(sql, (google_id, question.team_id, question.order))
         ret = cursor.fetchone()
-        return ret is not None
+        if ret is None:
+            return
+        seconds, = ret
+        sql = "INSERT INTO team_daily_stats AS ts (team_id, day, completed, completion_seconds) " \
+              "VALUES (%s, NOW()::date, 1, %s) " \
+              "ON CONFLICT (team_id, day) DO UPDATE " \
+              "SET completed = ts.completed + 1, completion_seconds = ts.completion_seconds + %s"
+        cursor.execute(sql, (question.team_id, seconds, seconds))
+
+
+def get_user_stats(connection, google_id: str) -> Optional[UserStats]:
+    with connection.cursor() as cursor:
+        sql = "SELECT us.prompted, us.completed, us.current_streak, us.longest_streak, us.completion_seconds " \
+              "FROM user_stats AS us " \
+              "INNER JOIN users AS u ON u.id = us.user_id AND u.google_id = %s"
+        cursor.execute(sql, (google_id,))
+        ret = cursor.fetchone()
+        if not ret:
+            return None
+        return UserStats(*ret)
+
+
+def get_team_stats(connection, team: Team, days: int, num_streaks: int = 5) -> TeamStats:
+    """
+    Get the statistics of the team over the last days, including today, and the longest current streaks of its
+    members.
+    """
+    with connection.cursor() as cursor:
+        sql = "SELECT coalesce(sum(prompted), 0), coalesce(sum(completed), 0), " \
+              "       coalesce(sum(completion_seconds), 0) " \
+              "FROM team_daily_stats " \
+              "WHERE team_id = %s AND day > NOW()::date - %s"
+        cursor.execute(sql, (team.id_, days))
+        prompted, completed, completion_seconds = cursor.fetchone()
+        sql = "SELECT u.name, us.current_streak " \
+              "FROM user_stats AS us " \
+              "INNER JOIN users AS u ON u.id = us.user_id AND u.team_id = %s AND u.active " \
+              "WHERE us.current_streak > 0 " \
+              "ORDER BY us.current_streak DESC, u.name ASC " \
+              "LIMIT %s"
+        cursor.execute(sql, (team.id_, num_streaks))
+        streaks = cursor.fetchall()
+    return TeamStats(team.name, days, int(prompted), int(completed), float(completion_seconds), streaks)
+
+
+def get_team_of_room(connection, space: str) -> Optional[Team]:
+    with connection.cursor() as cursor:
+        sql = "SELECT id, name, space " \
+              "FROM teams " \
+              "WHERE space = %s"
+        cursor.execute(sql, (space,))
+        ret = cursor.fetchone()
+        if ret:
+            id_, name, space = ret
+            return Team(id_, name, space)
+        return None
+
+
+def rebuild_stats(connection) -> bool:
+    import bot.utils.storage.DatabaseSchema as DatabaseSchema
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL statement_timeout = 0")
+        cursor.execute(DatabaseSchema.REBUILD_STATS_WITH_ARCHIVE)
+    return True
 
 
 def get_standup_answers(connection, google_id: str) -> Sequence[Tuple]:
     with connection.cursor() as cursor:
-        sql = "SELECT DISTINCT ON(q.question_order) q.question_order, q.question, s.answer " \
-              "FROM standups AS s " \
-              "INNER JOIN users AS u ON u.id = s.user_id AND u.google_id = %s " \
-              "INNER JOIN questions AS q ON q.id = s.question_id AND q.question_order != 0 " \
-              "WHERE s.added::date = NOW()::date " \
-              "ORDER BY q.question_order ASC, s.added DESC"
+        sql = "SELECT q.question, a.answer " \
+              "FROM standup_sessions AS ss " \
+              "INNER JOIN users AS u ON u.id = ss.user_id AND u.google_id = %s " \
+              "INNER JOIN standup_session_answers AS a ON a.session_id = ss.id " \
+              "INNER JOIN questions AS q ON q.id = a.question_id AND q.team_id = u.team_id " \
+              "WHERE ss.day = NOW()::date " \
+              "ORDER BY q.question_order ASC"
         cursor.execute(sql, (google_id,))
         ret = cursor.fetchall()
         if not ret:
             return dict()
-        return [(question, answer) for order, question, answer in ret]
+        return [(question, answer) for question, answer in ret]
 
 
 def get_standup_answer_message_id(connection, google_id: str) -> str:
     with connection.cursor() as cursor:
-        sql = "SELECT s.message_id " \
-              "FROM standups AS s " \
-              "INNER JOIN users AS u ON u.id = s.user_id AND u.google_id = %s " \
-              "WHERE s.added::date = NOW()::date AND s.message_id IS NOT NULL"
+        sql = "SELECT ss.message_id " \
+              "FROM standup_sessions AS ss " \
+              "INNER JOIN users AS u ON u.id = ss.user_id AND u.google_id = %s " \
+              "WHERE ss.day = NOW()::date AND ss.message_id IS NOT NULL"
         cursor.execute(sql, (google_id,))
         ret = cursor.fetchone()
         if not ret:
@@ -353,33 +539,180 @@ def get_standup_answer_message_id(connection, google_id: str) -> str:
 
 def set_message_id(connection, google_id: str, message_id: str) -> bool:
     with connection.cursor() as cursor:
-        sql = "UPDATE standups AS s " \
+        sql = "UPDATE standup_sessions AS ss " \
               "SET message_id = %s " \
               "FROM users AS u " \
-              "WHERE s.user_id = u.id " \
+              "WHERE ss.user_id = u.id " \
               "      AND u.google_id = %s " \
-              "      AND s.added::date = NOW()::date " \
-              "RETURNING s.id"
+              "      AND ss.day = NOW()::date " \
+              "RETURNING ss.id"
         cursor.execute(sql, (message_id, google_id))
         ret = cursor.fetchone()
         return ret is not None
 
 
+# The columns of the rows of iter_standup_answers().
+STANDUP_ANSWER_COLUMNS = ('added', 'google_id', 'name', 'email', 'team', 'question_order', 'question', 'answer',
+                          'message_id')
+
+
+def iter_standup_answers(connection, team_name: str = None, google_id: str = None, start: date = None,
+                         end: date = None, batch_size: int = 2000) -> Iterator[Tuple]:
+    """
+    Stream the standup answers in the order they were given, with a server-side cursor which fetches batch_size rows
+    at a time. The team of an answer is the team of its question, i.e. the team of the user at the time of the answer.
+    :param start: The first day, inclusive.
+    :param end: The last day, inclusive.
+    """
+    filters, params = [], []
+    if team_name:
+        filters.append("t.name = %s")
+        params.append(team_name)
+    if google_id:
+        filters.append("u.google_id = %s")
+        params.append(google_id)
+    if start:
+        filters.append("s.added >= %s")
+        params.append(start)
+    if end:
+        filters.append("s.added < %s")
+        params.append(end + timedelta(days=1))
+    sql = "SELECT s.added, u.google_id, u.name, u.email, t.name, q.question_order, q.question, s.answer, " \
+          "       coalesce(ss.message_id, s.message_id) " \
+          "FROM (SELECT id, user_id, question_id, answer, added, message_id FROM standups " \
+          "      UNION ALL " \
+          "      SELECT id, user_id, question_id, answer, added, message_id FROM standups_archive) AS s " \
+          "INNER JOIN users AS u ON u.id = s.user_id " \
+          "INNER JOIN questions AS q ON q.id = s.question_id AND q.question_order != 0 " \
+          "INNER JOIN teams AS t ON t.id = q.team_id " \
+          "LEFT JOIN standup_sessions AS ss ON ss.user_id = s.user_id AND ss.day = s.added::date " \
+          f"WHERE {' AND '.join(filters) or 'TRUE'} " \
+          "ORDER BY s.added ASC, s.id ASC"
+    with connection.cursor(name='iter_standup_answers') as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(sql, params)
+        yield from cursor
+
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'question_id', 'answer', 'added', 'message_id')
+
+# The oldest standups before the given time, locked for the batch. Concurrent jobs skip the rows of each other.
+_ARCHIVE_BATCH = "SELECT id FROM standups WHERE added < %s ORDER BY added, id LIMIT %s FOR UPDATE SKIP LOCKED"
+# The archived standups keep the message id of their session.
+_ARCHIVED_ROWS = "SELECT m.id, m.user_id, m.question_id, m.answer, m.added, coalesce(ss.message_id, m.message_id) " \
+                 "FROM {rows} AS m " \
+                 "LEFT JOIN standup_sessions AS ss ON ss.user_id = m.user_id AND ss.day = m.added::date"
+
+
+def count_standups_before(connection, before: datetime) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM standups WHERE added < %s", (before,))
+        return cursor.fetchone()[0]
+
+
+def archive_standups(connection, before: datetime, batch_size: int) -> int:
+    """
+    Move a batch of the oldest standups before the given time to the archive table.
+    :return: The number of moved standups, 0 if there are none left.
+    """
+    with connection.cursor() as cursor:
+        sql = "WITH moved AS (" \
+              f"  DELETE FROM standups WHERE id IN ({_ARCHIVE_BATCH}) " \
+              f"  RETURNING {', '.join(ARCHIVE_COLUMNS)}" \
+              ") " \
+              f"INSERT INTO standups_archive ({', '.join(ARCHIVE_COLUMNS)}) " \
+              f"{_ARCHIVED_ROWS.format(rows='moved')}"
+        cursor.execute(sql, (before, batch_size))
+        return cursor.rowcount
+
+
+def delete_standups(connection, before: datetime, batch_size: int) -> List[Tuple]:
+    """
+    Delete a batch of the oldest standups before the given time.
+    :return: The deleted standups with the ARCHIVE_COLUMNS, ordered by the time they were added.
+    """
+    with connection.cursor() as cursor:
+        sql = "WITH deleted AS (" \
+              f"  DELETE FROM standups WHERE id IN ({_ARCHIVE_BATCH}) " \
+              f"  RETURNING {', '.join(ARCHIVE_COLUMNS)}" \
+              ") " \
+              f"{_ARCHIVED_ROWS.format(rows='deleted')} " \
+              "ORDER BY m.added, m.id"
+        cursor.execute(sql, (before, batch_size))
+        return cursor.fetchall()
+
+
+def delete_standup_sessions(connection, before: date, batch_size: int) -> int:
+    """
+    Delete a batch of the sessions of the days before the given day, with their answers.
+    :return: The number of deleted sessions, 0 if there are none left.
+    """
+    with connection.cursor() as cursor:
+        sql = "DELETE FROM standup_sessions " \
+              "WHERE id IN (SELECT id FROM standup_sessions WHERE day < %s ORDER BY day, id LIMIT %s " \
+              "             FOR UPDATE SKIP LOCKED)"
+        cursor.execute(sql, (before, batch_size))
+        return cursor.rowcount
+
+
+def search_answers(connection, query: SearchQuery, limit: int, offset: int = 0) -> Sequence[SearchResult]:
+    """
+    Search the standup answers, the best matches first and the newer answers first among equal matches.
+    The excerpts highlight the matches in bold.
+    """
+    tsquery = query.to_tsquery()
+    if not tsquery:
+        return []
+    filters, params = [], [tsquery]
+    if query.team:
+        filters.append("AND s.question_id IN (SELECT q.id FROM questions AS q "
+                       "                      INNER JOIN teams AS t ON t.id = q.team_id WHERE t.name = %s)")
+        params.append(query.team)
+    if query.since:
+        filters.append("AND s.added >= %s")
+        params.append(query.since)
+    if query.until:
+        filters.append("AND s.added < %s")
+        params.append(query.until + timedelta(days=1))
+    params += [limit, offset]
+    with connection.cursor() as cursor:
+        # The excerpts are only created for the rows of the page. The answers are escaped, the cards render HTML.
+        sql = "SELECT s.added, u.name, t.name, q.question, " \
+              "       ts_headline('simple', replace(replace(replace(s.answer, '&', '&amp;'), '<', '&lt;'), " \
+              "                                     '>', '&gt;'), " \
+              "                   m.query, 'StartSel=<b>, StopSel=</b>, MaxWords=30, MinWords=10, MaxFragments=2') " \
+              "FROM (SELECT s.id, ts_rank_cd(s.answer_search, query) AS rank, query " \
+              "      FROM standups AS s " \
+              "      CROSS JOIN to_tsquery('simple', %s) AS query " \
+              f"      WHERE s.answer_search @@ query {' '.join(filters)} " \
+              "      ORDER BY rank DESC, s.added DESC, s.id DESC " \
+              "      LIMIT %s OFFSET %s) AS m " \
+              "INNER JOIN standups AS s ON s.id = m.id " \
+              "INNER JOIN users AS u ON u.id = s.user_id " \
+              "INNER JOIN questions AS q ON q.id = s.question_id " \
+              "INNER JOIN teams AS t ON t.id = q.team_id " \
+              "ORDER BY m.rank DESC, s.added DESC, s.id DESC"
+        cursor.execute(sql, params)
+        return [SearchResult(*row) for row in cursor.fetchall()]
+
+
 def get_users_with_schedule(connection, day: str, time: str) -> Sequence[User]:
     with connection.cursor() as cursor:
-        sql = "SELECT DISTINCT ON(u.google_id) u.name, u.email, u.google_id, u.space, st.question_id " \
+        # The standups of today were not started yet.
+        sql = "SELECT u.name, u.email, u.google_id, u.space " \
               "FROM users AS u " \
               "INNER JOIN schedules AS sch ON u.id = sch.user_id " \
               "           AND sch.day = %s AND sch.enabled AND sch.time <= %s " \
-              "LEFT JOIN standups AS st ON st.user_id = u.id AND st.added::date = NOW()::date " \
               "WHERE u.active " \
-              "ORDER BY u.google_id, st.added DESC"
+              "      AND NOT EXISTS (SELECT 1 FROM standup_sessions AS ss " \
+              "                      WHERE ss.user_id = u.id AND ss.day = NOW()::date) " \
+              "ORDER BY u.google_id"
         cursor.execute(sql, (day, time))
         ret = cursor.fetchall()
         if not ret:
             return []
         return [User(0, google_id, name, email, '', space, True, '')
-                for name, email, google_id, space, question_id in ret if question_id is None]
+                for name, email, google_id, space in ret]
 
 
 def enable_schedule(connection, google_id: str, day: str, enable: bool) -> bool:
@@ -416,31 +749,65 @@ def get_schedules(connection, google_id: str) -> Sequence[Schedule]:
         return [Schedule(id_, day, time, enabled) for id_, day, time, enabled in ret]
 
 
-def update(connection) -> bool:
+def get_processed_event(connection, key: str) -> Optional[Tuple[int, bytes]]:
+    with connection.cursor() as cursor:
+        sql = "SELECT status, response " \
+              "FROM processed_events " \
+              "WHERE key = %s"
+        cursor.execute(sql, (key,))
+        ret = cursor.fetchone()
+        if not ret:
+            return None
+        status, response = ret
+        return status, bytes(response)
 
-    def get_schema_version() -> int:
-        version = 0
-        try:
-            with connection.cursor() as curs:
-                curs.execute("SELECT version FROM __schema_version")
-                if curs.rowcount == 1:
-                    version, = curs.fetchone()
-        except psycopg2.DatabaseError:
-            logger.error("Version table does not exist.")
-            connection.rollback()
-        return version
 
+def add_processed_event(connection, key: str, status: int, response: bytes) -> bool:
+    with connection.cursor() as cursor:
+        sql = "INSERT INTO processed_events (key, status, response) " \
+              "VALUES (%s, %s, %s) " \
+              "ON CONFLICT DO NOTHING " \
+              "RETURNING key"
+        cursor.execute(sql, (key, status, psycopg2.Binary(response)))
+        ret = cursor.fetchone()
+        return ret is not None
+
+
+def remove_processed_events(connection, max_age_hours: int) -> int:
+    with connection.cursor() as cursor:
+        sql = "DELETE FROM processed_events " \
+              "WHERE added < NOW() - %s * INTERVAL '1 hour'"
+        cursor.execute(sql, (max_age_hours,))
+        return cursor.rowcount
+
+
+def get_schema_version(connection) -> int:
+    version = 0
+    try:
+        with connection.cursor() as curs:
+            curs.execute("SELECT version FROM __schema_version")
+            if curs.rowcount == 1:
+                version, = curs.fetchone()
+    except psycopg2.DatabaseError:
+        logger.error("Version table does not exist.")
+        connection.rollback()
+    return version
+
+
+def update(connection) -> bool:
     with connection.cursor() as cursor:
         import bot.utils.storage.DatabaseSchema as DatabaseSchema
 
         logger.info("Update the schema.")
-        schema_version = get_schema_version()
+        schema_version = get_schema_version(connection)
         logger.info(f"Schema version before the migration: {schema_version}")
         for step in range(schema_version, len(DatabaseSchema.migrations)):
+            # A migration may have to rewrite large tables.
+            cursor.execute("SET LOCAL statement_timeout = 0")
             for statement in DatabaseSchema.migrations[step]:
                 cursor.execute(statement)
             connection.commit()
-        schema_version = get_schema_version()
+        schema_version = get_schema_version(connection)
         logger.info(f"Schema version after the migration: {schema_version}")
 
     return True
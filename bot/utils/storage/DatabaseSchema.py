@@ -140,4 +140,232 @@ m3 = [
     """
 ]
 
-migrations = [m1, m2, m3]
+m4 = [
+    """
+    CREATE TABLE "processed_events" (
+      "key" varchar PRIMARY KEY,
+      "status" int,
+      "response" bytea,
+      "added" timestamp DEFAULT NOW()
+    );
+    CREATE INDEX ON "processed_events" ("added");
+    """,
+    """
+    UPDATE __schema_version SET version = 4;
+    """
+]
+
+
+# Rebuild the participation statistics from the standups. A day of a user counts as prompted if the standup was
+# started (the row of the question order 0), and as completed if the last question of the team was answered. A
+# prompted day without completion breaks the streak, once the next standup is started.
+def _rebuild_stats(standups: str) -> str:
+    return f"""
+    DELETE FROM user_stats;
+    DELETE FROM team_daily_stats;
+    CREATE TEMPORARY TABLE standup_days ON COMMIT DROP AS
+      SELECT s.user_id, s.added::date AS day,
+             (array_agg(q.team_id ORDER BY s.added DESC) FILTER (WHERE q.question_order = 0))[1] AS team_id,
+             max(s.added) FILTER (WHERE q.question_order = 0) AS prompted_at,
+             min(s.added) FILTER (WHERE q.question_order > 0 AND q.question_order = l.last_order) AS completed_at
+      FROM {standups} AS s
+      INNER JOIN questions AS q ON q.id = s.question_id
+      INNER JOIN (SELECT team_id, max(question_order) AS last_order FROM questions GROUP BY team_id) AS l
+                 ON l.team_id = q.team_id
+      GROUP BY s.user_id, s.added::date
+      HAVING count(*) FILTER (WHERE q.question_order = 0) > 0;
+    INSERT INTO team_daily_stats (team_id, day, prompted, completed, completion_seconds)
+      SELECT team_id, day, count(*), count(completed_at),
+             coalesce(sum(greatest(extract(epoch FROM completed_at - prompted_at), 0)), 0)
+      FROM standup_days
+      GROUP BY team_id, day;
+    INSERT INTO user_stats (user_id, prompted, completed, current_streak, longest_streak, completion_seconds,
+                            last_prompted, last_completed)
+      WITH marked AS (
+        SELECT *, count(*) FILTER (WHERE completed_at IS NULL AND next_day IS NOT NULL)
+                    OVER (PARTITION BY user_id ORDER BY day) AS streak_id
+        FROM (SELECT *, lead(day) OVER (PARTITION BY user_id ORDER BY day) AS next_day FROM standup_days) AS d
+      ), streaks AS (
+        SELECT user_id, streak_id, count(completed_at) AS length FROM marked GROUP BY user_id, streak_id
+      )
+      SELECT m.user_id, m.prompted, m.completed, c.length, l.longest, m.seconds, m.last_prompted, m.last_completed
+      FROM (SELECT user_id, count(*) AS prompted, count(completed_at) AS completed,
+                   coalesce(sum(greatest(extract(epoch FROM completed_at - prompted_at), 0)), 0) AS seconds,
+                   max(prompted_at) AS last_prompted, max(completed_at)::date AS last_completed,
+                   max(streak_id) AS streak_id
+            FROM marked GROUP BY user_id) AS m
+      INNER JOIN streaks AS c ON c.user_id = m.user_id AND c.streak_id = m.streak_id
+      INNER JOIN (SELECT user_id, max(length) AS longest FROM streaks GROUP BY user_id) AS l ON l.user_id = m.user_id;
+"""
+
+
+REBUILD_STATS = _rebuild_stats('standups')
+# The archived standups count as well, since the migration 7.
+REBUILD_STATS_WITH_ARCHIVE = _rebuild_stats("(SELECT user_id, question_id, added FROM standups "
+                                            " UNION ALL "
+                                            " SELECT user_id, question_id, added FROM standups_archive)")
+
+m5 = [
+    """
+    CREATE TABLE "user_stats" (
+      "user_id" int PRIMARY KEY,
+      "prompted" int NOT NULL DEFAULT 0,
+      "completed" int NOT NULL DEFAULT 0,
+      "current_streak" int NOT NULL DEFAULT 0,
+      "longest_streak" int NOT NULL DEFAULT 0,
+      "completion_seconds" double precision NOT NULL DEFAULT 0,
+      "last_prompted" timestamp,
+      "last_completed" date
+    );
+    ALTER TABLE "user_stats" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("id") ON DELETE CASCADE;
+    CREATE TABLE "team_daily_stats" (
+      "team_id" int,
+      "day" date,
+      "prompted" int NOT NULL DEFAULT 0,
+      "completed" int NOT NULL DEFAULT 0,
+      "completion_seconds" double precision NOT NULL DEFAULT 0,
+      PRIMARY KEY ("team_id", "day")
+    );
+    ALTER TABLE "team_daily_stats" ADD FOREIGN KEY ("team_id") REFERENCES "teams" ("id") ON DELETE CASCADE;
+    """,
+    REBUILD_STATS,
+    """
+    UPDATE __schema_version SET version = 5;
+    """
+]
+
+m6 = [
+    # The 'simple' configuration does not stem, the answers are written in different languages.
+    """
+    ALTER TABLE "standups" ADD COLUMN "answer_search" tsvector
+      GENERATED ALWAYS AS (to_tsvector('simple', coalesce("answer", ''))) STORED;
+    CREATE INDEX ON "standups" USING GIN ("answer_search");
+    ANALYZE "standups";
+    """,
+    """
+    UPDATE __schema_version SET version = 6;
+    """
+]
+
+m7 = [
+    # The old standups are moved to the archive in batches, which are selected by the index on "added". The archive has
+    # no foreign keys, the archived answers of removed users and questions are kept.
+    """
+    CREATE TABLE "standups_archive" (
+      "id" int PRIMARY KEY,
+      "user_id" int,
+      "question_id" int,
+      "answer" varchar,
+      "added" timestamp,
+      "message_id" varchar,
+      "archived" timestamp DEFAULT NOW()
+    );
+    CREATE INDEX ON "standups_archive" ("added");
+    CREATE INDEX ON "standups" ("added");
+    """,
+    """
+    UPDATE __schema_version SET version = 7;
+    """
+]
+
+m8 = [
+    # The current state of the standup of a user per day: the latest answer per question and the id of the card in the
+    # team room. The table standups keeps the history of all answers.
+    """
+    CREATE TABLE "standup_sessions" (
+      "id" SERIAL PRIMARY KEY,
+      "user_id" int NOT NULL,
+      "day" date NOT NULL DEFAULT NOW()::date,
+      "started" timestamp NOT NULL DEFAULT NOW(),
+      "message_id" varchar
+    );
+    ALTER TABLE "standup_sessions" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("id") ON DELETE CASCADE;
+    CREATE UNIQUE INDEX ON "standup_sessions" ("user_id", "day");
+    CREATE INDEX ON "standup_sessions" ("day");
+    CREATE TABLE "standup_session_answers" (
+      "session_id" int NOT NULL,
+      "question_id" int NOT NULL,
+      "answer" varchar,
+      "added" timestamp NOT NULL DEFAULT NOW(),
+      PRIMARY KEY ("session_id", "question_id")
+    );
+    ALTER TABLE "standup_session_answers" ADD FOREIGN KEY ("session_id")
+      REFERENCES "standup_sessions" ("id") ON DELETE CASCADE;
+    ALTER TABLE "standup_session_answers" ADD FOREIGN KEY ("question_id")
+      REFERENCES "questions" ("id") ON DELETE CASCADE;
+    """,
+    # The sessions of today, the older ones are only needed for their message ids, which stay on the standups.
+    """
+    INSERT INTO standup_sessions (user_id, day, started, message_id)
+      SELECT s.user_id, NOW()::date, max(s.added) FILTER (WHERE q.question_order = 0), max(s.message_id)
+      FROM standups AS s
+      INNER JOIN questions AS q ON q.id = s.question_id
+      WHERE s.added >= NOW()::date
+      GROUP BY s.user_id
+      HAVING count(*) FILTER (WHERE q.question_order = 0) > 0;
+    INSERT INTO standup_session_answers (session_id, question_id, answer, added)
+      SELECT DISTINCT ON (ss.id, s.question_id) ss.id, s.question_id, s.answer, s.added
+      FROM standups AS s
+      INNER JOIN questions AS q ON q.id = s.question_id AND q.question_order != 0
+      INNER JOIN standup_sessions AS ss ON ss.user_id = s.user_id AND ss.day = NOW()::date
+      WHERE s.added >= NOW()::date
+      ORDER BY ss.id, s.question_id, s.added DESC;
+    """,
+    """
+    UPDATE __schema_version SET version = 8;
+    """
+]
+
+# The conversation cursors of the sessions of today, from the last standup row of each user: the question after the
+# last answered one.
+BUILD_CONVERSATION_CURSORS = """
+    INSERT INTO conversation_cursors (user_id, session_id, question_id, updated)
+      SELECT ss.user_id, ss.id,
+             (SELECT n.id FROM questions AS n
+              WHERE n.team_id = l.team_id AND n.question_order > l.question_order
+              ORDER BY n.question_order LIMIT 1),
+             l.added
+      FROM (SELECT DISTINCT ON (s.user_id) s.user_id, q.team_id, q.question_order, s.added
+            FROM standups AS s
+            INNER JOIN questions AS q ON q.id = s.question_id
+            WHERE s.added >= NOW()::date
+            ORDER BY s.user_id, s.added DESC) AS l
+      INNER JOIN standup_sessions AS ss ON ss.user_id = l.user_id AND ss.day = NOW()::date
+    ON CONFLICT (user_id) DO NOTHING;
+"""
+
+m9 = [
+    # The position of a user in the standup: the question, which is answered by the next message. It is NULL once the
+    # last question is answered.
+    """
+    CREATE TABLE "conversation_cursors" (
+      "user_id" int PRIMARY KEY,
+      "session_id" int NOT NULL,
+      "question_id" int,
+      "updated" timestamp NOT NULL DEFAULT NOW()
+    );
+    ALTER TABLE "conversation_cursors" ADD FOREIGN KEY ("user_id") REFERENCES "users" ("id") ON DELETE CASCADE;
+    ALTER TABLE "conversation_cursors" ADD FOREIGN KEY ("session_id")
+      REFERENCES "standup_sessions" ("id") ON DELETE CASCADE;
+    ALTER TABLE "conversation_cursors" ADD FOREIGN KEY ("question_id")
+      REFERENCES "questions" ("id") ON DELETE SET NULL;
+    """,
+    BUILD_CONVERSATION_CURSORS,
+    """
+    UPDATE __schema_version SET version = 9;
+    """
+]
+
+m10 = [
+    # Only the session of today keeps its answers, see Database.reset_standup().
+    """
+    DELETE FROM standup_session_answers AS a
+    USING standup_sessions AS ss
+    WHERE a.session_id = ss.id AND ss.day < NOW()::date;
+    """,
+    """
+    UPDATE __schema_version SET version = 10;
+    """
+]
+
+migrations = [m1, m2, m3, m4, m5, m6, m7, m8, m9, m10]
@@ -0,0 +1,139 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Mapping
+
+import psycopg2
+import psycopg2.extensions
+
+import bot.utils.Metrics as Metrics
+from bot.utils.Logger import fields, logger
+
+# Queries which take longer are logged, a negative value disables the log.
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+# The fraction of the slow SELECT queries, which are executed again with EXPLAIN (ANALYZE, BUFFERS) to log the plan.
+EXPLAIN_SAMPLE_RATE = float(os.getenv('DB_EXPLAIN_SAMPLE_RATE', 0))
+
+QUERY_DURATION = Metrics.histogram('standup_bot_db_query_duration_seconds', "Duration of the database queries.",
+                                   ['function'])
+QUERY_ROWS = Metrics.counter('standup_bot_db_query_rows_total', "Rows returned or changed by the database queries.",
+                             ['function'])
+SLOW_QUERIES = Metrics.counter('standup_bot_db_slow_queries_total', "Queries slower than the threshold.",
+                               ['function'])
+
+# The name of the Storage function of the current transaction.
+_function: ContextVar[str] = ContextVar('function', default='unknown')
+
+
+@contextmanager
+def function(name: str):
+    """
+    Attribute the queries in the context to a Storage function.
+    """
+    token = _function.set(name)
+    try:
+        yield
+    finally:
+        _function.reset(token)
+
+
+def params_shape(params: Any) -> str:
+    """
+    Describe the parameters of a query without their values, which might be personal data.
+    E.g. '(str, int, NoneType)' or "{'team': str}".
+    """
+    if params is None:
+        return 'None'
+    if isinstance(params, Mapping):
+        return '{' + ', '.join(f"{key!r}: {type(value).__name__}" for key, value in params.items()) + '}'
+    if isinstance(params, (list, tuple)):
+        return '(' + ', '.join(type(value).__name__ if not isinstance(value, (list, tuple))
+                               else f"{type(value).__name__}[{len(value)}]" for value in params) + ')'
+    return type(params).__name__
+
+
+def explain(connection, query, params) -> str:
+    """
+    Execute the query again with EXPLAIN (ANALYZE, BUFFERS), within a savepoint so that an error (e.g. a statement
+    timeout) does not abort the transaction.
+    :return: The query plan.
+    """
+    with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        cursor.execute("SAVEPOINT explain")
+        try:
+            cursor.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + _as_bytes(query), params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT explain")
+            raise
+        cursor.execute("RELEASE SAVEPOINT explain")
+    return plan
+
+
+def _as_bytes(query) -> bytes:
+    if isinstance(query, bytes):
+        return query
+    if isinstance(query, str):
+        return query.encode('utf-8')
+    # A composed query of the psycopg2.sql module.
+    return query.as_string(None).encode('utf-8')
+
+
+def _is_select(query) -> bool:
+    return _as_bytes(query).lstrip()[:6].upper() == b'SELECT'
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Cursor, which records the duration and number of rows of every query per Storage function, and logs the slow
+    queries. It is the default cursor of the connections (see Storage.CONN_INFO).
+    """
+
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params)
+        finally:
+            self._record(query, params, time.perf_counter() - start)
+
+    def executemany(self, query, params_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, params_list)
+        finally:
+            self._record(query, None, time.perf_counter() - start)
+
+    def _record(self, query, params, elapsed: float):
+        name = _function.get()
+        QUERY_DURATION.observe(elapsed, name)
+        if self.rowcount > 0:
+            QUERY_ROWS.inc(name, amount=self.rowcount)
+        if SLOW_QUERY_MS < 0 or elapsed * 1000 < SLOW_QUERY_MS:
+            return
+
+        SLOW_QUERIES.inc(name)
+        sql = _as_bytes(query).decode('utf-8', errors='replace')
+        logger.warning("Slow query in %s: %.1f ms, %d rows.", name, elapsed * 1000, self.rowcount,
+                       extra=fields('slow_query', function=name, sql=sql, params=lambda: params_shape(params)))
+        if (EXPLAIN_SAMPLE_RATE > 0 and not self.name and _is_select(query)
+                and random.random() < EXPLAIN_SAMPLE_RATE
+                and self.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INTRANS):
+            try:
+                plan = explain(self.connection, query, params)
+            except psycopg2.Error as e:
+                logger.warning("Could not explain the slow query in %s: %s", name, e)
+            else:
+                logger.warning("Plan of the slow query in %s:\n%s", name, plan,
+                               extra=fields('slow_query', function=name))
+
+
+def stats() -> Mapping[str, Mapping[str, float]]:
+    """
+    Get the number of queries, the total time and the number of rows per Storage function of this process.
+    """
+    durations = QUERY_DURATION.samples()
+    rows = QUERY_ROWS.samples()
+    return {labels[0]: {'queries': count, 'time': total, 'rows': rows.get(labels, 0)}
+            for labels, (_, total, count) in durations.items()}
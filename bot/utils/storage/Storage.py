@@ -1,14 +1,25 @@
 import os
 import psycopg2
+import psycopg2.pool
+import threading
+import time
 from contextlib import contextmanager
+from datetime import date, datetime
 from functools import wraps
 from pathlib import Path
-from typing import Optional, Sequence, Tuple
+from typing import Callable, Iterator, Mapping, Optional, Sequence, Tuple
 
+import bot.utils.Deadline as Deadline
+import bot.utils.Metrics as Metrics
+import bot.utils.Tracing as Tracing
 import bot.utils.storage.Database as Database
+import bot.utils.storage.Instrumentation as Instrumentation
+import bot.utils.storage.Versions as Versions
 from bot.utils.Logger import logger
 from bot.utils.Question import Question
 from bot.utils.Schedule import Schedule
+from bot.utils.Search import SearchQuery, SearchResult
+from bot.utils.Stats import TeamStats, UserStats
 from bot.utils.Team import Team
 from bot.utils.User import User
 
@@ -20,43 +31,206 @@ def get_password():
         return os.getenv('DB_PASSWORD', '')
 
 
+# The default timeouts of the statements and lock waits in milliseconds, 0 disables them. Within a request they are
+# shortened to the deadline of the request.
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 10000))
+DB_LOCK_TIMEOUT = int(os.getenv('DB_LOCK_TIMEOUT', 5000))
+
 CONN_INFO = {
     'host': os.getenv('DB_HOST', ''),
     'port': os.getenv('DB_PORT', ''),
     'user': os.getenv('DB_USERNAME', ''),
     'password': get_password(),
-    'dbname': os.getenv('DB_NAME', '')
+    'dbname': os.getenv('DB_NAME', ''),
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+    'options': f"-c statement_timeout={DB_STATEMENT_TIMEOUT} -c lock_timeout={DB_LOCK_TIMEOUT}",
+    'cursor_factory': Instrumentation.InstrumentedCursor
 }
 
 
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+# Pools inherited from the parent process. Their connections must never be closed in the child process,
+# because that would also terminate the connections of the parent.
+_inherited_pools = []
+
+
+def pool_status() -> Mapping[str, int]:
+    """
+    Get the number of used and idle connections of the pool of this process.
+    """
+    pool = _pool
+    if pool is None:
+        return {'in_use': 0, 'idle': 0, 'max': DB_POOL_MAX}
+    return {'in_use': len(pool._used), 'idle': len(pool._pool), 'max': DB_POOL_MAX}
+
+
+def _pool_connections():
+    status = pool_status()
+    return {('in_use',): status['in_use'], ('idle',): status['idle']}
+
+
+TRANSACTION_DURATION = Metrics.histogram('standup_bot_db_transaction_duration_seconds',
+                                         "Duration of the database transactions.", ['function'])
+TRANSACTION_ERRORS = Metrics.counter('standup_bot_db_transaction_errors_total',
+                                     "Failed database transactions.", ['function', 'error'])
+POOL_CONNECTIONS = Metrics.gauge('standup_bot_db_pool_connections', "Connections of the connection pool.",
+                                 ['state'], callback=_pool_connections)
+POOL_MAX_CONNECTIONS = Metrics.gauge('standup_bot_db_pool_max_connections',
+                                     "Maximum number of connections of the connection pool.",
+                                     callback=lambda: {(): DB_POOL_MAX})
+POOL_EXHAUSTED = Metrics.counter('standup_bot_db_pool_exhausted_total',
+                                 "Connections opened outside of the exhausted connection pool.")
+
+
 def connect(conn_info):
     connection = psycopg2.connect(**conn_info)
     return connection
 
 
+def get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """
+    Get the connection pool of this process, it is created on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **CONN_INFO)
+    return _pool
+
+
+def close_pool():
+    """
+    Close all connections of the pool, e.g. in the server master process before the workers are forked.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def _reset_after_fork():
+    global _pool, _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+        _pool = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_connection():
+    """
+    Get a connection from the pool. If the pool is exhausted, a new connection is opened, which is closed again
+    when it is released.
+    """
+    try:
+        return get_pool().getconn()
+    except psycopg2.pool.PoolError:
+        logger.warning("The connection pool is exhausted, open a new connection.")
+        POOL_EXHAUSTED.inc()
+        return connect(CONN_INFO)
+
+
+def release_connection(connection, discard: bool = False):
+    pool = _pool
+    try:
+        pool.putconn(connection, close=discard or bool(connection.closed))
+    except (AttributeError, KeyError, psycopg2.pool.PoolError):
+        # The connection is not from the pool.
+        connection.close()
+
+
+def _set_timeouts(connection):
+    """
+    Limit the statement and lock timeouts of the transaction to the deadline of the current request.
+    It costs a round trip, so it is only done if the deadline is shorter than the default timeouts.
+    """
+    budget = Deadline.remaining()
+    if budget is None:
+        return
+    if budget <= 0:
+        raise Deadline.DeadlineExceeded()
+    timeout = int(budget * 1000)
+    if 0 < DB_STATEMENT_TIMEOUT <= timeout:
+        return
+    lock_timeout = min(timeout, DB_LOCK_TIMEOUT) if DB_LOCK_TIMEOUT else timeout
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('statement_timeout', %s, true), set_config('lock_timeout', %s, true)",
+                       (str(max(timeout, 1)), str(max(lock_timeout, 1))))
+
+
+def after_commit(callback: Callable[[], None]):
+    """
+    Register a callback, which is called after the current transaction has been committed.
+    The callbacks are discarded if the transaction is rolled back.
+    """
+    _local.after_commit.append(callback)
+
+
 @contextmanager
 def transaction(name="transaction", **kwargs):
     def rollback(conn):
-        if conn:
-            conn.rollback()
+        if conn and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return conn is not None and not conn.closed
 
     connection = None
+    is_ok = True
+    _local.after_commit = []
+    start = time.perf_counter()
+    try:
+        connection = get_connection()
+        _set_timeouts(connection)
+    except (psycopg2.Error, Deadline.DeadlineExceeded) as e:
+        # The transaction was not started, the error is raised to the caller.
+        logger.error(f"{name}: Could not start the transaction: {e!r}")
+        TRANSACTION_ERRORS.inc(name, type(e).__name__)
+        if connection:
+            release_connection(connection, discard=isinstance(e, psycopg2.OperationalError))
+        raise
     try:
-        connection = connect(CONN_INFO)
         yield connection
         connection.commit()
+        for callback in _local.after_commit:
+            callback()
     except psycopg2.OperationalError as e:
         logger.error(f"{name}: Operational database error: {e}")
+        TRANSACTION_ERRORS.inc(name, type(e).__name__)
         rollback(connection)
+        # The connection might be broken, do not reuse it.
+        is_ok = False
     except psycopg2.DatabaseError as e:
         logger.error(f"{name}: Database error: {e}")
-        rollback(connection)
+        TRANSACTION_ERRORS.inc(name, type(e).__name__)
+        is_ok = rollback(connection)
     except Exception as e:
         logger.error(f"{name}: Exception: {e}")
-        rollback(connection)
+        TRANSACTION_ERRORS.inc(name, type(e).__name__)
+        is_ok = rollback(connection)
     finally:
         if connection:
-            connection.close()
+            release_connection(connection, discard=not is_ok)
+        TRANSACTION_DURATION.observe(time.perf_counter() - start, name)
+
+
+def _bump_versions(result, *keys: str):
+    """
+    Bump the data versions after the commit, if the write was successful.
+    """
+    if result:
+        after_commit(lambda: Versions.bump(*keys))
+    return result
 
 
 def transact(func):
@@ -66,8 +240,13 @@ def transact(func):
     """
     @wraps(func)
     def inner(*args, **kwargs):
-        with transaction(name=func.__name__) as connection:
-            return func(connection, *args, **kwargs)
+        try:
+            with Tracing.span(f"storage.{func.__name__}"), Instrumentation.function(func.__name__), \
+                    transaction(name=func.__name__) as connection:
+                return func(connection, *args, **kwargs)
+        except (psycopg2.Error, Deadline.DeadlineExceeded):
+            # Like a failed transaction.
+            return None
     return inner
 
 
@@ -83,7 +262,7 @@ def disable_user(connection, user: User) -> bool:
 
 @transact
 def add_team(connection, team_name: str) -> bool:
-    return Database.add_team(connection, team_name)
+    return _bump_versions(Database.add_team(connection, team_name), Versions.TEAMS)
 
 
 @transact
@@ -103,17 +282,17 @@ def leave_team(connection, google_id: str) -> bool:
 
 @transact
 def remove_team(connection, team_name: str) -> bool:
-    return Database.remove_team(connection, team_name)
+    return _bump_versions(Database.remove_team(connection, team_name), Versions.TEAMS)
 
 
 @transact
 def join_room_to_team(connection, team_name: str, space: str) -> bool:
-    return Database.join_room_to_team(connection, team_name, space)
+    return _bump_versions(Database.join_room_to_team(connection, team_name, space), Versions.TEAMS)
 
 
 @transact
 def leave_team_with_room(connection, space: str) -> bool:
-    return Database.leave_team_with_room(connection, space)
+    return _bump_versions(Database.leave_team_with_room(connection, space), Versions.TEAMS)
 
 
 @transact
@@ -136,6 +315,11 @@ def add_question(connection, google_id: str, question: str) -> bool:
     return Database.add_question(connection, google_id, question)
 
 
+@transact
+def get_question(connection, question_id: int) -> Optional[Question]:
+    return Database.get_question(connection, question_id)
+
+
 @transact
 def remove_question(connection, question_id: int) -> bool:
     return Database.remove_question(connection, question_id)
@@ -147,13 +331,20 @@ def reorder_questions(connection, team_id: int, question_id: int, order_step: in
 
 
 @transact
-def get_previous_question(connection, google_id: str) -> Optional[Question]:
-    return Database.get_previous_question(connection, google_id)
+def get_current_question(connection, google_id: str) -> Optional[Question]:
+    return Database.get_current_question(connection, google_id)
 
 
 @transact
-def get_current_question(connection, google_id: str, previous_question: Question = None) -> Optional[Question]:
-    return Database.get_current_question(connection, google_id, previous_question)
+def get_current_question_or_answers(connection, google_id: str) -> Tuple[Optional[Question], Sequence[Tuple]]:
+    """
+    Get the current question, or the answers once the last question is answered. Unlike get_current_question(), a
+    failure (None) is told apart from a finished standup.
+    """
+    question = Database.get_current_question(connection, google_id)
+    if question:
+        return question, []
+    return None, Database.get_standup_answers(connection, google_id)
 
 
 @transact
@@ -181,6 +372,109 @@ def set_message_id(connection, google_id: str, message_id: str) -> bool:
     return Database.set_message_id(connection, google_id, message_id)
 
 
+def iter_standup_answers(team_name: str = None, google_id: str = None, start: date = None, end: date = None,
+                         batch_size: int = 2000) -> Iterator[Tuple]:
+    """
+    Stream the standup answers of a team or user within a date range, see Database.iter_standup_answers().
+    The transaction stays open until the rows are consumed, without statement timeout.
+    :raise psycopg2.Error: If the rows could not be read. Unlike the other functions, a failure is raised, because
+                           a truncated export would look complete.
+    """
+    error = None
+    with Tracing.span('storage.iter_standup_answers'), Instrumentation.function('iter_standup_answers'), \
+            transaction(name='iter_standup_answers') as connection:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = 0")
+            yield from Database.iter_standup_answers(connection, team_name, google_id, start, end, batch_size)
+        except psycopg2.Error as e:
+            error = e
+    if error is not None:
+        raise error
+
+
+@transact
+def get_user_stats(connection, google_id: str) -> Optional[UserStats]:
+    return Database.get_user_stats(connection, google_id)
+
+
+@transact
+def get_team_stats(connection, team: Team, days: int) -> TeamStats:
+    return Database.get_team_stats(connection, team, days)
+
+
+@transact
+def get_stats(connection, google_id: str, space: str = '',
+              days: int = 30) -> Tuple[Optional[UserStats], Optional[TeamStats]]:
+    """
+    Get the statistics of the user and of the team of the user, or with a space only of the team of the room, in one
+    transaction.
+    """
+    if space:
+        user_stats, team = None, Database.get_team_of_room(connection, space)
+    else:
+        user_stats = Database.get_user_stats(connection, google_id)
+        team = Database.get_team_of_user(connection, google_id)
+    return user_stats, Database.get_team_stats(connection, team, days) if team else None
+
+
+@transact
+def get_team_of_room(connection, space: str) -> Optional[Team]:
+    return Database.get_team_of_room(connection, space)
+
+
+@transact
+def rebuild_stats(connection) -> bool:
+    return Database.rebuild_stats(connection)
+
+
+@transact
+def count_standups_before(connection, before: datetime) -> int:
+    return Database.count_standups_before(connection, before)
+
+
+@transact
+def archive_standups(connection, before: datetime, batch_size: int) -> int:
+    return Database.archive_standups(connection, before, batch_size)
+
+
+@transact
+def archive_standups_to(connection, before: datetime, batch_size: int, write: Callable[[Sequence[Tuple]], None]) -> int:
+    """
+    Delete a batch of the oldest standups, after they have been written. If the writing fails, the standups are kept.
+    If the commit fails after the writing, the standups are written again by the next batch.
+    :param write: Write the deleted standups, see Database.delete_standups().
+    """
+    rows = Database.delete_standups(connection, before, batch_size)
+    if rows:
+        write(rows)
+    return len(rows)
+
+
+@transact
+def delete_standup_sessions(connection, before: date, batch_size: int) -> int:
+    return Database.delete_standup_sessions(connection, before, batch_size)
+
+
+@transact
+def search_answers(connection, query: SearchQuery, limit: int, offset: int = 0) -> Sequence[SearchResult]:
+    return Database.search_answers(connection, query, limit, offset)
+
+
+@transact
+def search_team_answers(connection, query: SearchQuery, limit: int, offset: int = 0, google_id: str = '',
+                        space: str = '') -> Tuple[Optional[Team], Sequence[SearchResult]]:
+    """
+    Search the answers of the team of the user, or with a space of the team of the room, in one transaction.
+    :return: The team and the results. Without a team, or if the query names another team, nothing is searched.
+    """
+    team = Database.get_team_of_room(connection, space) if space else Database.get_team_of_user(connection, google_id)
+    if not team or (query.team and query.team != team.name):
+        return team, []
+    query.team = team.name
+    return team, Database.search_answers(connection, query, limit, offset)
+
+
 @transact
 def get_users_with_schedule(connection, day: str, time: str) -> Sequence[User]:
     return Database.get_users_with_schedule(connection, day, time)
@@ -201,6 +495,26 @@ def get_schedules(connection, google_id: str) -> Sequence[Schedule]:
     return Database.get_schedules(connection, google_id)
 
 
+@transact
+def get_processed_event(connection, key: str) -> Optional[Tuple[int, bytes]]:
+    return Database.get_processed_event(connection, key)
+
+
+@transact
+def add_processed_event(connection, key: str, status: int, response: bytes) -> bool:
+    return Database.add_processed_event(connection, key, status, response)
+
+
+@transact
+def remove_processed_events(connection, max_age_hours: int = 24) -> int:
+    return Database.remove_processed_events(connection, max_age_hours)
+
+
+@transact
+def get_schema_version(connection) -> int:
+    return Database.get_schema_version(connection)
+
+
 @transact
 def update(connection) -> bool:
     return Database.update(connection)
@@ -0,0 +1,30 @@
+import multiprocessing
+import zlib
+
+# Version key of the list of teams, including their assigned rooms.
+TEAMS = 'teams'
+
+# The versions are kept in shared memory, which is inherited by forked worker processes. A write in one worker
+# therefore invalidates the cached data in all workers. The keys are hashed into a fixed number of slots, a
+# collision only causes an unnecessary invalidation.
+SLOTS = 4096
+
+_lock = multiprocessing.Lock()
+_versions = multiprocessing.RawArray('L', SLOTS)
+
+
+def _slot(key: str) -> int:
+    return zlib.crc32(key.encode('utf-8')) % SLOTS
+
+
+def get(key: str) -> int:
+    return _versions[_slot(key)]
+
+
+def bump(*keys: str):
+    """
+    Increase the version of the data, e.g. after a committed write.
+    """
+    with _lock:
+        for key in keys:
+            _versions[_slot(key)] += 1
@@ -10,7 +10,14 @@ echo "Running as $(id)"
 if [ "$(id -u)" -eq 0 ] && [ "$(grep -c "$CRON_CMD" "$CRONFILE")" -eq 0 ]; then
   echo "Initializing..."
   cron_time=${CRON_TIME:1:${#CRON_TIME}-2}
-  echo "$cron_time $CRON_CMD >> ${log_file} 2>&1" | crontab -
+  {
+    echo "$cron_time $CRON_CMD >> ${log_file} 2>&1"
+    # The archive job only runs if it is scheduled.
+    if [ -n "${ARCHIVE_CRON_TIME}" ]; then
+      archive_cron_time=${ARCHIVE_CRON_TIME:1:${#ARCHIVE_CRON_TIME}-2}
+      echo "$archive_cron_time $ARCHIVE_CMD >> ${LOGS_DIR}/archive_standups.log 2>&1"
+    fi
+  } | crontab -
 fi
 
 # Start crond if it's not running.
@@ -19,4 +26,9 @@ if [ $? -ne 0 ]; then
   /usr/sbin/crond -L ${LOGS_DIR}/cron.log
 fi
 
-/usr/bin/python3 /root/bot/endpoint.py
+# Start the server, either the multi-process server or the single process waitress server.
+if [ "${WEB_SERVER}" == "gunicorn" ]; then
+  exec gunicorn -c /root/bot/gunicorn_config.py bot.endpoint:app
+else
+  exec /usr/bin/python3 /root/bot/endpoint.py
+fi